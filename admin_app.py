@@ -1,10 +1,29 @@
 import streamlit as st
-import sqlite3
 import pandas as pd
 import datetime
 import calendar
+import os
 import random
-import time
+import secrets
+from functools import partial
+
+from bulk_import import IMPORT_KINDS, upload_path
+from calendar_data import add_months, build_calendar_data, day_map, month_html, month_range
+from chat import render_chat
+from db import DEFAULT_TENANT, current_tenant, get_db_connection
+from export import EXPORT_DOWNLOAD_MAX_MB, EXPORT_TABLES, FORMATS, HAS_PARQUET, HAS_XLSX, downloadable, read_export
+from figure_cache import cached_figure, figure_version
+from insights import cohort_diagnosis
+from jobs import ACTIVE as JOB_ACTIVE, get_job, job_progress, job_result, submit_job
+from migrations import run_migrations
+from query_cache import cached_read_sql, invalidate_on_commit
+from diagnostics import show_diagnostics
+from hq import show_hq
+from profiler import profiled, render_section
+from sessions import TOKEN_PARAM, end_session, restore_session, use_branch
+from plans import assign_plan_to_students, load_daily_stats, load_subject_stats, plan_dates
+from roster import ROSTER_PAGE_SIZE, get_roster
+from trends import FREQS, ROLLING, UNITS, pick_freq, trend_series
 
 st.set_page_config(layout="wide", page_title="5A Admin Dashboard")
 hide_github_icon = """
@@ -26,7 +45,6 @@ except ImportError:
 # -----------------------------------------------------------------------------
 # 1. 시스템 설정 및 상수
 # -----------------------------------------------------------------------------
-DB_NAME = "5a_planner_v5_fix.db"
 COLOR_PRIMARY = "#007AFF"
 COLOR_BG = "#F5F5F7"
 COLOR_MY_MSG = "#007AFF"
@@ -85,28 +103,9 @@ def inject_custom_css():
     </style>
     """, unsafe_allow_html=True)
 
-def get_db_connection(): 
-    return sqlite3.connect(DB_NAME, check_same_thread=False)
-
-def render_chat(user_id, other_id):
-    with get_db_connection() as conn:
-        try:
-            msgs = pd.read_sql("SELECT * FROM messages WHERE (from_id=? AND to_id=?) OR (from_id=? AND to_id=?) ORDER BY created_at ASC", conn, params=(user_id, other_id, other_id, user_id))
-        except:
-            st.info("메시지 테이블이 없습니다.")
-            return
-
-    if msgs.empty: st.info("메시지 내역 없음")
-    else:
-        chat_html = '<div class="chat-container">'
-        for _, row in msgs.iterrows():
-            cls = "msg-me" if row['from_id'] == user_id else "msg-other"
-            chat_html += f'<div class="msg-bubble {cls}">{row["message"]}</div>'
-        chat_html += '</div>'
-        st.markdown(chat_html, unsafe_allow_html=True)
-
 def render_native_calendar(df, year, month):
     cal = calendar.monthcalendar(year, month)
+    cal_days = day_map(build_calendar_data(df, *month_range(year, month)))
     month_name = f"{year}년 {month}월"
     
     col_prev, col_title, col_next = st.columns([1, 5, 1])
@@ -127,76 +126,172 @@ def render_native_calendar(df, year, month):
                 cols[i].write("") 
             else:
                 this_date = datetime.date(year, month, day)
-                has_plan = False
-                if not df.empty:
-                    if not df[df['plan_date'] == this_date].empty:
-                        has_plan = True
                 
                 label = f"{day}"
-                if has_plan: label += " 🔵"
+                if cal_days[this_date]['count'] > 0: label += " 🔵"
                 
                 if cols[i].button(label, key=f"btn_{year}_{month}_{day}", use_container_width=True):
                     st.session_state['selected_date'] = this_date
 
+def assign_class_plan(user_ids, subject, content, start_page, end_page, start_date, end_date, selected_days):
+    """여러 학생(반 전체)에게 같은 교재/기간 계획을 한 번에 배정"""
+    if not user_ids: return False, "배정할 학생이 없습니다."
+    target_dates = plan_dates(start_date, end_date, selected_days)
+    if not target_dates: return False, "설정하신 기간 내에 선택한 요일이 없습니다."
+    if end_page - start_page + 1 <= 0: return False, "종료 페이지가 시작 페이지보다 커야 합니다."
+
+    with get_db_connection() as conn:
+        created = assign_plan_to_students(conn, list(user_ids), f"{start_date}~{end_date}", subject, content,
+                                          start_page, end_page, target_dates, selected_days)
+    return True, f"{len(user_ids)}명에게 {len(target_dates)}일치, 총 {created}건 계획 배정 완료!"
+
+def render_insight_report(report):
+    """insight_report 작업 결과 화면 (통계/브리핑/진단/상담 스크립트)"""
+    if report is None:
+        st.error("분석할 학습 데이터(Plan)가 부족합니다.")
+        return
+    # ====================================================
+    # [PART 3] 최종 리포트 출력 (UI 구성)
+    # ====================================================
+    st.success("✅ 종합 분석 리포트 생성 완료")
+    
+    # --- 1. 상단: 데이터 분석 (Evidence) ---
+    with st.container(border=True):
+        c1, c2 = st.columns([1.2, 2])
+        
+        with c1:
+            st.markdown("#### 📊 과목별 스탯 (Stats)")
+            display_df = pd.DataFrame.from_dict(report['stats'], orient='index')
+            display_df.columns = ['평균', '최고', '최저', '기복']
+            st.dataframe(display_df.style.format("{:.1f}"), use_container_width=True)
+            
+        with c2:
+            st.markdown("#### 📢 관리자 브리핑 (Briefing)")
+            for point in report['briefing_points']:
+                st.info(point, icon="📌")
+    
+    st.markdown("---")
+    
+    # --- 2. 하단: 솔루션 가이드 (Prescription) ---
+    st.markdown(f"#### {report['diagnosis_title']}")
+    
+    col_sol, col_script = st.columns([1, 1])
+    
+    with col_sol:
+        st.markdown("**💊 처방 솔루션 (Action Plan)**")
+        alert_type = report['alert_type']
+        for step in report['solution_steps']:
+            if alert_type == "success": st.success(step)
+            elif alert_type == "warning": st.warning(step)
+            elif alert_type == "error": st.error(step)
+            else: st.info(step)
+            
+    with col_script:
+        st.markdown("**🗣️ 상담 스크립트 (Teacher's Guide)**")
+        st.code(report['teacher_script'], language="text")
+        
+        with st.expander("💡 상담 Tip"):
+            st.caption("학생의 자존감을 위해 '지적'보다는 '관찰한 사실'을 먼저 이야기해주세요.")
+
+# [차트] 그림은 분석 탭이 열려 있을 때만 만듦 (다른 탭에서는 호출되지 않음)
+SUBJECT_COLORS = {'국어': '#FF3B30', '영어': '#34C759', '수학': '#007AFF', '탐구': '#FF9500'}
+
+def trend_figure(trend):
+    """과목별 성적 추이 (trends.trend_series 결과: 과목당 이동 평균 선 + 기간 평균 점)"""
+    fig = go.Figure()
+    for subj, subj_data in trend.groupby('subject', sort=False):
+        color = SUBJECT_COLORS.get(subj, '#888')
+        fig.add_trace(go.Scatter(
+            x=subj_data['date'], y=subj_data['rolling'],
+            mode='lines', name=subj, legendgroup=subj,
+            line=dict(shape='spline', width=3, color=color), connectgaps=True
+        ))
+        fig.add_trace(go.Scatter(
+            x=subj_data['date'], y=subj_data['mean'], customdata=subj_data['count'],
+            mode='markers', name=subj, legendgroup=subj, showlegend=False, opacity=0.45,
+            marker=dict(size=7, symbol='circle', color=color),
+            hovertemplate="%{y:.0f}% (계획 %{customdata}개)"
+        ))
+    fig.update_layout(hovermode="x unified", xaxis=dict(showgrid=False), yaxis=dict(range=[0, 105]), template="plotly_white", height=400, legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
+    return fig
+
+def balance_figure(radar_df):
+    """과목별 밸런스 (평균 성취도 방사형)"""
+    categories = radar_df['subject'].tolist()
+    values = radar_df['achievement'].tolist()
+    categories.append(categories[0]); values.append(values[0]) # 도형 닫기
+    fig = go.Figure(data=go.Scatterpolar(r=values, theta=categories, fill='toself', name='성취도', line_color='#007AFF'))
+    fig.update_layout(polar=dict(radialaxis=dict(visible=True, range=[0, 100])), showlegend=False, margin=dict(l=40, r=40, t=20, b=20), height=400)
+    return fig
+
 # -----------------------------------------------------------------------------
 # 3. 메인 로직 (show_admin)
 # -----------------------------------------------------------------------------
+@profiled("show_admin")
 def show_admin():
     inject_custom_css()
     
-    # [안전장치] 로그인 정보가 없으면 경고만 띄우고 종료하지 않음 (화면 확인용)
-    if 'user' not in st.session_state:
+    # 관리자가 아닌 세션(학생 토큰 등)은 로그아웃시키고 관리자 화면을 보여주지 않음
+    had_session = 'user' in st.session_state or TOKEN_PARAM in st.query_params
+    if not restore_session(roles=('admin',)):
+        if had_session:
+            st.error("관리자 로그인이 필요합니다. 다시 로그인해주세요.")
+            st.stop()
+        # [안전장치] 로그인 정보가 없으면 경고만 띄우고 종료하지 않음 (화면 확인용)
         st.warning("⚠️ 로그인 정보가 없습니다. (단독 실행 모드로 전환됩니다)")
         st.session_state['user'] = {'id': 1, 'role': 'admin', 'real_name': '테스트관리자'}
 
     user = st.session_state['user']
+
+    # 숨김 페이지: 주소 뒤에 ?page=diag (DB 조회 진단)
+    if st.query_params.get("page") == "diag" and user.get('role') == 'admin':
+        show_diagnostics()
+        return
+    # 숨김 페이지: ?page=hq (본사 = 기본 지점 관리자만, 모든 지점 조회)
+    if st.query_params.get("page") == "hq" and user.get('role') == 'admin' and current_tenant() == DEFAULT_TENANT:
+        show_hq()
+        return
+
+    roster = get_roster()   # 이 지점의 학생 명단
     
-    with st.sidebar:
+    with st.sidebar, render_section("show_admin.sidebar"):
         st.title("5A Admin")
         st.markdown(f"관리자: **{user['real_name']}**님")
         if st.button("로그아웃"): 
-            st.session_state.clear()
+            end_session()
             st.rerun()
         st.markdown("---")
         
-        search_query = st.text_input("🔍 학생 검색", placeholder="이름 입력")
+        # 검색어가 바뀌면 첫 페이지부터
+        search_query = st.text_input("🔍 학생 검색", placeholder="이름 또는 초성 (예: ㄱㅁㅅ)", on_change=lambda: st.session_state.pop('roster_page', None))
         
-        # DB 연결 및 학생 목록 가져오기
+        # 학생 명단 + 최근 7일 신호등 (roster.py: 바뀐 부분만 다시 읽고, 검색은 미리 만든 색인에서)
         with get_db_connection() as conn: 
             try:
-                # 테이블 존재 여부 확인 (에러 방지)
-                conn.execute("SELECT * FROM users LIMIT 1")
-                students = pd.read_sql("SELECT id, real_name, group_color FROM users WHERE role='student' ORDER BY real_name", conn)
+                roster.refresh(conn)
             except:
                 st.error("DB가 초기화되지 않았거나 'users' 테이블이 없습니다.")
                 return
 
-            seven_days_ago = datetime.date.today() - datetime.timedelta(days=7)
-            try:
-                stats = pd.read_sql(f"SELECT user_id, AVG(achievement) as avg_score FROM daily_plans WHERE plan_date >= '{seven_days_ago}' GROUP BY user_id", conn)
-            except: stats = pd.DataFrame()
-        
-        if not stats.empty and not students.empty:
-            students = pd.merge(students, stats, left_on='id', right_on='user_id', how='left')
-            students['avg_score'] = students['avg_score'].fillna(0)
-        else:
-            if not students.empty: students['avg_score'] = 0
-
-        if search_query and not students.empty: 
-            students = students[students['real_name'].str.contains(search_query)]
-
-        student_labels = {}
-        if not students.empty:
-            for _, row in students.iterrows():
-                score = row.get('avg_score', 0)
-                if score >= 80: signal = "🟢"
-                elif score >= 50: signal = "🟡"
-                else: signal = "🔴"
-                student_labels[row['id']] = f"{signal} {row['real_name']}"
+        page_no = st.session_state.get('roster_page', 1)
+        students, total = roster.search(search_query, page_no - 1)
+        pages = max(1, -(-total // ROSTER_PAGE_SIZE))
+        if page_no > pages:
+            page_no = pages
+            students, total = roster.search(search_query, page_no - 1)
 
         with st.container(height=300, border=True):
-            if students.empty: st.write("학생 없음"); sid = None
-            else: sid = st.radio("학생 명단", students['id'], format_func=lambda x: student_labels.get(x, f"⚪ {x}"), label_visibility="collapsed")
+            if not students: st.write("학생 없음"); sid = None
+            else:
+                # 보던 학생이 이 페이지에 있으면 선택 유지, 없으면 첫 학생
+                ids = [s['id'] for s in students]
+                current = st.session_state.get('admin_sid')
+                sid = st.radio("학생 명단", ids, index=ids.index(current) if current in ids else 0,
+                               format_func=lambda x: roster.get(x)['label'] if roster.get(x) else f"⚪ {x}", label_visibility="collapsed")
+                st.session_state['admin_sid'] = sid
+        if pages > 1:
+            st.session_state['roster_page'] = page_no
+            st.number_input(f"페이지 (총 {total:,}명, {ROSTER_PAGE_SIZE}명씩)", min_value=1, max_value=pages, key="roster_page")
         
         # [NEW] 테스트용 데이터 생성 도구 (학생 선택 후에만 보이게)
         if sid:
@@ -205,18 +300,19 @@ def show_admin():
                 if st.button("🎲 테스트용 일지 생성 (3일치)", use_container_width=True):
                     with get_db_connection() as conn:
                         try:
+                            today = datetime.date.today()
                             # 1. 긍정
-                            conn.execute("INSERT INTO daily_logs (user_id, log_date, resolution, review) VALUES (?, DATE('now', '-1 day'), ?, ?)", 
-                                         (sid, "파이팅!", "계획 달성 완료. 뿌듯하다."))
+                            conn.execute("INSERT INTO daily_logs (user_id, log_date, resolution, review) VALUES (?, ?, ?, ?)", 
+                                         (sid, today - datetime.timedelta(days=1), "파이팅!", "계획 달성 완료. 뿌듯하다."))
                             # 2. 부정
-                            conn.execute("INSERT INTO daily_logs (user_id, log_date, resolution, review) VALUES (?, DATE('now', '-2 days'), ?, ?)", 
-                                         (sid, "졸리다", "너무 힘들고 포기하고 싶다."))
+                            conn.execute("INSERT INTO daily_logs (user_id, log_date, resolution, review) VALUES (?, ?, ?, ?)", 
+                                         (sid, today - datetime.timedelta(days=2), "졸리다", "너무 힘들고 포기하고 싶다."))
                             # 3. 부정
-                            conn.execute("INSERT INTO daily_logs (user_id, log_date, resolution, review) VALUES (?, DATE('now', '-3 days'), ?, ?)", 
-                                         (sid, "힘내자", "숙제가 많아서 짜증난다."))
+                            conn.execute("INSERT INTO daily_logs (user_id, log_date, resolution, review) VALUES (?, ?, ?, ?)", 
+                                         (sid, today - datetime.timedelta(days=3), "힘내자", "숙제가 많아서 짜증난다."))
+                            invalidate_on_commit(conn, ["daily_logs"], [sid])
                             conn.commit()
                             st.success("샘플 일지 생성 완료!")
-                            time.sleep(0.5)
                             st.rerun()
                         except Exception as e:
                             st.error(f"오류: {e}")
@@ -232,385 +328,426 @@ def show_admin():
         return
 
     # 선택된 학생 정보 가져오기
-    try:
-        sname = students[students['id']==sid].iloc[0]['real_name']
-    except:
-        sname = "알 수 없음"
+    sname = roster.get(sid)['real_name'] if roster.get(sid) else "알 수 없음"
     
     st.markdown(f"## 📊 {sname} 학생 통합 관리")
-    tab_analysis, tab_calendar, tab_manage = st.tabs(["📊 정밀 분석 (Analysis)", "📅 월간 계획표 (Calendar)", "🛡️ 멤버 관리 (Management)"])
+    # 선택한 탭만 실행 (on_change="rerun" → 열린 탭만 .open 이 True). 숨은 탭의 조회/차트/메신저는 건너뜀
+    tab_analysis, tab_calendar, tab_manage = st.tabs(["📊 정밀 분석 (Analysis)", "📅 월간 계획표 (Calendar)", "🛡️ 멤버 관리 (Management)"],
+                                                     key="admin_tab", on_change="rerun")
 
     # === TAB 1: 정밀 분석 ===
-    with tab_analysis:
-        if not sid:
-            st.info("👈 왼쪽 사이드바에서 분석할 학생을 선택해주세요.")
-            c1, c2 = st.columns(2)
-            with c1: st.markdown("### 📈 과목별 성적 추이"); st.caption("학생 선택 시 표시됩니다.")
-            with c2: st.markdown("### 🕸️ 과목별 밸런스"); st.caption("학생 선택 시 표시됩니다.")
-        else:
-            # 실제 데이터 로딩
-            with get_db_connection() as conn:
-                try: df = pd.read_sql("SELECT * FROM daily_plans WHERE user_id=? AND plan_date BETWEEN ? AND ?", conn, params=(sid, start_d, end_d))
-                except: df = pd.DataFrame()
-            
-            if not df.empty: df['plan_date'] = pd.to_datetime(df['plan_date']).dt.date
-            
-            if df.empty:
-                st.info("📭 선택한 기간에 데이터가 없습니다.")
+    with tab_analysis, render_section("show_admin.tab_analysis"):
+        if tab_analysis.open:
+            if not sid:
+                st.info("👈 왼쪽 사이드바에서 분석할 학생을 선택해주세요.")
+                c1, c2 = st.columns(2)
+                with c1: st.markdown("### 📈 과목별 성적 추이"); st.caption("학생 선택 시 표시됩니다.")
+                with c2: st.markdown("### 🕸️ 과목별 밸런스"); st.caption("학생 선택 시 표시됩니다.")
             else:
-                # [그래프 & 차트 섹션 - 기존 코드 유지]
-                c_left, c_right = st.columns([1, 1])
-
-                # 1. (왼쪽) 성적 추이 그래프
-                with c_left:
-                    st.markdown("### 📈 과목별 성적 정밀 추이")
-                    if HAS_PLOTLY:
-                        fig = go.Figure()
-                        color_map = {'국어': '#FF3B30', '영어': '#34C759', '수학': '#007AFF', '탐구': '#FF9500'}
-                        
-                        subjects = df['subject'].unique()
-                        for subj in subjects:
-                            subj_data = df[df['subject'] == subj].sort_values('plan_date')
-                            fig.add_trace(go.Scatter(
-                                x=subj_data['plan_date'], y=subj_data['achievement'],
-                                mode='lines+markers', name=subj,
-                                line=dict(shape='spline', width=3, color=color_map.get(subj, '#888')),
-                                marker=dict(size=8, symbol='circle'), connectgaps=True
-                            ))
-                        fig.update_layout(hovermode="x unified", xaxis=dict(showgrid=False), yaxis=dict(range=[0, 105]), template="plotly_white", height=400, legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
-                        st.plotly_chart(fig, use_container_width=True)
-                    else:
-                        st.line_chart(df.pivot_table(index='plan_date', columns='subject', values='achievement', aggfunc='mean').interpolate())
-
-                # 2. (오른쪽) 밸런스 차트
-                with c_right:
-                    st.markdown("### 🕸️ 과목별 밸런스")
-                    radar_df = df.groupby('subject')['achievement'].mean().reset_index()
-                    if not radar_df.empty:
+                # 실제 데이터 로딩 (그림 캐시용 데이터 버전은 읽기 전에 받아 둠)
+                fig_version = figure_version(sid)
+                with get_db_connection() as conn:
+                    # 추이/밸런스 모두 일일 집계표에서 (계획 한 건씩 읽지 않음)
+                    try: daily = load_daily_stats(conn, sid, start_d, end_d)
+                    except: daily = pd.DataFrame()
+                    # 과목별 평균/최고/최저 (밸런스 차트 + 딥 인사이트 공용)
+                    try: subj_stats = load_subject_stats(conn, sid, start_d, end_d)
+                    except: subj_stats = pd.DataFrame()
+            
+                if daily.empty:
+                    st.info("📭 선택한 기간에 데이터가 없습니다.")
+                else:
+                    # [그래프 & 차트 섹션 - 기존 코드 유지]
+                    c_left, c_right = st.columns([1, 1])
+
+                    # 1. (왼쪽) 성적 추이 그래프
+                    with c_left:
+                        st.markdown("### 📈 과목별 성적 정밀 추이")
+                        # 기간이 길면 주/월 단위로 묶고 과목마다 점 수를 제한 (trends.py)
+                        auto_freq = pick_freq(start_d, end_d)
+                        freq = st.radio("묶음 단위", list(FREQS), index=list(FREQS).index(auto_freq), key=f"trend_freq_{auto_freq}", horizontal=True,
+                                        format_func=FREQS.get, label_visibility="collapsed")
+                        st.caption(f"선: 최근 {ROLLING[freq]}{UNITS[freq]} 이동 평균 · 점: {FREQS[freq]} 평균")
                         if HAS_PLOTLY:
-                            categories = radar_df['subject'].tolist()
-                            values = radar_df['achievement'].tolist()
-                            categories.append(categories[0]); values.append(values[0]) # 도형 닫기
-                            fig = go.Figure(data=go.Scatterpolar(r=values, theta=categories, fill='toself', name='성취도', line_color='#007AFF'))
-                            fig.update_layout(polar=dict(radialaxis=dict(visible=True, range=[0, 100])), showlegend=False, margin=dict(l=40, r=40, t=20, b=20), height=400)
-                            st.plotly_chart(fig, use_container_width=True)
+                            # 같은 학생/기간/단위면 저장해 둔 그림 재사용 (계획이 바뀌면 다시 만듦)
+                            st.plotly_chart(cached_figure("trend", sid, (start_d, end_d, freq), fig_version, lambda: trend_figure(trend_series(daily, freq))),
+                                            use_container_width=True)
                         else:
-                            st.bar_chart(radar_df.set_index('subject'))
-
-            st.markdown("---")
-
-            # ----------------------------------------------------------------
-            # [NEW] 2. 학습 일지 뷰어 및 엑셀 다운로드 (새로 추가됨)
-            # ----------------------------------------------------------------
-            with get_db_connection() as conn:
-                try:
-                    logs_df = pd.read_sql("""
-                        SELECT log_date, resolution, review 
-                        FROM daily_logs 
-                        WHERE user_id=? AND log_date BETWEEN ? AND ? 
-                        ORDER BY log_date DESC
-                    """, conn, params=(sid, start_d, end_d))
-                except: logs_df = pd.DataFrame()
-
-            c_log_view, c_log_action = st.columns([2, 1])
-            with c_log_view:
-                st.markdown("### 📝 학습 일지 (Mindset)")
-                if logs_df.empty:
-                    st.info("📭 해당 기간에 작성된 일지가 없습니다.")
-                else:
-                    st.dataframe(logs_df, use_container_width=True, hide_index=True)
-
-            with c_log_action:
-                st.markdown("### 💾 데이터 관리")
-                if not logs_df.empty:
-                    # CSV 변환 (한글 깨짐 방지: utf-8-sig)
-                    csv = logs_df.to_csv(index=False).encode('utf-8-sig')
-                    file_name = f"{sname}_학습일지_{start_d.strftime('%Y%m%d')}_{end_d.strftime('%Y%m%d')}.csv"
-                    st.download_button(
-                        label="📥 엑셀(CSV) 다운로드",
-                        data=csv,
-                        file_name=file_name,
-                        mime='text/csv',
-                        use_container_width=True
-                    )
-                else:
-                    st.caption("다운로드할 데이터가 없습니다.")
-
-            st.markdown("---")
+                            st.line_chart(trend_series(daily, freq).pivot(index='date', columns='subject', values='rolling'))
+
+                    # 2. (오른쪽) 밸런스 차트
+                    with c_right:
+                        st.markdown("### 🕸️ 과목별 밸런스")
+                        radar_df = subj_stats['mean'].rename('achievement').reset_index() if not subj_stats.empty else pd.DataFrame()
+                        if not radar_df.empty:
+                            if HAS_PLOTLY:
+                                st.plotly_chart(cached_figure("balance", sid, (start_d, end_d), fig_version, lambda: balance_figure(radar_df)), use_container_width=True)
+                            else:
+                                st.bar_chart(radar_df.set_index('subject'))
+
+                st.markdown("---")
+
+                # ----------------------------------------------------------------
+                # [NEW] 2. 학습 일지 뷰어 및 엑셀 다운로드 (새로 추가됨)
+                # ----------------------------------------------------------------
+                with get_db_connection() as conn:
+                    try:
+                        logs_df = cached_read_sql(conn, """
+                            SELECT log_date, resolution, review 
+                            FROM daily_logs 
+                            WHERE user_id=? AND log_date BETWEEN ? AND ? 
+                            ORDER BY log_date DESC
+                        """, (sid, start_d, end_d), user_id=sid, tables=["daily_logs"])
+                    except: logs_df = pd.DataFrame()
+
+                c_log_view, c_log_action = st.columns([2, 1])
+                with c_log_view:
+                    st.markdown("### 📝 학습 일지 (Mindset)")
+                    if logs_df.empty:
+                        st.info("📭 해당 기간에 작성된 일지가 없습니다.")
+                    else:
+                        st.dataframe(logs_df, use_container_width=True, hide_index=True)
+
+                with c_log_action:
+                    st.markdown("### 💾 데이터 관리")
+                    if not logs_df.empty:
+                        # CSV 변환은 백그라운드 작업으로 → 끝나면 다운로드 버튼 표시
+                        csv_key = f"logs_csv_job_{sid}_{start_d}_{end_d}"
+                        csv_job = get_job(st.session_state[csv_key]) if csv_key in st.session_state else None
+                        if csv_job is None or csv_job['status'] in ('failed', 'cancelled'):
+                            if csv_job: st.caption("⚠️ 이전 변환이 완료되지 않았습니다. 다시 시도해주세요.")
+                            if st.button("📦 엑셀(CSV) 파일 만들기", use_container_width=True):
+                                st.session_state[csv_key] = submit_job("logs_csv", {'user_id': int(sid), 'start': str(start_d), 'end': str(end_d)}, created_by=user['id'])
+                                st.rerun()
+                        elif csv_job['status'] in JOB_ACTIVE:
+                            job_progress(csv_job['id'], "CSV 변환 중")
+                        else:
+                            # 한글 깨짐 방지: utf-8-sig
+                            csv = job_result(csv_job['id'])['csv'].encode('utf-8-sig')
+                            file_name = f"{sname}_학습일지_{start_d.strftime('%Y%m%d')}_{end_d.strftime('%Y%m%d')}.csv"
+                            st.download_button(
+                                label="📥 엑셀(CSV) 다운로드",
+                                data=csv,
+                                file_name=file_name,
+                                mime='text/csv',
+                                use_container_width=True
+                            )
+                    else:
+                        st.caption("다운로드할 데이터가 없습니다.")
 
-            # ----------------------------------------------------------------
-            # [FINAL] 3. 5A 딥 인사이트 & 솔루션 (Deep Analysis + Solution)
-            # ----------------------------------------------------------------
-            st.markdown("### 🧠 5A 딥 인사이트 (Deep Analysis & Solution)")
-            st.caption(f"과목별 스탯 분석(Evidence)을 바탕으로, 즉시 실행 가능한 솔루션(Action)까지 원스톱으로 제공합니다.")
+                st.markdown("---")
 
-            if st.button("✨ 종합 컨설팅 리포트 생성", type="primary", use_container_width=True):
-                if df.empty:
-                    st.error("분석할 학습 데이터(Plan)가 부족합니다.")
-                else:
-                    with st.spinner("데이터 정밀 분석 및 솔루션 매칭 중..."):
-                        time.sleep(1.2)
-
-                        # ====================================================
-                        # [PART 1] 데이터 정밀 분석 (통계 산출)
-                        # ====================================================
-                        df['achievement'] = pd.to_numeric(df['achievement'], errors='coerce').fillna(0)
-                        
-                        # 과목별 통계: 평균, 최고, 최저, 기복(Gap)
-                        subj_stats = df.groupby('subject')['achievement'].agg(['mean', 'max', 'min'])
-                        subj_stats['gap'] = subj_stats['max'] - subj_stats['min']
-                        
-                        # 핵심 지표
-                        total_avg = df['achievement'].mean()
-                        best_subj = subj_stats['mean'].idxmax()
-                        worst_subj = subj_stats['mean'].idxmin()
-                        volatile_subj = subj_stats['gap'].idxmax()
-                        
-                        best_score = subj_stats.loc[best_subj, 'mean']
-                        worst_score = subj_stats.loc[worst_subj, 'mean']
-                        max_gap = subj_stats.loc[volatile_subj, 'gap']
-
-                        # --- 관리자 브리핑 포인트 생성 ---
-                        briefing_points = []
-                        
-                        # 1. 전체 퍼포먼스
-                        if total_avg >= 80:
-                            briefing_points.append(f"🚀 **전체 퍼포먼스**: 평균 이행률 **{total_avg:.1f}%**로 '자기주도 완성형' 단계입니다.")
-                        elif total_avg >= 50:
-                            briefing_points.append(f"⚠️ **전체 퍼포먼스**: 평균 이행률 **{total_avg:.1f}%**로 중위권입니다. 실행의 기복을 잡는 것이 급선무입니다.")
-                        else:
-                            briefing_points.append(f"🚨 **전체 퍼포먼스**: 평균 이행률 **{total_avg:.1f}%**로 학습 습관 형성이 시급합니다.")
-
-                        # 2. 강점/약점
-                        briefing_points.append(f"👍 **전략 과목**: **'{best_subj}'**은 평균 **{best_score:.1f}%**로 학습을 주도하고 있습니다.")
-                        if worst_score < 40:
-                            briefing_points.append(f"🚧 **학습 병목**: **'{worst_subj}'** 이행률이 **{worst_score:.1f}%**에 머물러 전체 평균을 깎아먹고 있습니다.")
-                        
-                        # 3. 불안정성
-                        if max_gap >= 40:
-                            briefing_points.append(f"📉 **불안정성 감지**: **'{volatile_subj}'** 과목은 기복이 **{max_gap:.0f}%** 포인트나 됩니다. 기분파 학습을 경계해야 합니다.")
-
-                        # ====================================================
-                        # [PART 2] 솔루션 매칭 (진단 및 처방)
-                        # ====================================================
-                        diagnosis_title = ""
-                        solution_steps = []
-                        teacher_script = ""
-                        alert_type = "info"
-
-                        # A. 롤러코스터형 (기복 심함)
-                        if max_gap >= 40:
-                            diagnosis_title = "📉 진단: 감정 기복형 (Rollercoaster)"
-                            alert_type = "warning"
-                            solution_steps = [
-                                "**최소 습관(Min-Habit)**: 컨디션 최악인 날에도 무조건 해야 하는 '최소 분량' 설정",
-                                "**시작 루틴**: 공부 시작 전 책상 정리 등 뇌 스위치를 켜는 의식 만들기"
-                            ]
-                            teacher_script = f"'{sname}아, {volatile_subj} 점수를 보니까 잘할 땐 완벽한데, 안 될 땐 너무 놔버리는 것 같아. 기복을 줄이는 게 이번 달 목표야.'"
-
-                        # B. 편식형 (과목 격차 심함)
-                        elif (best_score - worst_score) >= 30:
-                            diagnosis_title = "⚖️ 진단: 과목 편식형 (Imbalance)"
-                            alert_type = "error"
-                            solution_steps = [
-                                "**샌드위치 학습법**: [선호 과목] ➔ [비선호 과목(30분)] ➔ [선호 과목] 배치",
-                                "**허들 낮추기**: {worst_subj}는 당분간 쉬운 문제 위주로 성공 경험 쌓기"
-                            ]
-                            teacher_script = f"'{sname}아, {best_subj}는 정말 잘하는데 {worst_subj}가 조금 아쉽네. 맛있는 거 먹기 전에 야채 한 입만 먹는다고 생각하고 {worst_subj}부터 해볼까?'"
-
-                        # C. 기초 부족형 (전체 저조)
-                        elif total_avg < 40:
-                            diagnosis_title = "🌧️ 진단: 기초 부족형 (Struggling)"
-                            alert_type = "secondary"
-                            solution_steps = [
-                                "**타임 박싱(Time Boxing)**: 20분 공부 + 5분 휴식 사이클 도입",
-                                "**플래너 간소화**: 하루 핵심 과제 3개만 적고 100% 달성하기"
-                            ]
-                            teacher_script = f"'{sname}아, 욕심내지 말고 천천히 가자. 오늘 플래너에 적힌 거 딱 하나만이라도 제대로 끝내면 선생님은 만족해.'"
-
-                        # D. 마스터형 (안정적)
-                        else:
-                            diagnosis_title = "🚀 진단: 자기주도 완성형 (Mastery)"
-                            alert_type = "success"
-                            solution_steps = [
-                                "**백지 복습**: 공부한 내용을 보지 않고 구조도 그리기",
-                                "**티칭 학습**: 친구나 선생님에게 오늘 배운 내용 설명하기"
-                            ]
-                            teacher_script = f"'{sname}아, 지금 폼 정말 좋다! 꾸준함이 무기라는 걸 네가 증명하고 있어. 이대로만 가자!'"
-
-
-                        # ====================================================
-                        # [PART 3] 최종 리포트 출력 (UI 구성)
-                        # ====================================================
-                        st.success("✅ 종합 분석 리포트 생성 완료")
-                        
-                        # --- 1. 상단: 데이터 분석 (Evidence) ---
-                        with st.container(border=True):
-                            c1, c2 = st.columns([1.2, 2])
-                            
-                            with c1:
-                                st.markdown("#### 📊 과목별 스탯 (Stats)")
-                                display_df = subj_stats[['mean', 'max', 'min', 'gap']].copy()
-                                display_df.columns = ['평균', '최고', '최저', '기복']
-                                st.dataframe(display_df.style.format("{:.1f}"), use_container_width=True)
-                                
-                            with c2:
-                                st.markdown("#### 📢 관리자 브리핑 (Briefing)")
-                                for point in briefing_points:
-                                    st.info(point, icon="📌")
-                        
-                        st.markdown("---")
-                        
-                        # --- 2. 하단: 솔루션 가이드 (Prescription) ---
-                        st.markdown(f"#### {diagnosis_title}")
-                        
-                        col_sol, col_script = st.columns([1, 1])
-                        
-                        with col_sol:
-                            st.markdown("**💊 처방 솔루션 (Action Plan)**")
-                            for step in solution_steps:
-                                if alert_type == "success": st.success(step)
-                                elif alert_type == "warning": st.warning(step)
-                                elif alert_type == "error": st.error(step)
-                                else: st.info(step)
-                                
-                        with col_script:
-                            st.markdown("**🗣️ 상담 스크립트 (Teacher's Guide)**")
-                            st.code(teacher_script, language="text")
-                            
-                            with st.expander("💡 상담 Tip"):
-                                st.caption("학생의 자존감을 위해 '지적'보다는 '관찰한 사실'을 먼저 이야기해주세요.")                
-            # [기존 메신저 기능 연결]
-            c_msg_input, c_msg_view = st.columns([1, 1])
-            with c_msg_input:
-                st.markdown("### 📨 메시지 보내기")
-                with st.form("admin_msg_form", clear_on_submit=True):
-                    admin_msg = st.text_area("보낼 메시지", height=100)
-                    if st.form_submit_button("전송"):
-                        if admin_msg.strip():
-                            with get_db_connection() as conn:
-                                conn.execute("INSERT INTO messages (from_id, to_id, message) VALUES (?,?,?)", (user['id'], sid, admin_msg))
-                                conn.commit()
-                            st.success("전송되었습니다!")
-                            st.rerun()
-                        else:
-                            st.warning("내용을 입력해주세요.")
+                # ----------------------------------------------------------------
+                # [FINAL] 3. 5A 딥 인사이트 & 솔루션 (Deep Analysis + Solution)
+                # ----------------------------------------------------------------
+                st.markdown("### 🧠 5A 딥 인사이트 (Deep Analysis & Solution)")
+                st.caption(f"과목별 스탯 분석(Evidence)을 바탕으로, 즉시 실행 가능한 솔루션(Action)까지 원스톱으로 제공합니다.")
 
-            with c_msg_view:
-                st.markdown("### 📬 메신저 내역")
-                render_chat(user['id'], sid)
+                insight_key = f"insight_job_{sid}_{start_d}_{end_d}"
+                if st.button("✨ 종합 컨설팅 리포트 생성", type="primary", use_container_width=True):
+                    if daily.empty or subj_stats.empty:
+                        st.error("분석할 학습 데이터(Plan)가 부족합니다.")
+                    else:
+                        st.session_state[insight_key] = submit_job("insight_report", {'user_id': int(sid), 'start': str(start_d), 'end': str(end_d), 'sname': sname}, created_by=user['id'])
+
+                insight_job = get_job(st.session_state[insight_key]) if insight_key in st.session_state else None
+                if insight_job and insight_job['status'] in JOB_ACTIVE:
+                    job_progress(insight_job['id'], "데이터 정밀 분석 및 솔루션 매칭 중...")
+                elif insight_job and insight_job['status'] == 'done':
+                    render_insight_report(job_result(insight_job['id']))
+                elif insight_job and insight_job['status'] == 'failed':
+                    st.error(f"리포트 생성 실패: {insight_job['error']}")
+
+                # [기존 메신저 기능 연결]
+                c_msg_input, c_msg_view = st.columns([1, 1])
+                with c_msg_input:
+                    st.markdown("### 📨 메시지 보내기")
+                    with st.form("admin_msg_form", clear_on_submit=True):
+                        admin_msg = st.text_area("보낼 메시지", height=100)
+                        if st.form_submit_button("전송"):
+                            if admin_msg.strip():
+                                with get_db_connection() as conn:
+                                    conn.execute("INSERT INTO messages (from_id, to_id, message) VALUES (?,?,?)", (user['id'], sid, admin_msg))
+                                    invalidate_on_commit(conn, ["messages"], [user['id'], sid])
+                                    conn.commit()
+                                st.success("전송되었습니다!")
+                                st.rerun()
+                            else:
+                                st.warning("내용을 입력해주세요.")
+
+                with c_msg_view:
+                    st.markdown("### 📬 메신저 내역")
+                    render_chat(user['id'], sid)
 
     # === TAB 2: 월간 계획표 (Calendar) ===
-    with tab_calendar:
-        c_y, c_m, c_blank = st.columns([1, 1, 4])
-        with c_y: cal_year = st.selectbox("년도", [2025, 2026], index=1)
-        with c_m: cal_month = st.selectbox("월", list(range(1, 13)), index=datetime.date.today().month-1)
+    with tab_calendar, render_section("show_admin.tab_calendar"):
+        if tab_calendar.open:
+            c_y, c_m, c_blank = st.columns([1, 1, 4])
+            # 다른 탭에 다녀와도 보던 달이 유지되게 persist_state
+            with c_y: cal_year = st.selectbox("년도", [2025, 2026], index=1, key="cal_year", persist_state="page")
+            with c_m: cal_month = st.selectbox("월", list(range(1, 13)), index=datetime.date.today().month-1, key="cal_month", persist_state="page")
+            with c_blank: show_semester = st.toggle("📆 학기 한눈에 보기 (6개월)", key="cal_semester", persist_state="page")
         
-        start_cal = datetime.date(cal_year, cal_month, 1)
-        _, last_day = calendar.monthrange(cal_year, cal_month)
-        end_cal = datetime.date(cal_year, cal_month, last_day)
+            start_cal, end_cal = month_range(cal_year, cal_month)
+
+            # [학기 보기] 6개월치를 한 번 조회 → 한 번 집계 → 달마다 작은 달력으로
+            if show_semester:
+                sem_months = [add_months(cal_year, cal_month, i) for i in range(6)]
+                sem_end = month_range(*sem_months[-1])[1]
+                with get_db_connection() as conn:
+                    try:
+                        sem_df = cached_read_sql(conn, "SELECT plan_date, subject, achievement FROM daily_plans WHERE user_id=? AND plan_date BETWEEN ? AND ?", (sid, start_cal, sem_end), user_id=sid, tables=["daily_plans"])
+                    except: sem_df = pd.DataFrame()
+                sem_days = day_map(build_calendar_data(sem_df, start_cal, sem_end))
+                for row_start in (0, 3):
+                    cols = st.columns(3)
+                    for col, (y, m) in zip(cols, sem_months[row_start:row_start + 3]):
+                        with col, st.container(border=True):
+                            st.markdown(month_html(sem_days, y, m), unsafe_allow_html=True)
+                st.markdown("---")
         
-        with get_db_connection() as conn:
-            try:
-                cal_df = pd.read_sql("SELECT * FROM daily_plans WHERE user_id=? AND plan_date BETWEEN ? AND ?", conn, params=(sid, start_cal, end_cal))
-            except: cal_df = pd.DataFrame()
+            with get_db_connection() as conn:
+                try:
+                    cal_df = cached_read_sql(conn, "SELECT * FROM daily_plans WHERE user_id=? AND plan_date BETWEEN ? AND ?", (sid, start_cal, end_cal), user_id=sid, tables=["daily_plans"])
+                except: cal_df = pd.DataFrame()
         
-        if not cal_df.empty:
-            cal_df['plan_date'] = pd.to_datetime(cal_df['plan_date']).dt.date
+            if not cal_df.empty:
+                cal_df['plan_date'] = pd.to_datetime(cal_df['plan_date']).dt.date
 
-        render_native_calendar(cal_df, cal_year, cal_month)
+            render_native_calendar(cal_df, cal_year, cal_month)
 
-        st.markdown("---")
-        if st.session_state['selected_date']:
-            sel_d = st.session_state['selected_date']
-            st.markdown(f"### 📌 {sel_d.strftime('%Y년 %m월 %d일')} 학습 상세")
-            day_data = cal_df[cal_df['plan_date'] == sel_d] if not cal_df.empty else pd.DataFrame()
+            st.markdown("---")
+            if st.session_state['selected_date']:
+                sel_d = st.session_state['selected_date']
+                st.markdown(f"### 📌 {sel_d.strftime('%Y년 %m월 %d일')} 학습 상세")
+                day_data = cal_df[cal_df['plan_date'] == sel_d] if not cal_df.empty else pd.DataFrame()
             
-            if day_data.empty: st.info("📭 일정 없음")
+                if day_data.empty: st.info("📭 일정 없음")
+                else:
+                    for _, row in day_data.iterrows():
+                        st.success(f"{row['subject']} : {row['content']} ({row['achievement']}%)")
             else:
-                for _, row in day_data.iterrows():
-                    st.success(f"{row['subject']} : {row['content']} ({row['achievement']}%)")
-        else:
-            st.info("👆 달력 날짜를 클릭하세요.")
+                st.info("👆 달력 날짜를 클릭하세요.")
 
     # === TAB 3: 멤버 관리 (Management) ===
-    with tab_manage:
-        st.markdown("### 👥 전체 회원 리스트 및 관리")
+    with tab_manage, render_section("show_admin.tab_manage"):
+        if tab_manage.open:
+            st.markdown("### 👥 전체 회원 리스트 및 관리")
         
-        with get_db_connection() as conn:
-            all_users = pd.read_sql("SELECT id, username, real_name, role FROM users ORDER BY id DESC", conn)
-
-        # 1. 신규 가입 대기자
-        pending_users = all_users[all_users['role'] == 'pending']
-        if not pending_users.empty:
-            st.warning(f"⚠️ 승인 대기 중인 회원이 {len(pending_users)}명 있습니다!")
-            for _, row in pending_users.iterrows():
-                c1, c2, c3 = st.columns([3, 1, 1])
-                c1.write(f"**{row['real_name']}** ({row['username']})")
+            with get_db_connection() as conn:
+                all_users = cached_read_sql(conn, "SELECT id, username, real_name, role FROM users ORDER BY id DESC", tables=["users"])
+
+            # 1. 신규 가입 대기자
+            pending_users = all_users[all_users['role'] == 'pending']
+            if not pending_users.empty:
+                st.warning(f"⚠️ 승인 대기 중인 회원이 {len(pending_users)}명 있습니다!")
+                # 실수 방지용 체크박스 → 화면에 보이는 대기자만 승인 (그 사이 새로 가입한 사람은 제외)
+                if st.checkbox(f"대기 중인 {len(pending_users)}명을 모두 학생으로 승인합니다.", key="approve_all_agree"):
+                    if st.button("🚀 전원 승인하기", key="approve_all"):
+                        pending_ids = [int(i) for i in pending_users['id']]
+                        with get_db_connection() as conn:
+                            conn.execute(f"UPDATE users SET role='student' WHERE role='pending' AND id IN ({','.join('?' * len(pending_ids))})", pending_ids)
+                            invalidate_on_commit(conn, ["users"])
+                            conn.commit()
+                        st.session_state.pop('approve_all_agree', None)
+                        st.rerun()
+                for _, row in pending_users.iterrows():
+                    c1, c2, c3 = st.columns([3, 1, 1])
+                    c1.write(f"**{row['real_name']}** ({row['username']})")
                 
-                if c2.button("✅ 승인", key=f"app_{row['id']}"):
-                    with get_db_connection() as conn:
-                        conn.execute("UPDATE users SET role='student' WHERE id=?", (row['id'],))
-                        conn.commit()
-                    st.success(f"{row['real_name']}님 승인 완료!")
-                    st.rerun()
+                    if c2.button("✅ 승인", key=f"app_{row['id']}"):
+                        with get_db_connection() as conn:
+                            conn.execute("UPDATE users SET role='student' WHERE id=?", (row['id'],))
+                            invalidate_on_commit(conn, ["users"])
+                            conn.commit()
+                        st.success(f"{row['real_name']}님 승인 완료!")
+                        st.rerun()
                     
-                if c3.button("❌ 거절", key=f"rej_{row['id']}"):
-                    with get_db_connection() as conn:
-                        conn.execute("DELETE FROM users WHERE id=?", (row['id'],))
-                        conn.commit()
-                    st.error("삭제 완료")
+                    if c3.button("❌ 거절", key=f"rej_{row['id']}"):
+                        with get_db_connection() as conn:
+                            conn.execute("DELETE FROM users WHERE id=?", (row['id'],))
+                            invalidate_on_commit(conn, ["users"])
+                            conn.commit()
+                        st.error("삭제 완료")
+                        st.rerun()
+                st.markdown("---")
+
+            # 2. 전체 회원 목록
+            st.dataframe(all_users, use_container_width=True)
+
+            # 3. 전체 학생 진단표 (사이드바 기간 기준, 집계표 1회 조회)
+            st.markdown("### 🚨 전체 학생 진단")
+            st.caption(f"{start_d} ~ {end_d} 기간의 과목별 집계로 모든 학생을 한 번에 진단합니다. (위험도 높은 순)")
+            if st.button("🔍 전체 진단 실행", key="cohort_diag"):
+                with get_db_connection() as conn:
+                    cohort = cohort_diagnosis(conn, start_d, end_d)
+                if cohort.empty:
+                    st.info("해당 기간의 학습 데이터가 없습니다.")
+                else:
+                    at_risk = cohort[cohort['code'] != 'mastery']
+                    m1, m2, m3 = st.columns(3)
+                    m1.metric("진단 학생", f"{len(cohort)}명")
+                    m2.metric("관리 필요", f"{len(at_risk)}명")
+                    m3.metric("전체 평균", f"{cohort['total_avg'].mean():.1f}%")
+                    show = cohort[['real_name', 'group_color', 'diagnosis', 'total_avg', 'best_subj', 'worst_subj', 'volatile_subj', 'max_gap']]
+                    show.columns = ['이름', '그룹', '진단', '평균', '강점 과목', '약점 과목', '기복 과목', '기복']
+                    st.dataframe(show.style.format({'평균': "{:.1f}", '기복': "{:.0f}"})
+                                 .apply(lambda r: ['background-color: #fdecea' if c != 'mastery' else '' for c in cohort['code']], axis=0),
+                                 use_container_width=True, hide_index=True)
+
+            # 4. 반 전체 계획 배정 (그룹 또는 선택한 학생들에게 한 번에)
+            st.markdown("### 📚 반 전체 계획 배정")
+            active_students = all_users[all_users['role'] == 'student']
+            with st.form("class_plan_form"):
+                target_mode = st.radio("배정 대상", ["그룹(반) 전체", "학생 직접 선택"], horizontal=True)
+                c_grp, c_pick = st.columns(2)
+                group_color = c_grp.selectbox("그룹", ["BLUE", "YELLOW", "RED"])
+                # 이름표는 한 번만 만들어 둠 (선택지마다 set_index 를 다시 하면 학생 수에 비례해 느려짐)
+                student_names = dict(zip(active_students['id'], active_students['real_name']))
+                picked_ids = c_pick.multiselect("학생 선택", options=active_students['id'].tolist(), format_func=student_names.get)
+                c_sub, c_book = st.columns(2)
+                cls_subject = c_sub.selectbox("과목", ["수학", "국어", "영어", "탐구", "기타"])
+                cls_content = c_book.text_input("교재명", placeholder="예: 수능완성")
+                c_p1, c_p2, c_d1, c_d2 = st.columns(4)
+                cls_start_p = c_p1.number_input("시작 페이지", min_value=1, value=1)
+                cls_end_p = c_p2.number_input("종료 페이지", min_value=1, value=100)
+                cls_start_d = c_d1.date_input("시작일", datetime.date.today(), key="cls_start")
+                cls_end_d = c_d2.date_input("종료일", datetime.date.today() + datetime.timedelta(days=30), key="cls_end")
+                days_kor = ["월", "화", "수", "목", "금", "토", "일"]
+                cls_days = st.multiselect("학습 요일", days_kor, default=["월", "수", "금"])
+
+                if st.form_submit_button("🚀 일괄 배정 실행"):
+                    if target_mode == "그룹(반) 전체":
+                        with get_db_connection() as conn:
+                            target_ids = [r[0] for r in conn.execute("SELECT id FROM users WHERE role='student' AND group_color=?", (group_color,))]
+                    else:
+                        target_ids = picked_ids
+                    success, msg = assign_class_plan(target_ids, cls_subject, cls_content, cls_start_p, cls_end_p,
+                                                     cls_start_d, cls_end_d, [days_kor.index(d) for d in cls_days])
+                    if success: st.success(msg)
+                    else: st.error(msg)
+
+            # 5. CSV 일괄 등록 (학기 초 명단/교재 일정) - 검사와 등록 모두 백그라운드 작업
+            st.markdown("### 📥 CSV 일괄 등록")
+            with st.expander("CSV 형식 안내"):
+                st.markdown(
+                    "- **학생 명단**: `아이디, 이름, 비밀번호, 그룹` (비밀번호 비우면 초기 비밀번호, 그룹은 BLUE/YELLOW/RED) → 바로 학생으로 등록\n"
+                    "- **교재 일정**: `아이디, 과목, 교재, 시작쪽, 끝쪽, 시작일, 종료일, 요일` (요일 예: 월수금) → 목표 + 일간 계획 자동 분배\n"
+                    "- **일간 계획**: `아이디, 날짜, 과목, 내용, 성취도` (전체 데이터 내보내기의 일간계획.csv 와 같은 형식)")
+            import_job = get_job(st.session_state['import_job']) if 'import_job' in st.session_state else None
+            if import_job and import_job['status'] in JOB_ACTIVE:
+                job_progress(import_job['id'], "CSV 검사/등록 중")
+            else:
+                if import_job and import_job['status'] == 'done':
+                    imported = job_result(import_job['id'])
+                    verb = "검사 통과" if imported['dry_run'] else "등록 완료"
+                    msg = f"{IMPORT_KINDS[imported['kind']]['label']}: {imported['rows']:,}행 중 {imported['imported']:,}행 {verb}"
+                    if imported['error_count']:
+                        st.warning(f"{msg}, 오류 {imported['error_count']:,}행 (아래 행은 {'등록되지 않습니다' if imported['dry_run'] else '건너뛰었습니다'})")
+                        st.dataframe(pd.DataFrame(imported['errors'], columns=['줄', '사유']), use_container_width=True, hide_index=True)
+                    else:
+                        st.success(msg)
+                elif import_job and import_job['status'] == 'failed':
+                    st.error(f"일괄 등록 실패: {import_job['error']}")
+                elif import_job and import_job['status'] == 'cancelled':
+                    st.warning("일괄 등록이 취소되었습니다. (취소 전까지 처리한 묶음은 저장됨)")
+                c_kind, c_file = st.columns([1, 2])
+                import_kind = c_kind.selectbox("등록 종류", list(IMPORT_KINDS), format_func=lambda k: IMPORT_KINDS[k]['label'])
+                upload = c_file.file_uploader("CSV 파일", type=["csv"], key="import_file")
+                c_check, c_run = st.columns(2)
+                dry_run = c_check.button("🔍 검사만 하기", disabled=upload is None, use_container_width=True)
+                if (c_run.button("📥 등록 실행", type="primary", disabled=upload is None, use_container_width=True) or dry_run) and upload is not None:
+                    # 작업 스레드가 읽을 수 있게 파일로 저장 (작업이 끝나면 삭제)
+                    path = upload_path(f"{secrets.token_hex(8)}.csv")
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    with open(path, "wb") as f:
+                        f.write(upload.getbuffer())
+                    st.session_state['import_job'] = submit_job("bulk_import", {'kind': import_kind, 'path': path, 'dry_run': dry_run}, created_by=user['id'])
                     st.rerun()
-            st.markdown("---")
 
-        # 2. 전체 회원 목록
-        st.dataframe(all_users, use_container_width=True)
-        
-        st.markdown("### 🗑️ 회원 삭제 (주의)")
-        st.caption("삭제 시 해당 학생의 학습 기록, 메시지 등 모든 데이터가 영구적으로 지워집니다.")
+            # 6. 학원 전체 데이터 내보내기 (백그라운드 작업이 파일로 저장 → 다운로드)
+            st.markdown("### 📦 전체 데이터 내보내기")
+            st.caption("기간 내 모든 학생의 일간 계획 · 학습일지 · 목표를 한 파일로 내려받습니다. 데이터를 나눠 읽어 바로 파일에 쓰므로 파일을 만드는 동안에는 서버 메모리를 거의 쓰지 않습니다. "
+                       f"다운로드할 때는 파일 전체를 서버 메모리에 올려서 보내므로 {EXPORT_DOWNLOAD_MAX_MB}MB 까지만 화면에서 받을 수 있습니다.")
+            export_job = get_job(st.session_state['export_job']) if 'export_job' in st.session_state else None
+            if export_job and export_job['status'] in JOB_ACTIVE:
+                job_progress(export_job['id'], "내보내기 파일 만드는 중")
+            else:
+                if export_job and export_job['status'] == 'done':
+                    exported = job_result(export_job['id'])
+                    if os.path.exists(exported['path']):
+                        rows = ", ".join(f"{EXPORT_TABLES[t]['label']} {n:,}건" for t, n in exported['rows'].items())
+                        if downloadable(exported):
+                            # 파일은 누를 때 읽어서 넘김 (화면을 그릴 때마다 파일 전체를 읽지 않음)
+                            st.download_button(f"📥 {exported['file_name']} ({exported['bytes'] / 1e6:.1f}MB)", data=partial(read_export, exported['path']),
+                                               file_name=exported['file_name'], mime="application/zip" if exported['file_name'].endswith(".zip") else None,
+                                               on_click="ignore", use_container_width=True)
+                        else:
+                            st.warning(f"⚠️ 파일이 {exported['bytes'] / 1e6:,.0f}MB 로 화면 다운로드 한도({EXPORT_DOWNLOAD_MAX_MB}MB)를 넘습니다. "
+                                       f"기간을 나눠서 다시 만들거나, 서버의 `{exported['path']}` 파일을 직접 가져가세요.")
+                        st.caption(rows)
+                    else:
+                        st.caption("⚠️ 내보내기 파일 보관 기간이 지났습니다. 다시 만들어 주세요.")
+                elif export_job and export_job['status'] == 'failed':
+                    st.error(f"내보내기 실패: {export_job['error']}")
+                with st.form("export_form"):
+                    c_s, c_e, c_fmt = st.columns(3)
+                    exp_start = c_s.date_input("시작일", start_d, key="exp_start")
+                    exp_end = c_e.date_input("종료일", end_d, key="exp_end")
+                    formats = [f for f in FORMATS if (f != 'parquet' or HAS_PARQUET) and (f != 'xlsx' or HAS_XLSX)]
+                    exp_fmt = c_fmt.selectbox("형식", formats, format_func=FORMATS.get)
+                    exp_tables = st.multiselect("포함할 데이터", list(EXPORT_TABLES), default=list(EXPORT_TABLES),
+                                                format_func=lambda t: EXPORT_TABLES[t]['label'])
+                    if st.form_submit_button("📦 내보내기 파일 만들기"):
+                        if not exp_tables or exp_start > exp_end:
+                            st.error("기간과 포함할 데이터를 확인해주세요.")
+                        else:
+                            st.session_state['export_job'] = submit_job("academy_export", {'start': str(exp_start), 'end': str(exp_end), 'fmt': exp_fmt, 'tables': exp_tables},
+                                                                        created_by=user['id'])
+                            st.rerun()
+
+            st.markdown("### 🗑️ 회원 삭제 (주의)")
+            st.caption("삭제 시 해당 학생의 학습 기록, 메시지 등 모든 데이터가 영구적으로 지워집니다.")
 
-        # [수정] 기존 st.selectbox(단일 선택) -> st.multiselect(다중 선택)으로 변경
-        # 학생 이름 리스트 생성 (ID와 이름 매핑)
-        student_dict = {row['real_name']: row['id'] for _, row in students.iterrows()}
+            # [수정] 기존 st.selectbox(단일 선택) -> st.multiselect(다중 선택)으로 변경
+            # 학생 이름 리스트 생성 (ID와 이름 매핑)
+            student_dict = {s['real_name']: s['id'] for s in roster.entries}
         
-        # 다중 선택 위젯
-        selected_names = st.multiselect(
-            "삭제할 회원을 선택하세요 (복수 선택 가능)",
-            options=list(student_dict.keys()),
-            placeholder="이름을 검색하거나 선택하세요"
-        )
-
-        # 삭제 버튼 (선택된 사람이 있을 때만 활성화)
-        if selected_names:
-            st.error(f"선택한 {len(selected_names)}명의 회원을 정말로 삭제하시겠습니까?")
-            # 실수 방지용 체크박스
-            if st.checkbox("네, 영구 삭제에 동의합니다.", key="del_agree"):
-                if st.button("선택한 회원 일괄 삭제 실행", type="primary"):
+            # 다중 선택 위젯
+            selected_names = st.multiselect(
+                "삭제할 회원을 선택하세요 (복수 선택 가능)",
+                options=list(student_dict.keys()),
+                placeholder="이름을 검색하거나 선택하세요"
+            )
+
+            # 삭제는 백그라운드 작업으로 (진행 중이면 진행률만 표시)
+            delete_job = get_job(st.session_state['delete_job']) if 'delete_job' in st.session_state else None
+            if delete_job and delete_job['status'] in JOB_ACTIVE:
+                job_progress(delete_job['id'], "회원 삭제 중")
+            elif delete_job:
+                del st.session_state['delete_job']
+                if delete_job['status'] == 'done': st.success(f"✅ {job_result(delete_job['id'])['deleted']}명의 회원이 정상적으로 삭제되었습니다.")
+                elif delete_job['status'] == 'cancelled': st.warning(f"삭제가 취소되었습니다. (취소 전까지 {delete_job['progress']:.0%} 처리됨)")
+                else: st.error(f"삭제 실패: {delete_job['error']}")
+
+            # 삭제 버튼 (선택된 사람이 있을 때만 활성화)
+            if selected_names and not (delete_job and delete_job['status'] in JOB_ACTIVE):
+                st.error(f"선택한 {len(selected_names)}명의 회원을 정말로 삭제하시겠습니까?")
+                # 실수 방지용 체크박스
+                if st.checkbox("네, 영구 삭제에 동의합니다.", key="del_agree"):
+                    if st.button("선택한 회원 일괄 삭제 실행", type="primary"):
                     
-                    # 선택된 이름들을 ID 리스트로 변환
-                    target_ids = [student_dict[name] for name in selected_names]
-                    
-                    with get_db_connection() as conn:
-                        cur = conn.cursor()
-                        # SQL 구문 생성을 위한 플레이스홀더 (?,?,? 형태) 만들기
-                        placeholders = ','.join('?' * len(target_ids))
-                        
-                        # 1. 사용자 테이블에서 삭제
-                        cur.execute(f"DELETE FROM users WHERE id IN ({placeholders})", target_ids)
-                        # 2. 관련 학습 기록 삭제 (daily_plans)
-                        cur.execute(f"DELETE FROM daily_plans WHERE user_id IN ({placeholders})", target_ids)
-                        # 3. 관련 메시지 삭제 (messages)
-                        cur.execute(f"DELETE FROM messages WHERE from_id IN ({placeholders}) OR to_id IN ({placeholders})", target_ids * 2)
-                        
-                        conn.commit()
+                        # 선택된 이름들을 ID 리스트로 변환
+                        target_ids = [student_dict[name] for name in selected_names]
                     
-                    st.success(f"✅ {len(selected_names)}명의 회원이 정상적으로 삭제되었습니다.")
-                    time.sleep(1.5)
-                    st.rerun() # 화면 새로고침하여 리스트 갱신
+                        st.session_state['delete_job'] = submit_job("delete_users", {'user_ids': [int(i) for i in target_ids]}, created_by=user['id'])
+                        st.rerun() # 화면 새로고침하여 리스트 갱신
 
 # -----------------------------------------------------------------------------
 # 4. [핵심] 단독 실행 보장 코드
 # -----------------------------------------------------------------------------
 if __name__ == "__main__":
-    st.session_state['user'] = {'id': 1, 'role': 'admin', 'real_name': '관리자(단독실행)'}
+    use_branch()
+    run_migrations()
+    # 단독 실행: 로그인 정보가 없을 때만 show_admin 이 테스트 관리자로 전환 (주소창 토큰은 역할 확인)
     show_admin()
\ No newline at end of file
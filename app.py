@@ -1,9 +1,17 @@
 import streamlit as st
-import sqlite3
 import pandas as pd
 import datetime
 import calendar
 
+from auth import authenticate
+from chat import render_chat
+from db import get_db_connection
+from figure_cache import cached_figure, figure_version
+from migrations import run_migrations
+from plans import load_signal_scores, load_subject_stats
+from query_cache import cached_read_sql, invalidate_on_commit
+from sessions import end_session, restore_session, start_session, use_branch
+
 # [시스템 무결성] 라이브러리 체크
 try:
     import plotly.graph_objects as go
@@ -21,7 +29,6 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-DB_NAME = "5a_planner_v3_test.db" # 기존 DB 공유
 COLOR_PRIMARY = "#007AFF"
 COLOR_BG = "#F5F5F7"
 COLOR_MY_MSG = "#007AFF"
@@ -44,17 +51,6 @@ def inject_custom_css():
     </style>
     """, unsafe_allow_html=True)
 
-def get_db_connection(): return sqlite3.connect(DB_NAME, check_same_thread=False)
-
-def init_db():
-    with get_db_connection() as conn:
-        c = conn.cursor()
-        c.execute('''CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE, password TEXT, role TEXT, real_name TEXT, group_color TEXT)''')
-        c.execute('''CREATE TABLE IF NOT EXISTS monthly_goals (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, year_month TEXT, subject TEXT, content TEXT, total_amount INTEGER, week_days TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-        c.execute('''CREATE TABLE IF NOT EXISTS daily_plans (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, plan_date DATE, subject TEXT, content TEXT, achievement INTEGER DEFAULT 0, linked_monthly_id INTEGER)''')
-        c.execute('''CREATE TABLE IF NOT EXISTS messages (id INTEGER PRIMARY KEY AUTOINCREMENT, from_id INTEGER, to_id INTEGER, message TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-        conn.commit()
-
 # -----------------------------------------------------------------------------
 # 3. [핵심 수정] AI 분석 로직 (경고 후 분석 진행)
 # -----------------------------------------------------------------------------
@@ -100,35 +96,33 @@ def generate_analysis_report(student_name, start_date, end_date, df):
     
     return report
 
-def render_chat(user_id, other_id):
-    with get_db_connection() as conn:
-        msgs = pd.read_sql("SELECT * FROM messages WHERE (from_id=? AND to_id=?) OR (from_id=? AND to_id=?) ORDER BY created_at ASC", conn, params=(user_id, other_id, other_id, user_id))
-    if msgs.empty: st.info("메시지 내역 없음")
-    else:
-        chat_html = '<div class="chat-container">'
-        for _, row in msgs.iterrows():
-            cls = "msg-me" if row['from_id'] == user_id else "msg-other"
-            chat_html += f'<div class="msg-bubble {cls}">{row["message"]}</div>'
-        chat_html += '</div>'
-        st.markdown(chat_html, unsafe_allow_html=True)
-
 # -----------------------------------------------------------------------------
 # 4. 관리자 대시보드 (Admin View)
 # -----------------------------------------------------------------------------
+def balance_figure(radar_df, sname):
+    """과목별 밸런스 (평균 성취도 방사형)"""
+    categories = radar_df['subject'].tolist()
+    values = radar_df['achievement'].tolist()
+    categories.append(categories[0])
+    values.append(values[0])
+    fig = go.Figure(data=go.Scatterpolar(r=values, theta=categories, fill='toself', name=sname, line_color='#007AFF'))
+    fig.update_layout(polar=dict(radialaxis=dict(visible=True, range=[0, 100])), showlegend=False, margin=dict(l=40, r=40, t=20, b=20), height=300)
+    return fig
+
 def admin_dashboard():
     user = st.session_state['user']
     with st.sidebar:
         st.title("5A Admin")
         st.markdown(f"관리자: **{user['real_name']}**님")
-        if st.button("로그아웃"): del st.session_state['user']; st.rerun()
+        if st.button("로그아웃"): end_session(); st.rerun()
         st.markdown("---")
         
         search_query = st.text_input("🔍 학생 검색", placeholder="이름 입력")
         
         with get_db_connection() as conn: 
-            students = pd.read_sql("SELECT id, real_name, group_color FROM users WHERE role='student' ORDER BY real_name", conn)
+            students = cached_read_sql(conn, "SELECT id, real_name, group_color FROM users WHERE role='student' ORDER BY real_name", tables=["users"])
             seven_days_ago = datetime.date.today() - datetime.timedelta(days=7)
-            stats = pd.read_sql(f"SELECT user_id, AVG(achievement) as avg_score FROM daily_plans WHERE plan_date >= '{seven_days_ago}' GROUP BY user_id", conn)
+            stats = load_signal_scores(conn, seven_days_ago)
         
         if not stats.empty:
             students = pd.merge(students, stats, left_on='id', right_on='user_id', how='left')
@@ -157,9 +151,11 @@ def admin_dashboard():
     if not sid: st.info("👈 왼쪽 사이드바에서 학생을 선택해주세요."); return
 
     sname = students[students['id']==sid].iloc[0]['real_name']
+    fig_version = figure_version(sid)   # 데이터를 읽기 전에 (그림 캐시 버전)
     with get_db_connection() as conn:
         query = "SELECT * FROM daily_plans WHERE user_id=? AND plan_date BETWEEN ? AND ? ORDER BY plan_date"
-        df = pd.read_sql(query, conn, params=(sid, start_d, end_d))
+        df = cached_read_sql(conn, query, (sid, start_d, end_d), user_id=sid, tables=["daily_plans"])
+        subj_stats = load_subject_stats(conn, sid, start_d, end_d)
 
     st.markdown(f"## 📊 {sname} 학생 정밀 분석")
     st.caption(f"분석 기준: {start_d} ~ {end_d}")
@@ -170,22 +166,17 @@ def admin_dashboard():
     with c_left:
         st.markdown("### 📊 과목별 성취도 (Avg)")
         with st.container(border=True):
-            subj_avg = df.groupby('subject')['achievement'].mean()
+            subj_avg = subj_stats['mean']
             st.bar_chart(subj_avg, color="#007AFF")
 
     with c_right:
         st.markdown("### 🕸️ 과목별 밸런스 (Balance)")
         with st.container(border=True):
-            radar_df = df.groupby('subject')['achievement'].mean().reset_index()
+            radar_df = subj_stats['mean'].rename('achievement').reset_index()
             if not radar_df.empty:
                 if HAS_PLOTLY:
-                    categories = radar_df['subject'].tolist()
-                    values = radar_df['achievement'].tolist()
-                    categories.append(categories[0])
-                    values.append(values[0])
-                    fig = go.Figure(data=go.Scatterpolar(r=values, theta=categories, fill='toself', name=sname, line_color='#007AFF'))
-                    fig.update_layout(polar=dict(radialaxis=dict(visible=True, range=[0, 100])), showlegend=False, margin=dict(l=40, r=40, t=20, b=20), height=300)
-                    st.plotly_chart(fig, use_container_width=True)
+                    # 같은 학생/기간이면 저장해 둔 그림 재사용 (figure_cache.py)
+                    st.plotly_chart(cached_figure("balance_small", sid, (start_d, end_d), fig_version, lambda: balance_figure(radar_df, sname)), use_container_width=True)
                 else: st.bar_chart(radar_df.set_index('subject'))
 
     col_ai, col_chat = st.columns([1, 1])
@@ -198,7 +189,9 @@ def admin_dashboard():
             val = st.session_state.get('ai_rep', "")
             final_msg = st.text_area("분석 내용", value=val, height=300)
             if st.button("메시지로 전송"):
-                with get_db_connection() as conn: conn.execute("INSERT INTO messages (from_id, to_id, message) VALUES (?,?,?)", (user['id'], sid, final_msg))
+                with get_db_connection() as conn:
+                    conn.execute("INSERT INTO messages (from_id, to_id, message) VALUES (?,?,?)", (user['id'], sid, final_msg))
+                    invalidate_on_commit(conn, ["messages"], [user['id'], sid])
                 st.success("전송 완료!"); st.rerun()
 
     with col_chat:
@@ -211,8 +204,9 @@ def admin_dashboard():
 # -----------------------------------------------------------------------------
 def main():
     inject_custom_css()
-    init_db()
-    if 'user' not in st.session_state:
+    use_branch()
+    run_migrations()
+    if not restore_session(roles=('admin',)):
         _, col, _ = st.columns([1,1,1])
         with col:
             st.markdown("<br><br>", unsafe_allow_html=True)
@@ -221,11 +215,11 @@ def main():
                 uid = st.text_input("아이디")
                 upw = st.text_input("비밀번호", type="password")
                 if st.button("로그인"):
-                    with get_db_connection() as conn:
-                        user = conn.execute("SELECT id, role, real_name FROM users WHERE username=? AND password=?", (uid, upw)).fetchone()
-                    if user and user[1] == 'admin':
-                        st.session_state['user'] = {'id':user[0], 'role':user[1], 'real_name':user[2]}
+                    status, user = authenticate(uid, upw)
+                    if status == 'ok' and user['role'] == 'admin':
+                        start_session(user)
                         st.rerun()
+                    elif status == 'locked': st.error("로그인 실패가 너무 많습니다. 잠시 후 다시 시도해주세요.")
                     else: st.error("관리자 계정이 아닙니다.")
     else:
         admin_dashboard()
@@ -0,0 +1,184 @@
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+
+from db import current_tenant, get_db_connection, insert_id
+from query_cache import add_invalidation_listener, invalidate_on_commit
+
+# -----------------------------------------------------------------------------
+# 1. 비밀번호 해시 (PBKDF2-SHA256 + 사용자별 salt)
+# -----------------------------------------------------------------------------
+# 저장 형식: pbkdf2_sha256$반복횟수$salt$해시
+# 반복 횟수를 올리면 다음 로그인 때 자동으로 새 횟수로 다시 저장됩니다.
+PASSWORD_ITERATIONS = int(os.environ.get("PLANNER_PW_ITERATIONS", "120000"))
+HASH_PREFIX = "pbkdf2_sha256"
+
+def hash_password(password, iterations=None):
+    iterations = iterations or PASSWORD_ITERATIONS
+    salt = secrets.token_hex(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), bytes.fromhex(salt), iterations).hex()
+    return f"{HASH_PREFIX}${iterations}${salt}${digest}"
+
+def verify_password(password, stored):
+    """(일치 여부, 다시 해시해서 저장해야 하는지)"""
+    if not stored:
+        return False, False
+    if not stored.startswith(HASH_PREFIX + "$"):
+        # 예전 평문 비밀번호 → 맞으면 이번 로그인에 해시로 바꿔 저장
+        return hmac.compare_digest(stored.encode(), password.encode()), True
+    _, iterations, salt, digest = stored.split("$")
+    check = hashlib.pbkdf2_hmac("sha256", password.encode(), bytes.fromhex(salt), int(iterations)).hex()
+    return hmac.compare_digest(check, digest), int(iterations) != PASSWORD_ITERATIONS
+
+# 없는 아이디도 같은 시간이 걸리도록 (아이디 존재 여부가 응답 속도로 드러나지 않게)
+_DUMMY_HASH = hash_password("dummy-password")
+
+# -----------------------------------------------------------------------------
+# 2. 사용자 조회 캐시 (아이디 → 사용자 정보, 프로세스당 LRU)
+# -----------------------------------------------------------------------------
+# 등원 시간대 로그인 몰림을 DB 대신 메모리에서 처리. users 테이블이 바뀌면
+# (invalidate_on_commit(conn, ["users"]) 커밋 시점) 통째로 비웁니다. 지점마다 같은 아이디가 있을 수 있어 키는 (지점, 아이디).
+USER_CACHE_SIZE = int(os.environ.get("PLANNER_USER_CACHE_SIZE", "5000"))
+USER_FIELDS = ('id', 'username', 'password', 'role', 'real_name', 'group_color')
+
+class UserIndex:
+    def __init__(self, max_entries=USER_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            record = self._entries.get(key)
+            if record is not None:
+                self._entries.move_to_end(key)
+            return record
+
+    def put(self, key, record, generation):
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = record
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+
+user_index = UserIndex()
+
+def _on_invalidate(tables, user_ids):
+    if "users" in tables:
+        user_index.clear()
+
+add_invalidation_listener(_on_invalidate)
+
+def find_user(username):
+    """아이디로 사용자 정보 dict (없으면 None)"""
+    key = (current_tenant(), username)
+    record = user_index.get(key)
+    if record is None:
+        generation = user_index.generation
+        with get_db_connection() as conn:
+            row = conn.execute("SELECT id, username, password, role, real_name, group_color FROM users WHERE username=?", (username,)).fetchone()
+        if row is None:
+            return None
+        record = dict(zip(USER_FIELDS, row))
+        user_index.put(key, record, generation)
+    return record
+
+# -----------------------------------------------------------------------------
+# 3. 로그인 시도 제한 (아이디별, 최근 N분 동안 실패 횟수)
+# -----------------------------------------------------------------------------
+LOGIN_MAX_FAILURES = int(os.environ.get("PLANNER_LOGIN_MAX_FAILURES", "5"))
+LOGIN_WINDOW_SEC = int(os.environ.get("PLANNER_LOGIN_WINDOW", "300"))
+LOGIN_TRACK_MAX = 10000     # 기록해 두는 아이디 수 상한 (없는 아이디를 계속 넣어도 메모리가 늘지 않게)
+
+class RateLimiter:
+    def __init__(self, max_failures=LOGIN_MAX_FAILURES, window=LOGIN_WINDOW_SEC, max_keys=LOGIN_TRACK_MAX):
+        self.max_failures = max_failures
+        self.window = window
+        self.max_keys = max_keys
+        self._failures = OrderedDict()  # key -> 실패 시각 deque (마지막 실패가 오래된 순)
+        self._lock = threading.Lock()
+
+    def _recent(self, key, now):
+        failures = self._failures.get(key)
+        while failures and failures[0] < now - self.window:
+            failures.popleft()
+        if failures is not None and not failures:
+            del self._failures[key]     # 기간이 지난 기록만 있던 키는 삭제
+            return None
+        return failures
+
+    def is_locked(self, key):
+        with self._lock:
+            failures = self._recent(key, time.monotonic())
+            return bool(failures) and len(failures) >= self.max_failures
+
+    def fail(self, key):
+        with self._lock:
+            now = time.monotonic()
+            self._recent(key, now)
+            self._failures.setdefault(key, deque()).append(now)
+            self._failures.move_to_end(key)
+            # 앞쪽(마지막 실패가 가장 오래된) 키부터: 기간이 지났거나 상한을 넘으면 삭제
+            while self._failures:
+                oldest, failures = next(iter(self._failures.items()))
+                if failures[-1] >= now - self.window and len(self._failures) <= self.max_keys:
+                    break
+                del self._failures[oldest]
+
+    def reset(self, key):
+        with self._lock:
+            self._failures.pop(key, None)
+
+
+login_limiter = RateLimiter()
+
+# -----------------------------------------------------------------------------
+# 4. 로그인 / 가입
+# -----------------------------------------------------------------------------
+def public_user(record):
+    """세션에 넣을 사용자 정보 (비밀번호 해시 제외)"""
+    return {k: record[k] for k in USER_FIELDS if k != 'password'}
+
+def authenticate(username, password):
+    """(결과, 사용자 dict) - 결과: 'ok' / 'pending' / 'invalid' / 'locked'"""
+    username = (username or "").strip()
+    limit_key = f"{current_tenant()}:{username}"
+    if login_limiter.is_locked(limit_key):
+        return 'locked', None
+    record = find_user(username)
+    ok, needs_rehash = verify_password(password or "", record['password'] if record else _DUMMY_HASH)
+    if record is None or not ok:
+        login_limiter.fail(limit_key)
+        return 'invalid', None
+    login_limiter.reset(limit_key)
+    if needs_rehash:
+        set_password(record['id'], password)
+    if record['role'] == 'pending':
+        return 'pending', public_user(record)
+    return 'ok', public_user(record)
+
+def set_password(user_id, password):
+    with get_db_connection() as conn:
+        conn.execute("UPDATE users SET password=? WHERE id=?", (hash_password(password), user_id))
+        invalidate_on_commit(conn, ["users"])
+        conn.commit()
+
+def create_user(conn, username, password, real_name, role='pending', group_color=None, password_hash=None):
+    """회원 추가 (비밀번호는 해시로 저장) → 새 id. 커밋은 호출한 쪽에서.
+    password_hash: 같은 비밀번호로 여러 명을 만들 때 미리 만든 해시를 재사용"""
+    new_id = insert_id(conn, "INSERT INTO users (username, password, role, real_name, group_color) VALUES (?,?,?,?,?)",
+                       (username, password_hash or hash_password(password), role, real_name, group_color))
+    invalidate_on_commit(conn, ["users"])
+    return new_id
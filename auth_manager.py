@@ -1,43 +1,17 @@
 import streamlit as st
-import sqlite3
-import pandas as pd
 import datetime
 
 # -----------------------------------------------------------------------------
-# 1. DB 설정 및 연결 함수 (이 부분이 사라져서 에러가 났던 겁니다!)
+# 1. DB 설정 및 연결 함수 (공용 커넥션 풀 db.py 사용, main.py와 같은 DB를 봅니다)
 # -----------------------------------------------------------------------------
-DB_NAME = "5a_live.db"
+from auth import authenticate, create_user
+from db import get_db_connection, read_sql
+from migrations import run_migrations
+from query_cache import invalidate_on_commit
+from sessions import end_session
 
-def get_db_connection():
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def init_db():
-    with get_db_connection() as conn:
-        # 학습 계획 테이블
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS daily_plans (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT,
-                plan_date DATE,
-                subject TEXT,
-                content TEXT,
-                achievement INTEGER DEFAULT 0
-            )
-        ''')
-        # 사용자 테이블 (승인 대기 기능 포함)
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id TEXT PRIMARY KEY,
-                password TEXT NOT NULL,
-                real_name TEXT NOT NULL,
-                role TEXT DEFAULT 'student',
-                approved INTEGER DEFAULT 0,
-                joined_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        conn.commit()
+# 테이블 생성은 migrations.py 에서 버전별로 관리 (예전 호출부 호환용 이름)
+init_db = run_migrations
 
 # -----------------------------------------------------------------------------
 # 2. 로그인 페이지 (모바일/태블릿 반응형 적용 완료)
@@ -69,20 +43,18 @@ def login_page():
                     if submit:
                         # 1. 관리자 마스터 키 (줄 맞춤 주의: if와 with가 같은 라인에 있어야 함)
                         if login_id == "admin1234" and login_pw == "admin1234":
-                            return {'id': 'admin1234', 'real_name': '관리자', 'role': 'admin', 'approved': 1}
+                            return {'id': 'admin1234', 'real_name': '관리자', 'role': 'admin'}
                         
-                        # 2. 학생 DB 조회
-                        with get_db_connection() as conn:
-                            user = pd.read_sql("SELECT * FROM users WHERE id=? AND password=?", 
-                                            conn, params=(login_id, login_pw))
+                        # 2. 학생 조회 (메모리 캐시 + 해시 비교)
+                        status, user = authenticate(login_id, login_pw)
                         
                         # 3. 결과 처리
-                        if not user.empty:
-                            user_data = user.iloc[0]
-                            if user_data['approved'] == 1:
-                                return user_data.to_dict() 
-                            else:
-                                st.warning("⏳ 선생님 승인 대기 중입니다.")
+                        if status == 'ok':
+                            return user
+                        elif status == 'pending':
+                            st.warning("⏳ 선생님 승인 대기 중입니다.")
+                        elif status == 'locked':
+                            st.error("로그인 실패가 너무 많습니다. 잠시 후 다시 시도해주세요.")
                         else:
                             st.error("아이디 또는 비밀번호가 일치하지 않습니다.")
             
@@ -101,8 +73,7 @@ def login_page():
                         elif new_name and new_id and new_pw:
                             try:
                                 with get_db_connection() as conn:
-                                    conn.execute("INSERT INTO users (id, password, real_name, approved) VALUES (?, ?, ?, 0)",
-                                                (new_id, new_pw, new_name))
+                                    create_user(conn, new_id, new_pw, new_name)
                                     conn.commit()
                                 st.success("✅ 신청 완료! 승인 대기 중입니다.")
                             except:
@@ -122,7 +93,7 @@ def admin_page():
     with c1: st.title("👨‍🏫 관리자 대시보드")
     with c2:
         if st.button("로그아웃", use_container_width=True):
-            del st.session_state['user']
+            end_session()
             st.rerun()
 
     # 2. 관리자 인증
@@ -141,31 +112,33 @@ def admin_page():
         
         # --- [Tab 1] 가입 승인 ---
         with tab1:
-            pending_users = pd.read_sql("SELECT id, real_name, joined_at FROM users WHERE approved=0", conn)
+            pending_users = read_sql("SELECT id, username, real_name, created_at FROM users WHERE role='pending'", conn)
             
             if pending_users.empty:
                 st.success("🎉 현재 승인 대기 중인 학생이 없습니다.")
             else:
                 st.info(f"총 {len(pending_users)}명이 승인을 기다립니다.")
                 if st.button("🚀 전원 승인하기", use_container_width=True):
-                    conn.execute("UPDATE users SET approved=1 WHERE approved=0")
+                    conn.execute("UPDATE users SET role='student' WHERE role='pending'")
+                    invalidate_on_commit(conn, ["users"])
                     conn.commit()
                     st.rerun()
                 
                 for _, row in pending_users.iterrows():
                     with st.container(border=True):
                         c_a, c_b, c_c = st.columns([2, 2, 2])
-                        c_a.write(f"**{row['real_name']}** ({row['id']})")
-                        c_b.caption(str(row['joined_at'])[:16])
+                        c_a.write(f"**{row['real_name']}** ({row['username']})")
+                        c_b.caption(str(row['created_at'])[:16])
                         if c_c.button("승인", key=f"ok_{row['id']}", use_container_width=True):
-                            conn.execute("UPDATE users SET approved=1 WHERE id=?", (row['id'],))
+                            conn.execute("UPDATE users SET role='student' WHERE id=?", (row['id'],))
+                            invalidate_on_commit(conn, ["users"])
                             conn.commit()
                             st.rerun()
 
         # --- [Tab 2] 전체 학생 관리 (여기가 새로 추가된 부분!) ---
         with tab2:
-            # 승인된(approved=1) 학생만 가져오기 (관리자 제외)
-            active_users = pd.read_sql("SELECT id, real_name, joined_at FROM users WHERE approved=1 AND role='student'", conn)
+            # 승인된 학생만 가져오기 (관리자/대기자 제외)
+            active_users = read_sql("SELECT id, username, real_name, created_at FROM users WHERE role='student'", conn)
             
             st.write(f"📚 현재 총 **{len(active_users)}명**의 학생이 학습 중입니다.")
             
@@ -178,7 +151,8 @@ def admin_page():
                 col_del, col_btn = st.columns([3, 1])
                 target_id = col_del.text_input("삭제할 학생 아이디 입력")
                 if col_btn.button("삭제 실행", type="primary"):
-                    conn.execute("DELETE FROM users WHERE id=?", (target_id,))
+                    conn.execute("DELETE FROM users WHERE username=?", (target_id,))
+                    invalidate_on_commit(conn, ["users"])
                     conn.commit()
                     st.warning(f"{target_id} 계정이 삭제되었습니다.")
                     st.rerun()
\ No newline at end of file
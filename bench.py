@@ -0,0 +1,255 @@
+import argparse
+import calendar
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+
+import numpy as np
+
+import db
+import query_cache
+from auth import find_user, user_index
+from calendar_data import build_calendar_data, day_map, month_range
+from chat import bubble_html, chat_html, fetch_latest
+from db import get_db_connection
+from insights import student_report
+from plans import distribute_plan, load_daily_stats, load_signal_scores, load_subject_stats, plan_dates
+from query_cache import cached_read_sql
+from roster import Roster
+from seed_data import generate
+from trends import pick_freq, trend_series
+
+# -----------------------------------------------------------------------------
+# 1. 벤치마크 설정 (데이터 크기별 DB를 만들어 두고 재사용)
+# -----------------------------------------------------------------------------
+# 사용 예: python bench.py --sizes 100,1000 --json bench_before.json
+#         python bench.py --sizes 100,1000 --compare bench_before.json
+# 같은 크기 DB는 --data-dir 에 남겨두므로 커밋을 바꿔가며 같은 데이터로 비교할 수 있습니다.
+BENCH_SIZES = [100, 1000]           # 학생 수
+BENCH_DAYS = 180                    # 학생당 기간(일)
+BENCH_END = datetime.date(2025, 12, 31)     # 날짜 고정 → 매번 같은 데이터
+BENCH_SEED = 5
+BENCH_DATA_DIR = ".bench"
+MIN_ROUNDS = 5
+MIN_TIME_SEC = 1.0
+REGRESSION_THRESHOLD = 0.20         # 중앙값이 20% 넘게 느려지면 표시 (같은 기계에서도 ±10% 정도는 흔들림)
+
+_benchmarks = []
+
+def benchmark(name):
+    """벤치마크 등록: setup(conn, ctx) → 한 번 실행할 함수 fn(conn, i)"""
+    def register(setup):
+        _benchmarks.append((name, setup))
+        return setup
+    return register
+
+def _pick(ctx, i):
+    # 매 회 다른 학생 (같은 학생 반복 조회로 DB 페이지 캐시만 재는 것 방지)
+    return ctx['student_ids'][(i * 7919) % len(ctx['student_ids'])]
+
+# -----------------------------------------------------------------------------
+# 2. 측정 대상 (화면이 한 번 그려질 때 실제로 하는 일과 같은 단위)
+# -----------------------------------------------------------------------------
+@benchmark("sidebar_signal")
+def _sidebar_signal(conn, ctx):
+    since = ctx['today'] - datetime.timedelta(days=7)
+    def run(conn, i):
+        students = cached_read_sql(conn, "SELECT id, real_name, group_color FROM users WHERE role='student' ORDER BY real_name", tables=["users"])
+        stats = load_signal_scores(conn, since)
+        return students.merge(stats, left_on='id', right_on='user_id', how='left')
+    return run
+
+@benchmark("student_analysis")
+def _student_analysis(conn, ctx):
+    start, end = ctx['today'] - datetime.timedelta(days=30), ctx['today']
+    def run(conn, i):
+        sid = _pick(ctx, i)
+        load_daily_stats(conn, sid, start, end)
+        load_subject_stats(conn, sid, start, end)
+        cached_read_sql(conn, "SELECT log_date, resolution, review FROM daily_logs WHERE user_id=? AND log_date BETWEEN ? AND ? ORDER BY log_date DESC",
+                        (sid, start, end), user_id=sid, tables=["daily_logs"])
+    return run
+
+@benchmark("calendar_prep")
+def _calendar_prep(conn, ctx):
+    # admin_app.render_native_calendar 가 버튼을 그리기 전까지 하는 일 (조회 + 날짜별 요약)
+    year, month = ctx['today'].year, ctx['today'].month
+    start, end = month_range(year, month)
+    def run(conn, i):
+        sid = _pick(ctx, i)
+        df = cached_read_sql(conn, "SELECT * FROM daily_plans WHERE user_id=? AND plan_date BETWEEN ? AND ?", (sid, start, end), user_id=sid, tables=["daily_plans"])
+        cal_days = day_map(build_calendar_data(df, start, end))
+        return [[cal_days[datetime.date(year, month, d)]['count'] if d else 0 for d in week] for week in calendar.monthcalendar(year, month)]
+    return run
+
+@benchmark("chat_html")
+def _chat_html(conn, ctx):
+    # chat.render_chat 첫 화면: 최근 메시지 조회 + 말풍선 HTML
+    def run(conn, i):
+        rows = fetch_latest(conn, ctx['admin_id'], _pick(ctx, i))
+        return chat_html([bubble_html(r, ctx['admin_id']) for r in rows])
+    return run
+
+@benchmark("distribute_period_plan")
+def _distribute_period_plan(conn, ctx):
+    # student_app.distribute_period_plan 과 같은 계산/쓰기 (매 회 롤백해서 DB 크기 유지)
+    start, end = ctx['today'] - datetime.timedelta(days=90), ctx['today']
+    def run(conn, i):
+        dates = plan_dates(start, end, [0, 2, 4])
+        distribute_plan(conn, _pick(ctx, i), f"{start}~{end}", "수학", "쎈 수학", 1, 320, dates, [0, 2, 4])
+        conn.rollback()
+    return run
+
+@benchmark("deep_insight")
+def _deep_insight(conn, ctx):
+    start, end = ctx['today'] - datetime.timedelta(days=90), ctx['today']
+    def run(conn, i):
+        stats = load_subject_stats(conn, _pick(ctx, i), start, end)
+        if not stats.empty:
+            student_report(stats, "학생")
+    return run
+
+@benchmark("login_lookup")
+def _login_lookup(conn, ctx):
+    def run(conn, i):
+        find_user(ctx['usernames'][(i * 7919) % len(ctx['usernames'])])
+    return run
+
+@benchmark("roster_build")
+def _roster_build(conn, ctx):
+    # 관리자 사이드바 명단을 처음부터 만들 때 (users 가 바뀐 직후 / TTL 만료)
+    def run(conn, i):
+        Roster().refresh(conn, ctx['today'])
+    return run
+
+@benchmark("roster_search")
+def _roster_search(conn, ctx):
+    # 사이드바 검색창 한 글자 입력마다 (이름 / 초성 / 섞어서)
+    roster = Roster()
+    roster.refresh(conn, ctx['today'])
+    queries = ["김", "ㄱㅁ", "민", "ㅅㅇ", "이서", "박ㅈ", ""]
+    def run(conn, i):
+        return roster.search(queries[i % len(queries)], 0)
+    return run
+
+@benchmark("trend_series")
+def _trend_series(conn, ctx):
+    # 분석 탭 성적 추이: 집계표 조회 + 묶기/이동 평균/점 줄이기 (기간 = 데이터 전체)
+    start, end = ctx['today'] - datetime.timedelta(days=365 * 3), ctx['today']
+    def run(conn, i):
+        daily = load_daily_stats(conn, _pick(ctx, i), start, end)
+        return trend_series(daily, pick_freq(start, end))
+    return run
+
+# -----------------------------------------------------------------------------
+# 3. 실행기 (pytest-benchmark 와 같은 통계, ms 단위)
+# -----------------------------------------------------------------------------
+def _dataset(size, days=BENCH_DAYS, data_dir=BENCH_DATA_DIR):
+    """크기별 벤치마크 DB 경로 (없으면 생성)"""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"bench_{size}s_{days}d.db")
+    if not os.path.exists(path):
+        print(f"데이터 생성: 학생 {size:,}명 × {days}일 → {path}")
+        generate(size, BENCH_END - datetime.timedelta(days=days - 1), BENCH_END, path=path, seed=BENCH_SEED, log=None)
+    return path
+
+def _context(conn):
+    users = conn.execute("SELECT id, username FROM users WHERE role='student' ORDER BY id").fetchall()
+    admin_id = conn.execute("SELECT id FROM users WHERE role='admin' ORDER BY id LIMIT 1").fetchone()[0]
+    return {'student_ids': [u[0] for u in users], 'usernames': [u[1] for u in users], 'admin_id': admin_id, 'today': BENCH_END}
+
+def measure(fn, conn, min_rounds=MIN_ROUNDS, min_time=MIN_TIME_SEC):
+    """워밍업 1회 후 min_rounds 회 이상, min_time 초 이상 반복 → 통계 dict"""
+    fn(conn, 0)
+    times = []
+    started = time.perf_counter()
+    while len(times) < min_rounds or time.perf_counter() - started < min_time:
+        t0 = time.perf_counter()
+        fn(conn, len(times) + 1)
+        times.append((time.perf_counter() - t0) * 1000)
+    arr = np.asarray(times)
+    return {'rounds': len(times), 'min': round(arr.min(), 3), 'max': round(arr.max(), 3), 'mean': round(arr.mean(), 3),
+            'median': round(float(np.median(arr)), 3), 'stddev': round(statistics.pstdev(times), 3),
+            'p95': round(float(np.percentile(arr, 95)), 3)}
+
+def run(sizes=BENCH_SIZES, days=BENCH_DAYS, data_dir=BENCH_DATA_DIR, only=None, min_rounds=MIN_ROUNDS, min_time=MIN_TIME_SEC):
+    """[{'name', 'size', 'stats'}] - 조회 캐시는 끄고 DB/계산 자체를 잰다"""
+    query_cache.cache.max_entries = 0
+    user_index.max_entries = 0
+    results = []
+    for size in sizes:
+        path = _dataset(size, days, data_dir)
+        db.DB_URL = f"sqlite:///{path}"     # find_user 처럼 기본 DB를 쓰는 함수도 이 데이터를 보도록
+        with get_db_connection(path) as conn:
+            ctx = _context(conn)
+            for name, setup in _benchmarks:
+                if only and name not in only:
+                    continue
+                stats = measure(setup(conn, ctx), conn, min_rounds, min_time)
+                results.append({'name': name, 'size': size, 'stats': stats})
+                print(f"{name:<24}{size:>8,}{stats['median']:>10.2f}{stats['p95']:>10.2f}{stats['rounds']:>8}")
+    return results
+
+def _commit_id():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def machine_info():
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'machine': platform.machine(),
+            'cpu_count': os.cpu_count(), 'sqlite': db.sqlite3.sqlite_version}
+
+# -----------------------------------------------------------------------------
+# 4. 결과 비교 (이전 JSON 대비 중앙값 변화)
+# -----------------------------------------------------------------------------
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """기준 결과 대비 느려진 항목 목록 [(name, size, 비율)]"""
+    base = {(b['name'], b['size']): b['stats']['median'] for b in baseline['benchmarks']}
+    regressions = []
+    print(f"\n{'항목':<24}{'학생 수':>8}{'기준':>10}{'현재':>10}{'변화':>9}   (median ms, 기준 {baseline.get('commit') or '?'})")
+    for r in results:
+        before = base.get((r['name'], r['size']))
+        if not before:
+            continue
+        ratio = r['stats']['median'] / before - 1
+        flag = " ▲" if ratio > threshold else (" ▼" if ratio < -threshold else "")
+        print(f"{r['name']:<24}{r['size']:>8,}{before:>10.2f}{r['stats']['median']:>10.2f}{ratio:>+9.1%}{flag}")
+        if ratio > threshold:
+            regressions.append((r['name'], r['size'], ratio))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="5A 플래너 벤치마크 (주요 조회/화면 준비 단계의 실행 시간, 데이터 크기별)")
+    parser.add_argument("--sizes", default=",".join(map(str, BENCH_SIZES)), help="학생 수 목록 (쉼표 구분)")
+    parser.add_argument("--days", type=int, default=BENCH_DAYS, help="학생당 기간(일)")
+    parser.add_argument("--data-dir", default=BENCH_DATA_DIR, help="벤치마크 DB 보관 폴더")
+    parser.add_argument("--only", help="일부 항목만 (쉼표 구분)")
+    parser.add_argument("--min-rounds", type=int, default=MIN_ROUNDS)
+    parser.add_argument("--min-time", type=float, default=MIN_TIME_SEC, help="항목당 최소 측정 시간(초)")
+    parser.add_argument("--json", help="결과를 JSON 파일로 저장")
+    parser.add_argument("--compare", help="이전 결과 JSON 과 비교 (느려진 항목이 있으면 종료 코드 1)")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="느려짐 판정 비율 (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    print(f"{'항목':<24}{'학생 수':>8}{'median':>10}{'p95':>10}{'회':>8}   (ms)")
+    results = run([int(s) for s in args.sizes.split(",")], args.days, args.data_dir,
+                  args.only.split(",") if args.only else None, args.min_rounds, args.min_time)
+    output = {'commit': _commit_id(), 'datetime': datetime.datetime.now().isoformat(timespec='seconds'),
+              'machine': machine_info(), 'days': args.days, 'benchmarks': results}
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(output, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
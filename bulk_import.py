@@ -0,0 +1,235 @@
+import argparse
+import codecs
+import csv
+import datetime
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from auth import hash_password
+from db import get_db_connection, insert_id
+from plans import build_plan_rows, insert_plans, plan_dates
+from query_cache import invalidate_on_commit
+
+# -----------------------------------------------------------------------------
+# 1. 일괄 등록 설정 (학기 초 학생 명단 / 교재 일정 / 일간 계획을 CSV로)
+# -----------------------------------------------------------------------------
+# 파일을 한 줄씩 읽으면서 검사하고, 통과한 행만 IMPORT_CHUNK_SIZE 개씩 모아 한 트랜잭션으로 씁니다.
+# 잘못된 행은 건너뛰고 (줄 번호, 사유) 로 보고합니다. dry_run 이면 검사만 합니다.
+IMPORT_CHUNK_SIZE = 200
+IMPORT_MAX_ERRORS = 500         # 보고할 오류 행 최대 개수 (전체 개수는 따로 셈)
+INITIAL_PASSWORD = os.environ.get("PLANNER_IMPORT_PASSWORD", "1234")    # 비밀번호 칸이 비었을 때
+HASH_WORKERS = 4                # 비밀번호 해시는 GIL 밖에서 돌아가므로 스레드로 나눠 계산
+UPLOAD_DIR = os.environ.get("PLANNER_UPLOAD_DIR", "uploads")
+# 파일 인코딩: 먼저 utf-8(BOM 포함) → 안 되면 한글 엑셀의 기본 "CSV (쉼표로 분리)" 저장 형식인 cp949
+IMPORT_ENCODINGS = ("utf-8-sig", "cp949")
+ENCODING_CHECK_BLOCK = 1 << 20
+GROUP_COLORS = ("BLUE", "YELLOW", "RED")
+WEEKDAY_NAMES = "월화수목금토일"
+
+# 머리글: 영문 이름 또는 한글 이름 (export.py 로 내보낸 파일도 그대로 읽힘)
+HEADER_ALIASES = {
+    "아이디": "username", "비밀번호": "password", "이름": "real_name", "그룹": "group_color",
+    "날짜": "plan_date", "과목": "subject", "내용": "content", "교재": "content", "성취도": "achievement",
+    "시작쪽": "start_page", "끝쪽": "end_page", "시작일": "start_date", "종료일": "end_date", "요일": "week_days",
+}
+
+IMPORT_KINDS = {
+    'users': {
+        'label': "학생 명단",
+        'required': ["username", "real_name"],
+        'optional': ["password", "group_color"],
+    },
+    'goals': {
+        'label': "교재 일정 (목표 + 일간 계획 자동 분배)",
+        'required': ["username", "subject", "content", "start_page", "end_page", "start_date", "end_date", "week_days"],
+        'optional': [],
+    },
+    'plans': {
+        'label': "일간 계획",
+        'required': ["username", "plan_date", "subject", "content"],
+        'optional': ["achievement"],
+    },
+}
+
+class RowError(ValueError):
+    pass
+
+# -----------------------------------------------------------------------------
+# 2. 행 검사 (행 하나 → DB에 쓸 값, 문제가 있으면 RowError)
+# -----------------------------------------------------------------------------
+def _text(row, key, required=True):
+    value = (row.get(key) or "").strip()
+    if required and not value:
+        raise RowError(f"'{key}' 값이 비어 있습니다.")
+    return value
+
+def _int(row, key, low=None, high=None):
+    try:
+        value = int(float(_text(row, key)))
+    except (ValueError, OverflowError):     # "1e400" / "inf" 는 OverflowError
+        raise RowError(f"'{key}' 는 숫자여야 합니다: {row.get(key)!r}")
+    if (low is not None and value < low) or (high is not None and value > high):
+        raise RowError(f"'{key}' 범위를 벗어났습니다: {value}")
+    return value
+
+def _date(row, key):
+    try:
+        return datetime.date.fromisoformat(_text(row, key)[:10])
+    except ValueError:
+        raise RowError(f"'{key}' 날짜 형식(YYYY-MM-DD)이 아닙니다: {row.get(key)!r}")
+
+def _weekdays(row, key):
+    """'월,수,금' / '월수금' / '0,2,4' → [0, 2, 4]"""
+    text = _text(row, key).replace(" ", "")
+    parts = text.split(",") if "," in text or text.isdigit() else list(text)
+    days = []
+    for p in parts:
+        if p.isdigit() and int(p) < 7: days.append(int(p))
+        elif p in WEEKDAY_NAMES: days.append(WEEKDAY_NAMES.index(p))
+        else: raise RowError(f"요일 형식이 잘못되었습니다: {row.get(key)!r}")
+    return sorted(set(days))
+
+def _user_id(row, ctx):
+    username = _text(row, "username")
+    uid = ctx['user_ids'].get(username)
+    if uid is None:
+        raise RowError(f"없는 아이디입니다: {username}")
+    return uid
+
+def _check_users(row, ctx):
+    username = _text(row, "username")
+    if username in ctx['user_ids']:
+        raise RowError(f"이미 있는 아이디입니다: {username}")
+    if username in ctx['seen']:
+        raise RowError(f"파일 안에서 중복된 아이디입니다: {username}")
+    group = _text(row, "group_color", required=False).upper() or None
+    if group is not None and group not in GROUP_COLORS:
+        raise RowError(f"그룹은 {'/'.join(GROUP_COLORS)} 중 하나여야 합니다: {group}")
+    ctx['seen'].add(username)
+    return (username, _text(row, "password", required=False) or INITIAL_PASSWORD, _text(row, "real_name"), group)
+
+def _check_goals(row, ctx):
+    uid = _user_id(row, ctx)
+    start_page, end_page = _int(row, "start_page", low=1), _int(row, "end_page", low=1)
+    if end_page < start_page:
+        raise RowError("끝쪽이 시작쪽보다 작습니다.")
+    start_date, end_date = _date(row, "start_date"), _date(row, "end_date")
+    weekdays = _weekdays(row, "week_days")
+    dates = plan_dates(start_date, end_date, weekdays)
+    if not dates:
+        raise RowError("기간 안에 선택한 요일이 없습니다.")
+    return (uid, f"{start_date}~{end_date}", _text(row, "subject"), _text(row, "content"), start_page, end_page, dates, weekdays)
+
+def _check_plans(row, ctx):
+    uid = _user_id(row, ctx)
+    achievement = _int(row, "achievement", 0, 100) if _text(row, "achievement", required=False) else 0
+    return (uid, str(_date(row, "plan_date")), _text(row, "subject"), _text(row, "content"), achievement, None)
+
+# -----------------------------------------------------------------------------
+# 3. 묶음 쓰기 (IMPORT_CHUNK_SIZE 행 = 트랜잭션 1개)
+# -----------------------------------------------------------------------------
+def _write_users(conn, rows):
+    with ThreadPoolExecutor(max_workers=HASH_WORKERS) as pool:
+        hashes = list(pool.map(hash_password, [r[1] for r in rows]))
+    conn.executemany("INSERT INTO users (username, password, role, real_name, group_color) VALUES (?,?,'student',?,?)",
+                     [(r[0], h, r[2], r[3]) for r, h in zip(rows, hashes)])
+    invalidate_on_commit(conn, ["users"])
+
+def _write_goals(conn, rows):
+    plan_rows = []
+    for uid, label, subject, content, start_page, end_page, dates, weekdays in rows:
+        monthly_id = insert_id(conn, "INSERT INTO monthly_goals (user_id, year_month, subject, content, total_amount, week_days) VALUES (?,?,?,?,?,?)",
+                               (uid, label, subject, content, end_page - start_page + 1, ",".join(map(str, weekdays))))
+        plan_rows += build_plan_rows(uid, subject, content, start_page, end_page, dates, monthly_id)
+    insert_plans(conn, plan_rows)
+
+def _write_plans(conn, rows):
+    insert_plans(conn, rows)
+
+_CHECKS = {'users': _check_users, 'goals': _check_goals, 'plans': _check_plans}
+_WRITERS = {'users': _write_users, 'goals': _write_goals, 'plans': _write_plans}
+
+# -----------------------------------------------------------------------------
+# 4. 실행 (백그라운드 작업 / 명령줄에서 호출)
+# -----------------------------------------------------------------------------
+def _reader(f, kind):
+    """머리글을 영문 이름으로 맞춘 DictReader (필수 열이 없으면 ValueError)"""
+    reader = csv.reader(f)
+    header = [HEADER_ALIASES.get(h.strip(), h.strip()) for h in next(reader, [])]
+    missing = [c for c in IMPORT_KINDS[kind]['required'] if c not in header]
+    if missing:
+        raise ValueError(f"필수 열이 없습니다: {', '.join(missing)}")
+    return (dict(zip(header, values)) for values in reader)
+
+def detect_encoding(path):
+    """파일 전체를 IMPORT_ENCODINGS 순서대로 디코딩해 보고 맞는 인코딩 반환 (하나도 안 맞으면 ValueError)
+    등록을 시작하기 전에 끝까지 확인하므로 중간에 깨진 글자를 만나 일부만 등록되는 일이 없음"""
+    for encoding in IMPORT_ENCODINGS:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            with open(path, "rb") as raw:
+                for block in iter(lambda: raw.read(ENCODING_CHECK_BLOCK), b""):
+                    decoder.decode(block)
+            decoder.decode(b"", final=True)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    raise ValueError("파일 인코딩을 알 수 없습니다. 엑셀에서 'CSV UTF-8 (쉼표로 분리)' 형식으로 다시 저장해 주세요.")
+
+def import_csv(conn, kind, path, dry_run=False, progress=None):
+    """CSV 파일(path)을 검사하고 (dry_run 이 아니면) 등록 → 결과 dict
+    {'kind', 'rows', 'imported', 'error_count', 'errors': [(줄 번호, 사유)], 'dry_run'}
+    progress(읽은 바이트, 전체 바이트): 묶음마다 호출 (예외를 내면 그 전 묶음까지만 반영)"""
+    if kind not in IMPORT_KINDS:
+        raise ValueError(f"알 수 없는 등록 종류: {kind}")
+    ctx = {'user_ids': dict(conn.execute("SELECT username, id FROM users").fetchall()), 'seen': set()}
+    check, write = _CHECKS[kind], _WRITERS[kind]
+    result = {'kind': kind, 'rows': 0, 'imported': 0, 'error_count': 0, 'errors': [], 'dry_run': dry_run}
+    size = os.path.getsize(path)
+    encoding = detect_encoding(path)
+    chunk = []
+
+    def flush():
+        if not dry_run and chunk:
+            write(conn, chunk)
+            conn.commit()
+        result['imported'] += len(chunk)
+        chunk.clear()
+        if progress: progress(raw.tell(), size)
+
+    with open(path, "rb") as raw:
+        # utf-8-sig: 엑셀에서 저장한 CSV 앞의 BOM 제거
+        f = io.TextIOWrapper(raw, encoding=encoding, newline="")
+        for line_no, row in enumerate(_reader(f, kind), start=2):
+            result['rows'] += 1
+            try:
+                chunk.append(check(row, ctx))
+            except RowError as e:
+                result['error_count'] += 1
+                if len(result['errors']) < IMPORT_MAX_ERRORS:
+                    result['errors'].append((line_no, str(e)))
+            if len(chunk) >= IMPORT_CHUNK_SIZE:
+                flush()
+        flush()
+    return result
+
+def upload_path(name):
+    return os.path.join(UPLOAD_DIR, name)
+
+def main():
+    parser = argparse.ArgumentParser(description="5A 플래너 CSV 일괄 등록 (학생 명단 / 교재 일정 / 일간 계획)")
+    parser.add_argument("kind", choices=list(IMPORT_KINDS))
+    parser.add_argument("csv", help="CSV 파일 경로 (utf-8 / utf-8-sig / cp949)")
+    parser.add_argument("--db", help="DB 경로 또는 URL (기본: PLANNER_DB_URL / PLANNER_DB)")
+    parser.add_argument("--dry-run", action="store_true", help="검사만 하고 저장하지 않음")
+    args = parser.parse_args()
+
+    with get_db_connection(args.db) as conn:
+        result = import_csv(conn, args.kind, args.csv, dry_run=args.dry_run)
+    print(f"{result['rows']:,}행 중 {result['imported']:,}행 {'검사 통과' if args.dry_run else '등록'}, 오류 {result['error_count']:,}행")
+    for line_no, error in result['errors']:
+        print(f"  {line_no}행: {error}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import calendar
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from db import get_db_connection
+from query_cache import cached_read_sql
+
+# -----------------------------------------------------------------------------
+# 1. 달력용 날짜별 요약표 (계획 목록을 한 번만 groupby)
+# -----------------------------------------------------------------------------
+# 달력 칸마다 df[df['plan_date'] == 날짜] 로 다시 거르지 않고,
+# 기간 전체를 날짜 순서 배열(하루 = 한 행)로 만들어 두고 꺼내 씁니다.
+
+def build_calendar_data(plans, start, end):
+    """plans(plan_date, achievement[, subject]) → start~end 모든 날짜의 요약표 (index=datetime.date)
+    columns: count(계획 수), done(100% 완료 수), ratio(완료율), avg(평균 성취도), subjects(과목 구성), status"""
+    days = pd.date_range(start, end, freq='D').date
+    summary = pd.DataFrame(index=pd.Index(days, name='plan_date'))
+    if plans.empty:
+        summary['count'] = 0
+        summary['done'] = 0
+        summary['avg'] = 0.0
+        summary['subjects'] = ""
+    else:
+        p = pd.DataFrame({
+            'plan_date': pd.to_datetime(plans['plan_date']).dt.date,
+            'achievement': pd.to_numeric(plans['achievement'], errors='coerce').fillna(0),
+        })
+        p['done'] = p['achievement'] == 100
+        g = p.groupby('plan_date')
+        summary['count'] = g.size().reindex(days, fill_value=0)
+        summary['done'] = g['done'].sum().reindex(days, fill_value=0).astype(int)
+        summary['avg'] = g['achievement'].mean().reindex(days, fill_value=0.0)
+        if 'subject' in plans:
+            # 과목 구성: "수학 2 · 영어 1"
+            mix = p.assign(subject=plans['subject'].fillna("기타").values).groupby(['plan_date', 'subject']).size()
+            labels = mix.index.get_level_values('subject') + " " + mix.astype(str).values
+            summary['subjects'] = pd.Series(labels, index=mix.index.get_level_values('plan_date')) \
+                .groupby(level=0).agg(' · '.join).reindex(days, fill_value="")
+        else:
+            summary['subjects'] = ""
+    summary['ratio'] = np.where(summary['count'] > 0, summary['done'] / summary['count'].clip(lower=1), 0.0)
+    # (기존 규칙 유지) 하루에 100% 완료한 계획이 하나라도 있으면 full
+    summary['status'] = np.select([summary['done'] > 0, summary['count'] > 0], ['full', 'plan'], 'none')
+    return summary
+
+def day_map(summary):
+    """{날짜: {'count':.., 'status':.., ...}} - 달력 칸에서 바로 꺼내 쓰는 용도"""
+    return summary.to_dict('index')
+
+def month_calendar(user_id, year, month):
+    """학생 한 명의 한 달 day_map (학생 화면 '이번 달 학습 흐름' 용)"""
+    start, end = month_range(year, month)
+    with get_db_connection() as conn:
+        plans = cached_read_sql(conn, "SELECT plan_date, achievement FROM daily_plans WHERE user_id=? AND plan_date BETWEEN ? AND ?", (user_id, str(start), str(end)),
+                                user_id=user_id, tables=["daily_plans"])
+    return day_map(build_calendar_data(plans, start, end))
+
+def month_range(year, month):
+    _, last_day = calendar.monthrange(year, month)
+    return datetime.date(year, month, 1), datetime.date(year, month, last_day)
+
+def add_months(year, month, n):
+    idx = year * 12 + (month - 1) + n
+    return idx // 12, idx % 12 + 1
+
+# -----------------------------------------------------------------------------
+# 2. 여러 달 한눈에 보기 (학기 보기용 작은 달력 HTML)
+# -----------------------------------------------------------------------------
+STATUS_MARK = {'full': "🟢", 'plan': "🔵", 'none': "⚪"}
+
+def month_html(days, year, month):
+    """day_map 결과로 한 달짜리 작은 달력 표 HTML 생성"""
+    rows = []
+    for week in calendar.monthcalendar(year, month):
+        cells = []
+        for day in week:
+            if day == 0:
+                cells.append("<td></td>")
+                continue
+            info = days.get(datetime.date(year, month, day))
+            mark = STATUS_MARK[info['status']] if info else ""
+            cells.append(f"<td style='text-align:center; font-size:11px; padding:2px;'>{day}<br>{mark}</td>")
+        rows.append("<tr>" + "".join(cells) + "</tr>")
+    head = "".join(f"<th style='font-size:11px; color:gray;'>{d}</th>" for d in "월화수목금토일")
+    return (f"<div style='font-weight:bold; margin-bottom:4px;'>{year}년 {month}월</div>"
+            f"<table style='width:100%; border-collapse:collapse;'><tr>{head}</tr>{''.join(rows)}</table>")
@@ -0,0 +1,141 @@
+import html
+import os
+
+import streamlit as st
+
+from db import get_db_connection
+from profiler import render_section
+from sessions import use_branch
+
+# -----------------------------------------------------------------------------
+# 1. 메시지 조회 (id 커서 기반 페이지네이션)
+# -----------------------------------------------------------------------------
+CHAT_PAGE_SIZE = 30     # 처음/더보기 한 번에 가져오는 메시지 수
+CHAT_POLL_SEC = float(os.environ.get("PLANNER_CHAT_POLL_SEC", "5"))     # 메시지 창이 새 메시지를 확인하는 간격
+TEACHER_ID = 1          # 학생 화면의 대화 상대 (관리자 계정)
+
+# 두 방향(from→to, to→from)을 각각 인덱스로 찾은 뒤 합침 (OR 조건 전체 스캔 방지)
+_THREAD_SQL = """
+    SELECT id, from_id, message, created_at FROM (
+        SELECT * FROM (SELECT id, from_id, message, created_at FROM messages WHERE from_id=? AND to_id=? AND {cond} ORDER BY id {order} LIMIT ?) AS sent
+        UNION ALL
+        SELECT * FROM (SELECT id, from_id, message, created_at FROM messages WHERE from_id=? AND to_id=? AND {cond} ORDER BY id {order} LIMIT ?) AS received
+    ) AS thread ORDER BY id {order} LIMIT ?
+"""
+
+def _fetch(conn, user_id, other_id, cond, cursor, order, limit):
+    sql = _THREAD_SQL.format(cond=cond, order=order)
+    rows = conn.execute(sql, (user_id, other_id, cursor, limit, other_id, user_id, cursor, limit, limit)).fetchall()
+    return sorted(rows)     # 화면에는 항상 오래된 것 → 최신 순
+
+def fetch_latest(conn, user_id, other_id, limit=CHAT_PAGE_SIZE):
+    """가장 최근 limit 개"""
+    return _fetch(conn, user_id, other_id, "id > ?", 0, "DESC", limit)
+
+def fetch_older(conn, user_id, other_id, before_id, limit=CHAT_PAGE_SIZE):
+    """before_id 보다 오래된 limit 개 ("이전 메시지 더보기")"""
+    return _fetch(conn, user_id, other_id, "id < ?", before_id, "DESC", limit)
+
+def fetch_newer(conn, user_id, other_id, after_id, limit=1000):
+    """after_id 이후 새로 온 메시지만"""
+    return _fetch(conn, user_id, other_id, "id > ?", after_id, "ASC", limit)
+
+# -----------------------------------------------------------------------------
+# 2. 읽음 위치 (대화마다 마지막으로 읽은 메시지 id)
+# -----------------------------------------------------------------------------
+# 안 읽은 수 = 상대 → 나 메시지 중 id > last_read_id (idx_messages_pair_id 범위만 셈)
+def last_read_id(conn, user_id, other_id):
+    row = conn.execute("SELECT last_read_id FROM message_reads WHERE user_id=? AND other_id=?", (user_id, other_id)).fetchone()
+    return row[0] if row else 0
+
+def unread_count(conn, user_id, other_id, after_id):
+    return conn.execute("SELECT COUNT(*) FROM messages WHERE from_id=? AND to_id=? AND id > ?", (other_id, user_id, after_id)).fetchone()[0]
+
+def save_last_read(conn, user_id, other_id, message_id):
+    # 뒤로 가지 않게 (여러 창에서 같은 대화를 보고 있어도 큰 값만 남음)
+    conn.execute("""
+        INSERT INTO message_reads (user_id, other_id, last_read_id) VALUES (?,?,?)
+        ON CONFLICT (user_id, other_id) DO UPDATE SET last_read_id = excluded.last_read_id
+        WHERE excluded.last_read_id > message_reads.last_read_id
+    """, (user_id, other_id, message_id))
+    conn.commit()
+
+# -----------------------------------------------------------------------------
+# 3. 말풍선 HTML (메시지마다 한 번만 escape 해두고, 그릴 때는 join 한 번)
+# -----------------------------------------------------------------------------
+def bubble_html(row, user_id):
+    cls = "msg-me" if row[1] == user_id else "msg-other"
+    text = html.escape(str(row[2])).replace("\n", "<br>")
+    return f'<div class="msg-bubble {cls}">{text}</div>'
+
+def chat_html(fragments):
+    return '<div class="chat-container">' + ''.join(fragments) + '</div>'
+
+# -----------------------------------------------------------------------------
+# 4. 채팅 화면 (세션에 불러온 메시지를 보관 → 재실행 시 새 메시지만 조회)
+# -----------------------------------------------------------------------------
+def _sync(user_id, other_id):
+    """세션에 보관한 대화 (처음이면 최근 CHAT_PAGE_SIZE 개, 이후에는 id > 마지막 id 만 조회). 테이블이 없으면 None"""
+    key = f"chat_{user_id}_{other_id}"
+    state = st.session_state.get(key)
+    try:
+        with get_db_connection() as conn:
+            if state is None:
+                rows = fetch_latest(conn, user_id, other_id)
+                last_read = last_read_id(conn, user_id, other_id)
+                state = {'ids': [r[0] for r in rows], 'html': [bubble_html(r, user_id) for r in rows],
+                         'has_more': len(rows) == CHAT_PAGE_SIZE, 'last_read': last_read,
+                         'unread': unread_count(conn, user_id, other_id, last_read)}
+            else:
+                newer = fetch_newer(conn, user_id, other_id, state['ids'][-1] if state['ids'] else 0)
+                state['ids'] += [r[0] for r in newer]
+                state['html'] += [bubble_html(r, user_id) for r in newer]
+                state['unread'] += sum(1 for r in newer if r[1] == other_id and r[0] > state['last_read'])
+    except Exception:
+        return None
+    st.session_state[key] = state
+    return state
+
+def _mark_read(state, user_id, other_id):
+    # 화면에 보여준 메시지까지 읽음 처리 (바뀌었을 때만 DB에 씀)
+    if state['ids'] and state['ids'][-1] > state['last_read']:
+        state['last_read'], state['unread'] = state['ids'][-1], 0
+        with get_db_connection() as conn:
+            save_last_read(conn, user_id, other_id, state['last_read'])
+
+def render_chat(user_id, other_id):
+    with render_section("render_chat"):
+        _render_chat(_sync(user_id, other_id), user_id, other_id)
+
+def _render_chat(state, user_id, other_id):
+    if state is None:
+        st.info("메시지 테이블이 없습니다.")
+        return
+    key = f"chat_{user_id}_{other_id}"
+    if state['has_more'] and st.button("⬆️ 이전 메시지 더보기", key=f"{key}_older"):
+        with get_db_connection() as conn:
+            older = fetch_older(conn, user_id, other_id, state['ids'][0])
+        state['ids'] = [r[0] for r in older] + state['ids']
+        state['html'] = [bubble_html(r, user_id) for r in older] + state['html']
+        state['has_more'] = len(older) == CHAT_PAGE_SIZE
+
+    if not state['ids']: st.info("메시지 내역 없음")
+    else:
+        st.markdown(chat_html(state['html']), unsafe_allow_html=True)
+        _mark_read(state, user_id, other_id)
+
+@st.fragment(run_every=CHAT_POLL_SEC)
+def message_panel(user_id, other_id, title):
+    """새 메시지 알림 + 접어 둔 대화창. 이 부분만 CHAT_POLL_SEC 마다 다시 실행되어
+    id > 마지막 id 인 메시지만 확인함 (새 메시지가 없으면 빈 조회 1번). 대화창을 펼쳐야 읽음 처리"""
+    use_branch()    # fragment 만 다시 실행될 때도 같은 지점 DB
+    with render_section("message_panel"):
+        state = _sync(user_id, other_id)
+        header = st.empty()
+        # 라벨이 바뀌면 펼침 상태가 초기화되므로 알림 수는 라벨 밖(제목)에 표시
+        panel = st.expander("대화 보기", key=f"chat_panel_{user_id}_{other_id}", on_change="rerun")
+        with panel:
+            if panel.open:
+                _render_chat(state, user_id, other_id)
+        unread = state['unread'] if state else 0     # 펼쳐 둔 상태면 방금 읽음 처리되어 0
+        header.markdown(f"##### {title} {'🔴 ' + str(unread) if unread else ''}")
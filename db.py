@@ -0,0 +1,536 @@
+import contextvars
+import glob
+import os
+import queue
+import re
+import secrets
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
+import pandas as pd
+
+import query_stats
+
+# -----------------------------------------------------------------------------
+# 1. DB 설정 (모든 화면이 이 파일 하나만 바라봅니다)
+# -----------------------------------------------------------------------------
+# 저장소는 URL로 고릅니다: 로컬/테스트는 sqlite:///파일, 운영(여러 워커)은 postgresql://...
+DB_NAME = os.environ.get("PLANNER_DB", "5a_planner_v5_fix.db")
+DB_URL = os.environ.get("PLANNER_DB_URL", f"sqlite:///{DB_NAME}")
+POOL_SIZE = int(os.environ.get("PLANNER_DB_POOL_SIZE", "8"))
+POOL_MAX_OVERFLOW = int(os.environ.get("PLANNER_DB_MAX_OVERFLOW", "4"))     # 풀이 꽉 찼을 때 잠깐 더 여는 연결 수
+POOL_RECYCLE_SEC = int(os.environ.get("PLANNER_DB_RECYCLE", "1800"))        # 서버가 끊기 전에 연결 교체
+POOL_TIMEOUT_SEC = 10       # 빈 연결을 기다리는 최대 시간
+BUSY_TIMEOUT_MS = 5000      # 다른 세션이 쓰는 중이면 최대 5초까지 기다림
+STATEMENT_CACHE = 256       # 연결마다 재사용할 준비된 SQL 문 개수
+
+# -----------------------------------------------------------------------------
+# 2. 커넥션 풀 (프로세스당 하나, 연결을 닫지 않고 돌려씀)
+# -----------------------------------------------------------------------------
+class _Timed:
+    """문장 하나의 실행 + 결과 읽기 시간/행 수를 모았다가 끝날 때 query_stats 에 기록
+    (결과를 다 읽었을 때 / 다음 execute / close / 커서가 버려질 때)"""
+    _q = None
+
+    def _begin(self, sql, params, elapsed, rowcount=None):
+        self._finish()
+        if not query_stats.enabled():
+            return
+        name, where = query_stats.caller()
+        self._q = [sql, params, elapsed, 0, name, where]
+        if rowcount is not None:
+            # 결과 행이 없는 문장(INSERT/UPDATE/DELETE)은 바로 기록
+            self._q[3] = max(rowcount, 0)
+            self._finish()
+
+    def _add(self, elapsed, rows, done):
+        q = self._q
+        if q is not None:
+            q[2] += elapsed
+            q[3] += rows
+            if done:
+                self._finish()
+
+    def _finish(self):
+        q, self._q = self._q, None
+        if q is not None:
+            sql, params, elapsed, rows, name, where = q
+            query_stats.record(sql, params, elapsed * 1000, rows, name, where, self._explain)
+
+
+class PlannerCursor(_Timed, sqlite3.Cursor):
+    def execute(self, sql, params=()):
+        t0 = time.perf_counter()
+        super().execute(sql, params)
+        elapsed = time.perf_counter() - t0
+        self._begin(sql, params, elapsed, None if self.description else self.rowcount)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        t0 = time.perf_counter()
+        super().executemany(sql, seq_of_params)
+        self._begin(sql, (), time.perf_counter() - t0, self.rowcount)
+        return self
+
+    def fetchone(self):
+        t0 = time.perf_counter()
+        row = super().fetchone()
+        self._add(time.perf_counter() - t0, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        size = size or self.arraysize
+        t0 = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._add(time.perf_counter() - t0, len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        t0 = time.perf_counter()
+        rows = super().fetchall()
+        self._add(time.perf_counter() - t0, len(rows), True)
+        return rows
+
+    def __next__(self):
+        t0 = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._finish()
+            raise
+        self._add(time.perf_counter() - t0, 1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+    def _explain(self, sql, params):
+        # 계측하지 않는 기본 커서로 같은 연결에서 실행 계획 조회
+        rows = sqlite3.Cursor(self.connection).execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+        depth = {0: 0}
+        lines = []
+        for node, parent, _, detail in rows:
+            depth[node] = depth.get(parent, 0) + 1
+            lines.append("    " + "  " * (depth[node] - 1) + detail)
+        return "\n".join(lines)
+
+
+class PlannerConnection(sqlite3.Connection):
+    """커밋이 끝난 직후 실행할 콜백(캐시 무효화 등)을 등록할 수 있는 연결"""
+    dialect = "sqlite"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._after_commit = []
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or PlannerCursor)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def after_commit(self, callback):
+        self._after_commit.append(callback)
+
+    def commit(self):
+        super().commit()
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            callback()
+
+    def rollback(self):
+        super().rollback()
+        self._after_commit = []
+
+
+class ConnectionPool:
+    dialect = "sqlite"
+
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.url = f"sqlite:///{path}"
+        self.size = size
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            check_same_thread=False,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            cached_statements=STATEMENT_CACHE,
+            factory=PlannerConnection,
+        )
+        conn.url = self.url     # 어느 DB 연결인지 (조회 캐시 키에 사용)
+        # WAL: 읽기와 쓰기가 서로 막지 않음 / NORMAL: WAL에서는 안전하면서 fsync 횟수 감소
+        with query_stats.paused():
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def release(self, conn):
+        # 끝나지 않은 트랜잭션이 다음 사용자에게 넘어가지 않도록 정리
+        if conn.in_transaction:
+            conn.rollback()
+        conn._after_commit = []
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+# -----------------------------------------------------------------------------
+# 3. PostgreSQL (SQLAlchemy QueuePool)
+# -----------------------------------------------------------------------------
+# 화면 코드는 sqlite3 방식(? 자리표시자, conn.execute 바로 호출)으로 작성되어 있으므로
+# 서버 DB 연결도 같은 모양으로 감싸서 넘겨줍니다.
+_TOKENS = re.compile(r"('(?:[^']|'')*')|(\?)|(%)")
+
+@lru_cache(maxsize=512)
+def _pyformat(sql, has_params):
+    """? → %s (문자열 리터럴 안은 그대로). 파라미터가 있을 때만 % 를 %% 로"""
+    def sub(m):
+        if m.group(1): return m.group(1).replace('%', '%%') if has_params else m.group(1)
+        if m.group(2): return '%s'
+        return '%%' if has_params else '%'
+    return _TOKENS.sub(sub, sql)
+
+class ServerCursor(_Timed):
+    def __init__(self, conn):
+        self._conn = conn
+        self._cur = conn.raw.cursor()
+
+    def execute(self, sql, params=()):
+        params = tuple(params or ())
+        self._conn.in_transaction = True
+        t0 = time.perf_counter()
+        self._cur.execute(_pyformat(sql, bool(params)), params or None)
+        self._begin(sql, params, time.perf_counter() - t0, None if self._cur.description else self._cur.rowcount)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        from psycopg2.extras import execute_batch
+        self._conn.in_transaction = True
+        t0 = time.perf_counter()
+        # executemany 는 서버 왕복이 행마다 생기므로 묶어서 보냄
+        execute_batch(self._cur, _pyformat(sql, True), list(seq_of_params), page_size=500)
+        self._begin(sql, (), time.perf_counter() - t0, self._cur.rowcount)
+        return self
+
+    def _explain(self, sql, params):
+        cur = self._conn.raw.cursor()
+        try:
+            cur.execute("EXPLAIN " + _pyformat(sql, bool(params)), params or None)
+            return "\n".join("    " + r[0] for r in cur.fetchall())
+        finally:
+            cur.close()
+
+    @property
+    def description(self): return self._cur.description
+    @property
+    def rowcount(self): return self._cur.rowcount
+
+    def fetchone(self):
+        t0 = time.perf_counter()
+        row = self._cur.fetchone()
+        self._add(time.perf_counter() - t0, row is not None, row is None)
+        return row
+
+    def fetchall(self):
+        t0 = time.perf_counter()
+        rows = self._cur.fetchall()
+        self._add(time.perf_counter() - t0, len(rows), True)
+        return rows
+
+    def fetchmany(self, size=None):
+        size = size or self._cur.arraysize
+        t0 = time.perf_counter()
+        rows = self._cur.fetchmany(size)
+        self._add(time.perf_counter() - t0, len(rows), len(rows) < size)
+        return rows
+
+    def __iter__(self):
+        # 서버 DB는 execute 때 결과를 모두 받아오므로 행 수만 세면 됨
+        self._add(0.0, max(self._cur.rowcount, 0), True)
+        return iter(self._cur)
+
+    def close(self):
+        self._finish()
+        self._cur.close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+
+class ServerConnection:
+    """SQLAlchemy 풀에서 빌린 DB-API 연결을 PlannerConnection 과 같은 모양으로 감싼 것"""
+    dialect = "postgresql"
+
+    def __init__(self, raw, url=None):
+        self.raw = raw
+        self.url = url
+        self.in_transaction = False
+        self._after_commit = []
+
+    def cursor(self):
+        return ServerCursor(self)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def after_commit(self, callback):
+        self._after_commit.append(callback)
+
+    def commit(self):
+        self.raw.commit()
+        self.in_transaction = False
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            callback()
+
+    def rollback(self):
+        self.raw.rollback()
+        self.in_transaction = False
+        self._after_commit = []
+
+
+class EnginePool:
+    """URL 하나당 SQLAlchemy 엔진 하나 (QueuePool: 크기/초과 허용/사전 점검/주기적 교체)"""
+    dialect = "postgresql"
+
+    def __init__(self, url, size=POOL_SIZE):
+        from sqlalchemy import create_engine, event
+        from sqlalchemy.pool import QueuePool
+        self.url = url
+        self.engine = create_engine(
+            url,
+            poolclass=QueuePool,
+            pool_size=size,
+            max_overflow=POOL_MAX_OVERFLOW,
+            pool_timeout=POOL_TIMEOUT_SEC,
+            pool_pre_ping=True,
+            pool_recycle=POOL_RECYCLE_SEC,
+        )
+        event.listen(self.engine, "connect", _numeric_as_float)
+
+    def acquire(self):
+        return ServerConnection(self.engine.raw_connection(), self.url)
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        conn._after_commit = []
+        conn.raw.close()    # 실제로 닫지 않고 QueuePool 로 반납
+
+    def close_all(self):
+        self.engine.dispose()
+
+
+def _numeric_as_float(dbapi_conn, _record):
+    # SUM(..) * 1.0 / .. 같은 NUMERIC 결과를 Decimal 대신 float 로 (SQLite 와 같은 타입)
+    import psycopg2.extensions as ext
+    dec2float = ext.new_type(ext.DECIMAL.values, "DEC2FLOAT", lambda value, cur: None if value is None else float(value))
+    ext.register_type(dec2float, dbapi_conn)
+
+# -----------------------------------------------------------------------------
+# 4. 지점(테넌트)별 DB 라우팅
+# -----------------------------------------------------------------------------
+# 한 프로세스가 여러 지점을 서비스합니다. 지점마다 DB(파일 또는 스키마)와 커넥션 풀이 따로라서
+# 한 지점의 쓰기 잠금이 다른 지점을 막지 않습니다. 지점을 정하지 않으면 기본 지점(DB_URL) = 예전과 같음.
+#   PLANNER_TENANTS="gangnam=sqlite:///branches/gangnam.db,bundang=postgresql://.../planner?options=-csearch_path%3Dbundang"
+#   PLANNER_TENANT_URL="sqlite:///branches/{tenant}.db"  → 목록에 없는 지점은 이 규칙으로 (SQLite 만, 이미 있는 파일만)
+# 주소창 ?branch= 로는 있는 지점만 고를 수 있고, 새 지점은 명령줄에서 만듭니다: python hq.py --create 지점id
+# (서버 DB 지점은 파일 여부를 알 수 없으므로 PLANNER_TENANTS 에 적어야 함)
+DEFAULT_TENANT = os.environ.get("PLANNER_DEFAULT_TENANT", "main")
+TENANT_URL = os.environ.get("PLANNER_TENANT_URL")
+TENANTS = dict(item.strip().split("=", 1) for item in os.environ.get("PLANNER_TENANTS", "").split(",") if "=" in item)
+_TENANT_ID = re.compile(r"^[A-Za-z0-9_-]{1,40}$")
+
+_tenant = contextvars.ContextVar("tenant", default=DEFAULT_TENANT)
+
+def tenant_path(tenant):
+    """규칙(PLANNER_TENANT_URL)으로 정해지는 지점 DB 파일 경로 (규칙이 없거나 SQLite 가 아니거나 이름이 맞지 않으면 None)"""
+    if TENANT_URL and TENANT_URL.startswith("sqlite:///") and _TENANT_ID.match(tenant or ""):    # 파일 경로에 들어가므로 글자 제한
+        return TENANT_URL[len("sqlite:///"):].format(tenant=tenant)
+    return None
+
+def tenant_url(tenant, create=False):
+    """지점 id → DB URL (없는 지점이면 ValueError)
+    규칙으로 정해지는 지점은 파일이 이미 있을 때만 (create=True 는 새 지점을 만드는 hq.create_branch 전용)"""
+    if tenant == DEFAULT_TENANT:
+        return DB_URL
+    if tenant in TENANTS:
+        return TENANTS[tenant]
+    path = tenant_path(tenant)
+    if path and (create or os.path.exists(path)):
+        return f"sqlite:///{path}"
+    raise ValueError(f"알 수 없는 지점입니다: {tenant}")
+
+def tenant_ids():
+    """서비스 중인 지점 목록 (기본 지점 + 설정된 지점 + 규칙에 맞는 SQLite 파일)"""
+    ids = [DEFAULT_TENANT] + [t for t in TENANTS if t != DEFAULT_TENANT]
+    if TENANT_URL and TENANT_URL.startswith("sqlite:///"):
+        pattern = TENANT_URL[len("sqlite:///"):]
+        prefix, suffix = pattern.split("{tenant}")
+        for path in sorted(glob.glob(pattern.replace("{tenant}", "*"))):
+            tenant = path[len(prefix):len(path) - len(suffix)]
+            if _TENANT_ID.match(tenant) and tenant not in ids:
+                ids.append(tenant)
+    return ids
+
+def current_tenant():
+    return _tenant.get()
+
+def set_tenant(tenant):
+    """이 스레드(화면 재실행)에서 쓸 지점. 이후 get_db_connection() 이 이 지점 DB를 빌려줌"""
+    tenant_url(tenant)      # 없는 지점이면 여기서 ValueError
+    _tenant.set(tenant)
+
+@contextmanager
+def use_tenant(tenant):
+    """블록 안에서만 다른 지점 DB 사용 (본사 집계 / 명령줄 도구)"""
+    tenant_url(tenant)
+    token = _tenant.set(tenant)
+    try:
+        yield
+    finally:
+        _tenant.reset(token)
+
+# -----------------------------------------------------------------------------
+# 5. 연결 빌려주기 (화면 코드는 이 함수만 사용)
+# -----------------------------------------------------------------------------
+_pools = {}
+_pools_lock = threading.Lock()
+
+def db_url(path=None):
+    """path(없으면 지금 지점 DB) → 풀/캐시가 쓰는 DB URL"""
+    return _normalize_url(path)
+
+def _normalize_url(path):
+    url = path or tenant_url(current_tenant())
+    return url if "://" in url else f"sqlite:///{url}"    # 예전처럼 파일 경로만 줘도 됨
+
+def get_pool(path=None):
+    url = _normalize_url(path)
+    with _pools_lock:
+        if url not in _pools:
+            if url.startswith("sqlite:///"):
+                _pools[url] = ConnectionPool(url[len("sqlite:///"):])
+            else:
+                _pools[url] = EnginePool(url)
+        return _pools[url]
+
+@contextmanager
+def get_db_connection(path=None):
+    """풀에서 연결을 빌려주고, 블록이 끝나면 커밋(에러 시 롤백) 후 반납"""
+    pool = get_pool(path)
+    conn = pool.acquire()
+    try:
+        yield conn
+        if conn.in_transaction:
+            conn.commit()
+    except BaseException:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        pool.release(conn)
+
+# -----------------------------------------------------------------------------
+# 6. DB 종류마다 다른 부분
+# -----------------------------------------------------------------------------
+def insert_id(conn, sql, params=()):
+    """INSERT 실행 후 새 행의 id (SQLite: lastrowid / PostgreSQL: RETURNING id)"""
+    if conn.dialect == "sqlite":
+        return conn.execute(sql, params).lastrowid
+    return conn.execute(sql + " RETURNING id", params).fetchone()[0]
+
+def insert_ids(conn, sql, seq_of_params):
+    """여러 행 INSERT ... VALUES (?,..) 실행 후 새 행의 id 목록 (넣은 순서대로)
+    id 를 INSERT 결과에서 바로 받으므로 다른 트랜잭션이 같은 내용을 넣어도 섞이지 않음
+    SQLite: 행마다 lastrowid (같은 프로세스 안이라 왕복 비용 없음) / PostgreSQL: execute_values ... RETURNING id 로 묶어서"""
+    if conn.dialect == "sqlite":
+        return [conn.execute(sql, params).lastrowid for params in seq_of_params]
+    from psycopg2.extras import execute_values
+    head = sql[:sql.upper().rindex("VALUES")]
+    cur = conn.cursor()
+    conn.in_transaction = True
+    t0 = time.perf_counter()
+    rows = execute_values(cur._cur, _pyformat(head, True) + "VALUES %s RETURNING id",
+                          [tuple(params) for params in seq_of_params], page_size=500, fetch=True)
+    cur._begin(sql, (), time.perf_counter() - t0, len(rows))
+    return [row[0] for row in rows]
+
+def iter_pages(conn, sql, params=(), size=1000):
+    """큰 조회 결과를 size 행씩 나눠서 내줌 (전체를 메모리에 올리지 않음)
+    SQLite: 커서에서 조금씩 읽음 / PostgreSQL: 서버 쪽 커서(이름 있는 커서)로 size 행씩 받아옴"""
+    if conn.dialect == "sqlite":
+        cur = conn.execute(sql, params)
+    else:
+        params = tuple(params or ())
+        conn.in_transaction = True
+        cur = conn.raw.cursor(name=f"planner_{secrets.token_hex(4)}")
+        cur.itersize = size
+        cur.execute(_pyformat(sql, bool(params)), params or None)
+    try:
+        while True:
+            rows = cur.fetchmany(size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cur.close()
+
+@contextmanager
+def read_only(conn):
+    """블록 안에서는 조회만 허용 (본사 집계처럼 여러 지점 DB를 읽을 때 실수로 쓰지 않도록)"""
+    if conn.dialect == "sqlite":
+        conn.execute("PRAGMA query_only=ON")
+        try:
+            yield conn
+        finally:
+            conn.execute("PRAGMA query_only=OFF")
+    else:
+        # 트랜잭션의 첫 문장이어야 함 → 블록이 끝나면 get_db_connection 이 커밋
+        conn.execute("SET TRANSACTION READ ONLY")
+        yield conn
+
+def read_sql(sql, conn, params=(), index_col=None):
+    """pd.read_sql 과 같음 (서버 연결은 ? 자리표시자 변환을 거쳐 직접 DataFrame 생성)"""
+    if conn.dialect == "sqlite":
+        return pd.read_sql(sql, conn, params=params, index_col=index_col)
+    cur = conn.execute(sql, params)
+    df = pd.DataFrame.from_records(cur.fetchall(), columns=[d[0] for d in cur.description])
+    return df.set_index(index_col) if index_col else df
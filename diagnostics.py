@@ -0,0 +1,128 @@
+import pandas as pd
+import streamlit as st
+
+import profiler
+import query_stats
+from query_stats import BUCKETS_MS, SLOW_LOG_PATH, SLOW_QUERY_MS, read_slow_log, stats
+
+# -----------------------------------------------------------------------------
+# 관리자 숨김 페이지: DB 조회 진단 + 화면 재실행 프로파일 (admin_app 주소 뒤에 ?page=diag)
+# -----------------------------------------------------------------------------
+# 통계는 서버 프로세스(워커)마다 따로 쌓입니다. 워커를 재시작하면 처음부터 다시 셉니다.
+BUCKET_LABELS = [f"<{BUCKETS_MS[0]}ms"] + [f"{a}~{b}ms" for a, b in zip(BUCKETS_MS, BUCKETS_MS[1:])] + [f"≥{BUCKETS_MS[-1]}ms"]
+
+def _slow_count(buckets):
+    # 구간 아래쪽 경계가 기준 이상인 칸만 셈 (구간 단위라 근사값)
+    return sum(n for low, n in zip((0,) + BUCKETS_MS, buckets) if low >= SLOW_QUERY_MS)
+
+def show_diagnostics():
+    c_back, _ = st.columns([4, 1])
+    if c_back.button("← 관리자 화면으로"):
+        st.query_params.pop("page", None)
+        st.rerun()
+    tab_query, tab_render = st.tabs(["🩺 DB 조회", "⏱️ 화면 재실행"])
+    with tab_query:
+        _query_diagnostics()
+    with tab_render:
+        _render_profiles()
+
+def _query_diagnostics():
+    st.markdown("## 🩺 DB 조회 진단")
+    st.caption(f"이 서버 프로세스에서 실행된 모든 DB 문장 (실행 + 결과 읽기 시간). "
+               f"{SLOW_QUERY_MS:.0f}ms 이상은 실행 계획과 함께 `{SLOW_LOG_PATH}` 에 기록됩니다.")
+    if not query_stats.QUERY_STATS:
+        st.warning("조회 계측이 꺼져 있습니다. (PLANNER_QUERY_STATS=1 로 켜기)")
+
+    if st.button("통계 초기화", key="reset_query_stats"):
+        stats.reset()
+        st.rerun()
+
+    entries = stats.snapshot()
+    if not entries:
+        st.info("아직 기록된 조회가 없습니다.")
+        return
+    df = pd.DataFrame(entries).sort_values('total_ms', ascending=False).reset_index(drop=True)
+
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("실행 횟수", f"{df['count'].sum():,}")
+    m2.metric("총 DB 시간", f"{df['total_ms'].sum() / 1000:,.1f}s")
+    m3.metric("SQL 종류", f"{df['sql'].nunique():,}")
+    m4.metric(f"느린 조회 (약 {SLOW_QUERY_MS:.0f}ms↑)", f"{sum(_slow_count(b) for b in df['buckets']):,}회")
+
+    # 1. 화면 구역(호출 위치)별 합계
+    st.markdown("### 📍 호출 위치별 DB 시간")
+    by_caller = df.groupby('caller').agg(count=('count', 'sum'), total_ms=('total_ms', 'sum'), max_ms=('max_ms', 'max')).sort_values('total_ms', ascending=False)
+    st.bar_chart(by_caller['total_ms'].head(20))
+
+    # 2. 문장별 표 (총 시간 순)
+    st.markdown("### 🧾 문장별 통계")
+    show = df[['caller', 'sql', 'count', 'total_ms', 'mean_ms', 'p50_ms', 'p95_ms', 'max_ms', 'rows', 'where']].copy()
+    show.columns = ['호출 위치', 'SQL', '횟수', '합계(ms)', '평균(ms)', 'p50≤', 'p95≤', '최대(ms)', '행 수', '코드 위치']
+    st.dataframe(show.style.format({'합계(ms)': "{:,.1f}", '평균(ms)': "{:.2f}", '최대(ms)': "{:.1f}", 'p50≤': "{:g}", 'p95≤': "{:g}"}),
+                 use_container_width=True, hide_index=True)
+
+    # 3. 선택한 문장의 실행 시간 분포
+    st.markdown("### 📊 실행 시간 분포")
+    pick = st.selectbox("문장 선택", df.index[:50], format_func=lambda i: f"[{df.at[i, 'caller']}] {df.at[i, 'sql'][:90]}")
+    st.bar_chart(pd.Series(df.at[pick, 'buckets'], index=pd.CategoricalIndex(BUCKET_LABELS, categories=BUCKET_LABELS, ordered=True), name="횟수"))
+
+    with st.expander("🐢 느린 조회 로그 (최근)"):
+        log = read_slow_log()
+        if log: st.code(log, language="text")
+        else: st.caption("기록된 느린 조회가 없습니다.")
+
+def _render_profiles():
+    st.markdown("## ⏱️ 화면 재실행 프로파일")
+    st.caption("측정할 화면 주소 뒤에 `?profile=1` (구역별 시간) 또는 `?profile=cprofile` (함수 단위) 을 붙이고 화면을 사용하면 "
+               f"최근 {profiler.PROFILE_HISTORY}회의 재실행 기록이 여기에 쌓입니다. (DB = 그 구역 안에서 실행된 문장 시간 합계)")
+    runs = profiler.history()
+    if not runs:
+        st.info("아직 측정된 재실행이 없습니다.")
+        return
+
+    c_json, c_clear = st.columns([4, 1])
+    c_json.download_button("📥 기록 JSON 다운로드", profiler.history_json(), file_name="render_profile.json", mime="application/json", on_click="ignore")
+    if c_clear.button("기록 비우기", use_container_width=True):
+        profiler.clear()
+        st.rerun()
+
+    # 1. 재실행별 구역 시간 (바깥 구역만 쌓아서 전체와 비교)
+    rows = []
+    for r in runs:
+        row = {'id': r['id'], '시각': pd.Timestamp(r['started'], unit='s').tz_localize('UTC').tz_convert('Asia/Seoul').strftime('%H:%M:%S'),
+               '화면': r['page'], '사용자': r['user'], '결과': r['status'], '전체(ms)': r['total_ms'], 'DB(ms)': r['db_ms'], 'DB 문장': r['db_count']}
+        for s in r['sections']:
+            if s['ms'] is not None:
+                row[s['name']] = row.get(s['name'], 0.0) + s['ms']
+        rows.append(row)
+    df = pd.DataFrame(rows).set_index('id')
+    section_cols = [c for c in df.columns if c not in ('시각', '화면', '사용자', '결과', '전체(ms)', 'DB(ms)', 'DB 문장')]
+    top_level = sorted({s['name'] for r in runs for s in r['sections'] if s['depth'] == 0})
+
+    m1, m2, m3 = st.columns(3)
+    m1.metric("측정한 재실행", f"{len(df)}회")
+    m2.metric("평균 전체 시간", f"{df['전체(ms)'].mean():,.0f}ms")
+    m3.metric("평균 DB 시간", f"{df['DB(ms)'].mean():,.0f}ms")
+
+    chart = df[top_level].fillna(0.0)
+    chart['기타'] = (df['전체(ms)'] - chart.sum(axis=1)).clip(lower=0)
+    st.bar_chart(chart)
+
+    st.markdown("### 구역별 평균 (ms)")
+    summary = pd.DataFrame([{'구역': ("  " * s['depth']) + s['name'], '평균(ms)': s['ms'], 'DB(ms)': s['db_ms'], 'DB 문장': s['db_count']}
+                            for r in runs for s in r['sections'] if s['ms'] is not None])
+    st.dataframe(summary.groupby('구역', sort=False).mean().sort_values('평균(ms)', ascending=False).style.format("{:,.1f}"), use_container_width=True)
+
+    st.markdown("### 재실행 기록")
+    st.dataframe(df[['시각', '화면', '사용자', '결과', '전체(ms)', 'DB(ms)', 'DB 문장'] + section_cols].iloc[::-1]
+                 .style.format("{:,.1f}", subset=['전체(ms)', 'DB(ms)'] + section_cols, na_rep="-"), use_container_width=True)
+
+    # 2. cProfile (?profile=cprofile 로 측정한 재실행)
+    ids = profiler.cprofile_ids()
+    if ids:
+        st.markdown("### 🔬 함수 단위 프로파일 (cProfile)")
+        rid = st.selectbox("재실행", ids[::-1], format_func=lambda i: f"#{i} {df.at[i, '화면'] if i in df.index else ''}")
+        st.code(profiler.cprofile_text(rid), language="text")
+        dump = profiler.cprofile_dump(rid)
+        if dump:
+            st.download_button("📥 .prof 다운로드 (snakeviz / python -m pstats)", dump, file_name=f"rerun_{rid}.prof", on_click="ignore")
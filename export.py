@@ -0,0 +1,221 @@
+import argparse
+import csv
+import datetime
+import io
+import os
+import time
+import zipfile
+
+from db import get_db_connection, iter_pages
+
+# [선택 라이브러리] 없으면 해당 형식만 비활성화
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+try:
+    from openpyxl import Workbook
+    HAS_XLSX = True
+except ImportError:
+    HAS_XLSX = False
+
+# -----------------------------------------------------------------------------
+# 1. 내보내기 설정 (학원 전체 데이터를 표 단위로)
+# -----------------------------------------------------------------------------
+# 결과를 한 번에 DataFrame으로 만들지 않고 EXPORT_PAGE_SIZE 행씩 읽어서 바로 파일에 씁니다.
+# → 학생 수/기간이 늘어도 파일을 만드는 동안의 메모리 사용량은 거의 일정합니다.
+# 단, 화면의 다운로드 버튼은 파일 전체를 메모리에 올려서 보내므로 EXPORT_DOWNLOAD_MAX_MB 까지만 허용합니다.
+# (더 큰 파일은 서버의 EXPORT_DIR 에서 직접 가져가거나 명령줄 python export.py 로 만드세요)
+EXPORT_DIR = os.environ.get("PLANNER_EXPORT_DIR", "exports")
+EXPORT_DOWNLOAD_MAX_MB = int(os.environ.get("PLANNER_EXPORT_DOWNLOAD_MAX_MB", "200"))
+EXPORT_PAGE_SIZE = 5000
+EXPORT_KEEP_DAYS = 1        # 만든 파일 보관 기간 (다운로드용 임시 파일)
+XLSX_MAX_ROWS = 1048575     # 엑셀 시트 한 장 최대 행 수 (머리글 제외)
+FORMATS = {'csv': "CSV (zip)", 'parquet': "Parquet (zip)", 'xlsx': "Excel (xlsx)"}
+
+# 표 이름 → 시트/파일 이름, (열 이름, 형식) 목록, 조회 SQL (기간 조건 ? 2개)
+# ORDER BY 는 인덱스 순서와 맞춰서 정렬용 임시 저장소를 쓰지 않게 함
+EXPORT_TABLES = {
+    'plans': {
+        'label': "일간계획",
+        'columns': [("아이디", "str"), ("이름", "str"), ("그룹", "str"), ("날짜", "str"), ("과목", "str"), ("내용", "str"), ("성취도", "int")],
+        'sql': """
+            SELECT u.username, u.real_name, u.group_color, p.plan_date, p.subject, p.content, p.achievement
+            FROM daily_plans p JOIN users u ON u.id = p.user_id
+            WHERE p.plan_date BETWEEN ? AND ?
+            ORDER BY p.plan_date, p.user_id
+        """,
+    },
+    'logs': {
+        'label': "학습일지",
+        'columns': [("아이디", "str"), ("이름", "str"), ("그룹", "str"), ("날짜", "str"), ("다짐", "str"), ("회고", "str")],
+        'sql': """
+            SELECT u.username, u.real_name, u.group_color, l.log_date, l.resolution, l.review
+            FROM daily_logs l JOIN users u ON u.id = l.user_id
+            WHERE l.log_date BETWEEN ? AND ?
+            ORDER BY l.user_id, l.log_date
+        """,
+    },
+    'goals': {
+        'label': "목표",
+        'columns': [("아이디", "str"), ("이름", "str"), ("그룹", "str"), ("기간", "str"), ("과목", "str"), ("교재", "str"), ("분량", "int"), ("요일", "str")],
+        # year_month 는 'YYYY-MM' 또는 'YYYY-MM-DD~YYYY-MM-DD' → 앞 7글자(월)로 비교
+        'sql': """
+            SELECT u.username, u.real_name, u.group_color, g.year_month, g.subject, g.content, g.total_amount, g.week_days
+            FROM monthly_goals g JOIN users u ON u.id = g.user_id
+            WHERE SUBSTR(g.year_month, 1, 7) BETWEEN ? AND ?
+            ORDER BY g.id
+        """,
+        'by_month': True,
+    },
+}
+
+def _params(table, start, end):
+    if EXPORT_TABLES[table].get('by_month'):
+        return (str(start)[:7], str(end)[:7])
+    return (str(start), str(end))
+
+def count_rows(conn, table, start, end):
+    return conn.execute(f"SELECT COUNT(*) FROM ({EXPORT_TABLES[table]['sql']}) AS t", _params(table, start, end)).fetchone()[0]
+
+def iter_rows(conn, table, start, end, page_size=EXPORT_PAGE_SIZE):
+    """표 하나를 page_size 행씩 (행 목록 generator)"""
+    return iter_pages(conn, EXPORT_TABLES[table]['sql'], _params(table, start, end), page_size)
+
+# -----------------------------------------------------------------------------
+# 2. 형식별 쓰기 (CSV 조각 generator / Parquet / Excel)
+# -----------------------------------------------------------------------------
+def _csv_pages(conn, table, start, end, page_size):
+    # (bytes 조각, 그 조각의 행 수) - 머리글은 행 수 0
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow([name for name, _ in EXPORT_TABLES[table]['columns']])
+    yield buf.getvalue().encode('utf-8-sig'), 0
+    for rows in iter_rows(conn, table, start, end, page_size):
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows(rows)
+        yield buf.getvalue().encode('utf-8'), len(rows)
+
+def _parquet_schema(table):
+    return pa.schema([(name, pa.int64() if kind == "int" else pa.string()) for name, kind in EXPORT_TABLES[table]['columns']])
+
+def _arrow_column(values, kind):
+    # 서버 DB는 날짜를 date 로 돌려주므로 문자열 열은 str 로 맞춤
+    if kind == "int":
+        return pa.array([None if v is None else int(v) for v in values], type=pa.int64())
+    return pa.array([None if v is None else str(v) for v in values], type=pa.string())
+
+def _write_parquet(conn, table, start, end, path, on_page):
+    columns = EXPORT_TABLES[table]['columns']
+    schema = _parquet_schema(table)
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for rows in iter_rows(conn, table, start, end):
+            # 한 페이지 = 한 row group
+            arrays = [_arrow_column(values, kind) for values, (_, kind) in zip(zip(*rows), columns)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            on_page(len(rows))
+
+def _write_xlsx(conn, tables, start, end, path, on_page):
+    # write_only: 행을 바로 임시 파일로 내보내서 시트 전체를 메모리에 들고 있지 않음
+    wb = Workbook(write_only=True)
+    for table in tables:
+        ws = wb.create_sheet(EXPORT_TABLES[table]['label'])
+        ws.append([name for name, _ in EXPORT_TABLES[table]['columns']])
+        for rows in iter_rows(conn, table, start, end):
+            for row in rows:
+                ws.append(list(row))
+            on_page(len(rows))
+    wb.save(path)
+
+# -----------------------------------------------------------------------------
+# 3. 내보내기 파일 만들기 (백그라운드 작업 / 명령줄에서 호출)
+# -----------------------------------------------------------------------------
+def export_file_name(fmt, start, end):
+    ext = "xlsx" if fmt == "xlsx" else "zip"
+    return f"5A_전체데이터_{str(start).replace('-', '')}_{str(end).replace('-', '')}_{fmt}.{ext}"
+
+def write_export(conn, fmt, start, end, tables, path, progress=None):
+    """start~end 기간의 tables 를 fmt 형식 파일 하나(path)로 저장 → {'path', 'rows', 'bytes'}
+    progress(처리한 행, 전체 행): 페이지마다 호출 (예외를 내면 중단하고 만들던 파일 삭제)"""
+    if fmt == "parquet" and not HAS_PARQUET:
+        raise ValueError("Parquet 내보내기에는 pyarrow 가 필요합니다.")
+    if fmt == "xlsx" and not HAS_XLSX:
+        raise ValueError("Excel 내보내기에는 openpyxl 이 필요합니다.")
+    counts = {t: count_rows(conn, t, start, end) for t in tables}
+    if fmt == "xlsx" and max(counts.values(), default=0) > XLSX_MAX_ROWS:
+        raise ValueError(f"엑셀 시트 한 장에 {XLSX_MAX_ROWS + 1:,}행을 넘을 수 없습니다. CSV 또는 Parquet 으로 내보내세요.")
+    total = sum(counts.values())
+    done = 0
+    def on_page(n):
+        nonlocal done
+        done += n
+        if progress: progress(done, total)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    try:
+        if fmt == "xlsx":
+            _write_xlsx(conn, tables, start, end, path, on_page)
+        else:
+            with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+                for table in tables:
+                    name = EXPORT_TABLES[table]['label']
+                    if fmt == "csv":
+                        with zf.open(f"{name}.csv", "w", force_zip64=True) as f:
+                            for chunk, n in _csv_pages(conn, table, start, end, EXPORT_PAGE_SIZE):
+                                f.write(chunk)
+                                on_page(n)
+                    else:
+                        part = f"{path}.{table}.parquet"
+                        try:
+                            _write_parquet(conn, table, start, end, part, on_page)
+                            zf.write(part, f"{name}.parquet", compress_type=zipfile.ZIP_STORED)    # 이미 압축된 형식
+                        finally:
+                            if os.path.exists(part): os.remove(part)
+    except BaseException:
+        if os.path.exists(path): os.remove(path)
+        raise
+    return {'path': path, 'rows': counts, 'bytes': os.path.getsize(path)}
+
+def export_path(file_name):
+    return os.path.join(EXPORT_DIR, file_name)
+
+def downloadable(result):
+    """화면 다운로드 버튼으로 보낼 수 있는 크기인지 (버튼은 파일 전체를 메모리에 올림)"""
+    return result['bytes'] <= EXPORT_DOWNLOAD_MAX_MB * 1e6
+
+def read_export(path):
+    """다운로드 버튼을 누를 때 파일 내용 (읽고 바로 닫음)"""
+    with open(path, "rb") as f:
+        return f.read()
+
+def purge_exports(days=EXPORT_KEEP_DAYS):
+    """보관 기간이 지난 내보내기 파일 삭제"""
+    if not os.path.isdir(EXPORT_DIR):
+        return
+    cutoff = time.time() - days * 86400
+    for name in os.listdir(EXPORT_DIR):
+        path = os.path.join(EXPORT_DIR, name)
+        if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+            os.remove(path)
+
+def main():
+    parser = argparse.ArgumentParser(description="5A 플래너 전체 데이터 내보내기 (기간 내 모든 학생의 계획/일지/목표)")
+    parser.add_argument("--db", help="DB 경로 또는 URL (기본: PLANNER_DB_URL / PLANNER_DB)")
+    parser.add_argument("--start", type=datetime.date.fromisoformat, required=True)
+    parser.add_argument("--end", type=datetime.date.fromisoformat, required=True)
+    parser.add_argument("--format", choices=list(FORMATS), default="csv")
+    parser.add_argument("--tables", default=",".join(EXPORT_TABLES), help="내보낼 표 (쉼표 구분: plans,logs,goals)")
+    parser.add_argument("--out", help="저장할 파일 경로 (기본: 현재 폴더에 자동 이름)")
+    args = parser.parse_args()
+
+    out = args.out or export_file_name(args.format, args.start, args.end)
+    started = time.perf_counter()
+    with get_db_connection(args.db) as conn:
+        result = write_export(conn, args.format, args.start, args.end, args.tables.split(","), out)
+    print(f"{out}: {result['rows']} ({result['bytes'] / 1e6:.1f}MB, {time.perf_counter() - started:.1f}s)")
+
+if __name__ == "__main__":
+    main()
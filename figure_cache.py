@@ -0,0 +1,92 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from db import current_tenant
+from query_cache import add_invalidation_listener
+
+try:
+    import plotly.graph_objects as go
+    HAS_PLOTLY = True
+except ImportError:
+    HAS_PLOTLY = False
+
+# -----------------------------------------------------------------------------
+# 1. 차트 캐시 설정 (관리자 분석 화면의 성적 추이 / 밸런스 차트)
+# -----------------------------------------------------------------------------
+# plotly 그림은 만들 때마다 모든 속성을 검사해서 느립니다 (성적 추이 1개 ≈ 30ms).
+# 그림을 한 번 만들면 JSON 으로 저장해 두고, 다음 재실행(탭 전환 / 달력 날짜 클릭)에서는
+# 검사 없이 다시 만들어 씁니다. 키 = (지점, 차트 이름, 학생, 기간 등, 데이터 버전)
+# 학생의 계획이 바뀌면 그 학생의 데이터 버전이 올라가서 예전 그림은 더 이상 쓰이지 않습니다.
+FIGURE_CACHE_SIZE = int(os.environ.get("PLANNER_FIGURE_CACHE_SIZE", "256"))
+FIGURE_TABLES = {"daily_plans", "student_daily_stats"}
+
+# -----------------------------------------------------------------------------
+# 2. 학생별 데이터 버전 + LRU 저장소
+# -----------------------------------------------------------------------------
+class FigureCache:
+    def __init__(self, max_entries=FIGURE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # (지점, 이름, 학생, args) -> (데이터 버전, 그림 JSON)
+        self._versions = {}             # (지점, 학생 또는 None=모든 학생) -> 버전
+        self._lock = threading.Lock()
+
+    def version(self, user_id):
+        tenant = current_tenant()
+        with self._lock:
+            return (self._versions.get((tenant, None), 0), self._versions.get((tenant, user_id), 0))
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, version, spec):
+        with self._lock:
+            self._entries[key] = (version, spec)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def on_invalidate(self, tables, user_ids):
+        if not FIGURE_TABLES & set(tables):
+            return
+        tenant = current_tenant()
+        with self._lock:
+            for uid in (None,) if user_ids is None else user_ids:
+                self._versions[(tenant, uid)] = self._versions.get((tenant, uid), 0) + 1
+            # 버전이 바뀐 그림은 다시 쓰이지 않으므로 바로 비워서 자리 확보
+            for key in [k for k in self._entries if k[0] == tenant and (user_ids is None or k[2] in user_ids)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+figure_cache = FigureCache()
+add_invalidation_listener(figure_cache.on_invalidate)
+
+# -----------------------------------------------------------------------------
+# 3. 화면용 함수
+# -----------------------------------------------------------------------------
+def figure_version(user_id):
+    """학생의 현재 데이터 버전. 그림에 쓸 데이터를 읽기 **전에** 받아 두었다가 cached_figure 에 넘김
+    (읽은 뒤에 받으면, 그 사이 쓰기가 반영 안 된 그림이 새 버전으로 저장됨)"""
+    return figure_cache.version(user_id)
+
+def cached_figure(name, user_id, args, version, build):
+    """build() 로 만든 plotly 그림을 (학생, args, 데이터 버전)별로 재사용. args 는 기간/단위처럼 그림을 바꾸는 값
+    version = 데이터를 읽기 전에 받은 figure_version(user_id)"""
+    key = (current_tenant(), name, user_id, tuple(args))
+    spec = figure_cache.get(key, version)
+    if spec is None:
+        spec = build().to_json()
+        figure_cache.put(key, version, spec)
+    # 저장할 때 이미 검사한 그림이라 검사 생략 (_validate=False) → 만드는 비용 대부분이 빠짐
+    # 처음에도 저장한 JSON 에서 만들어야 화면에 보내는 내용이 매번 같음 (같은 차트로 인식 → 다시 그리지 않음)
+    return go.Figure(json.loads(spec), _validate=False)
@@ -0,0 +1,125 @@
+import argparse
+import datetime
+import getpass
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import streamlit as st
+
+from auth import create_user
+from db import get_db_connection, read_only, read_sql, tenant_ids, tenant_path, tenant_url, use_tenant
+from migrations import run_migrations
+
+# -----------------------------------------------------------------------------
+# 본사 화면: 모든 지점 DB를 조회만 해서 모아 보기 (admin_app 주소 뒤에 ?page=hq, 기본 지점 관리자만)
+# -----------------------------------------------------------------------------
+# 지점마다 DB가 따로라서 SQL 하나로 합칠 수 없으므로, 지점별로 같은 조회를 동시에 실행한 뒤 합칩니다.
+# 한 지점의 DB가 없거나 고장 나도 나머지 지점 결과는 보여줍니다.
+HQ_WORKERS = 8
+
+def fan_out(fn, tenants=None):
+    """fn(conn) 을 지점마다 (읽기 전용 연결로) 실행 → ({지점: 결과}, {지점: 에러 메시지})"""
+    tenants = tenants or tenant_ids()
+
+    def run(tenant):
+        with use_tenant(tenant), get_db_connection() as conn, read_only(conn):
+            return fn(conn)
+
+    results, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=min(HQ_WORKERS, len(tenants))) as pool:
+        futures = {tenant: pool.submit(run, tenant) for tenant in tenants}
+        for tenant, future in futures.items():
+            try:
+                results[tenant] = future.result()
+            except Exception as e:
+                errors[tenant] = str(e)
+    return results, errors
+
+def _concat(results, errors):
+    frames = [df.assign(branch=tenant) for tenant, df in results.items() if not df.empty]
+    return (pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()), errors
+
+def branch_summary(start, end):
+    """지점별 학생 수 / 기간 내 활동 학생 수 / 계획 수 / 평균 달성률 / 일지 수"""
+    def query(conn):
+        return read_sql("""
+            SELECT (SELECT COUNT(*) FROM users WHERE role='student') AS students,
+                   (SELECT COUNT(DISTINCT user_id) FROM student_daily_stats WHERE stat_date BETWEEN ? AND ?) AS active,
+                   (SELECT SUM(plan_count) FROM student_daily_stats WHERE stat_date BETWEEN ? AND ?) AS plans,
+                   (SELECT SUM(achievement_sum) * 1.0 / SUM(plan_count) FROM student_daily_stats WHERE stat_date BETWEEN ? AND ?) AS avg_score,
+                   (SELECT COUNT(*) FROM daily_logs WHERE log_date BETWEEN ? AND ?) AS logs
+        """, conn, params=(str(start), str(end)) * 4)
+    return _concat(*fan_out(query))
+
+def branch_daily_trend(start, end):
+    """지점 × 날짜별 평균 달성률 (집계 테이블만 읽음)"""
+    def query(conn):
+        return read_sql("""
+            SELECT stat_date, SUM(achievement_sum) * 1.0 / SUM(plan_count) AS avg_score
+            FROM student_daily_stats WHERE stat_date BETWEEN ? AND ? GROUP BY stat_date ORDER BY stat_date
+        """, conn, params=(str(start), str(end)))
+    return _concat(*fan_out(query))
+
+def show_hq():
+    c_back, _ = st.columns([4, 1])
+    if c_back.button("← 관리자 화면으로"):
+        st.query_params.pop("page", None)
+        st.rerun()
+    st.markdown("## 🏢 지점별 현황 (본사)")
+    today = datetime.date.today()
+    picked = st.date_input("기간", (today - datetime.timedelta(days=29), today), key="hq_range")
+    if len(picked) < 2:     # 끝 날짜를 고르는 중
+        st.stop()
+    start, end = picked
+    st.caption(f"서비스 중인 지점 {len(tenant_ids())}곳의 DB를 조회만 해서 합친 값입니다.")
+
+    summary, errors = branch_summary(start, end)
+    for tenant, msg in errors.items():
+        st.warning(f"[{tenant}] 지점 조회 실패: {msg}")
+    if summary.empty:
+        st.info("조회된 지점이 없습니다.")
+        return
+    show = summary.set_index('branch')[['students', 'active', 'plans', 'avg_score', 'logs']]
+    show.columns = ['학생 수', '활동 학생', '계획 수', '평균 달성률(%)', '일지 수']
+    st.dataframe(show.style.format({'평균 달성률(%)': "{:.1f}", '계획 수': "{:,.0f}"}, na_rep="-"), use_container_width=True)
+
+    trend, _ = branch_daily_trend(start, end)
+    if not trend.empty:
+        st.markdown("### 📈 일별 평균 달성률")
+        st.line_chart(trend.pivot(index='stat_date', columns='branch', values='avg_score'))
+
+# -----------------------------------------------------------------------------
+# 새 지점 만들기 (명령줄 전용: 주소창으로는 있는 지점만 고를 수 있음)
+# -----------------------------------------------------------------------------
+def create_branch(tenant, admin_username, admin_password, admin_name="지점 관리자"):
+    """PLANNER_TENANT_URL 규칙으로 새 지점 DB 파일 생성 → 스키마 적용 + 첫 관리자 계정 (이미 있으면 ValueError)"""
+    path = tenant_path(tenant)
+    if path is None:
+        raise ValueError(f"지점 id 가 올바르지 않거나 PLANNER_TENANT_URL(sqlite:///...{{tenant}}...) 이 없습니다: {tenant}")
+    if tenant in tenant_ids() or os.path.exists(path):
+        raise ValueError(f"이미 있는 지점입니다: {tenant}")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    run_migrations(tenant_url(tenant, create=True))
+    with use_tenant(tenant), get_db_connection() as conn:
+        create_user(conn, admin_username, admin_password, admin_name, role="admin")
+        conn.commit()
+
+def main():
+    parser = argparse.ArgumentParser(description="5A 플래너 새 지점 만들기 (지점 DB + 첫 관리자 계정)")
+    parser.add_argument("--create", metavar="BRANCH", required=True, help="새 지점 id (영문/숫자/-/_)")
+    parser.add_argument("--admin", default="admin", help="첫 관리자 아이디")
+    parser.add_argument("--admin-name", default="지점 관리자")
+    args = parser.parse_args()
+
+    password = getpass.getpass("관리자 비밀번호: ")
+    if not password:
+        parser.error("관리자 비밀번호를 입력하세요")
+    try:
+        create_branch(args.create, args.admin, password, args.admin_name)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"지점 '{args.create}' 생성 완료 (관리자: {args.admin})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+
+from query_cache import cached_read_sql
+
+# -----------------------------------------------------------------------------
+# 1. 5A 딥 인사이트 진단 기준 (한 명 리포트 / 전체 학생 진단표 공용)
+# -----------------------------------------------------------------------------
+GAP_ALERT = 40          # 과목 기복(최고-최저)이 이 이상이면 감정 기복형
+IMBALANCE_ALERT = 30    # 최고 과목과 최저 과목 평균 차이
+STRUGGLING_AVG = 40     # 전체 평균이 이보다 낮으면 기초 부족형
+BOTTLENECK_SCORE = 40   # 최저 과목 평균이 이보다 낮으면 "학습 병목"
+
+# 진단 우선순위: 위에서부터 먼저 맞는 것 하나
+DIAGNOSES = {
+    'rollercoaster': {
+        'title': "📉 진단: 감정 기복형 (Rollercoaster)",
+        'alert_type': "warning",
+        'steps': [
+            "**최소 습관(Min-Habit)**: 컨디션 최악인 날에도 무조건 해야 하는 '최소 분량' 설정",
+            "**시작 루틴**: 공부 시작 전 책상 정리 등 뇌 스위치를 켜는 의식 만들기",
+        ],
+        'script': "'{sname}아, {volatile_subj} 점수를 보니까 잘할 땐 완벽한데, 안 될 땐 너무 놔버리는 것 같아. 기복을 줄이는 게 이번 달 목표야.'",
+    },
+    'imbalance': {
+        'title': "⚖️ 진단: 과목 편식형 (Imbalance)",
+        'alert_type': "error",
+        'steps': [
+            "**샌드위치 학습법**: [선호 과목] ➔ [비선호 과목(30분)] ➔ [선호 과목] 배치",
+            "**허들 낮추기**: {worst_subj}는 당분간 쉬운 문제 위주로 성공 경험 쌓기",
+        ],
+        'script': "'{sname}아, {best_subj}는 정말 잘하는데 {worst_subj}가 조금 아쉽네. 맛있는 거 먹기 전에 야채 한 입만 먹는다고 생각하고 {worst_subj}부터 해볼까?'",
+    },
+    'struggling': {
+        'title': "🌧️ 진단: 기초 부족형 (Struggling)",
+        'alert_type': "secondary",
+        'steps': [
+            "**타임 박싱(Time Boxing)**: 20분 공부 + 5분 휴식 사이클 도입",
+            "**플래너 간소화**: 하루 핵심 과제 3개만 적고 100% 달성하기",
+        ],
+        'script': "'{sname}아, 욕심내지 말고 천천히 가자. 오늘 플래너에 적힌 거 딱 하나만이라도 제대로 끝내면 선생님은 만족해.'",
+    },
+    'mastery': {
+        'title': "🚀 진단: 자기주도 완성형 (Mastery)",
+        'alert_type': "success",
+        'steps': [
+            "**백지 복습**: 공부한 내용을 보지 않고 구조도 그리기",
+            "**티칭 학습**: 친구나 선생님에게 오늘 배운 내용 설명하기",
+        ],
+        'script': "'{sname}아, 지금 폼 정말 좋다! 꾸준함이 무기라는 걸 네가 증명하고 있어. 이대로만 가자!'",
+    },
+}
+
+def diagnosis_code(max_gap, best_score, worst_score, total_avg):
+    """스칼라/배열 모두 가능 (전체 학생 계산 시 numpy 배열로 한 번에)"""
+    return np.select(
+        [np.asarray(max_gap) >= GAP_ALERT,
+         (np.asarray(best_score) - np.asarray(worst_score)) >= IMBALANCE_ALERT,
+         np.asarray(total_avg) < STRUGGLING_AVG],
+        ['rollercoaster', 'imbalance', 'struggling'], 'mastery')
+
+# -----------------------------------------------------------------------------
+# 2. 한 학생 리포트
+# -----------------------------------------------------------------------------
+def student_report(subj_stats, sname):
+    """subj_stats(index=subject, columns=count, mean, max, min) → 리포트 내용 dict
+    (표시용 통계표, 브리핑 문장, 진단/처방/상담 스크립트)"""
+    subj_stats = subj_stats.copy()
+    subj_stats['gap'] = subj_stats['max'] - subj_stats['min']
+
+    # 핵심 지표 (계획 개수 가중 평균 = 원본 전체 평균)
+    total_avg = (subj_stats['mean'] * subj_stats['count']).sum() / subj_stats['count'].sum()
+    best_subj = subj_stats['mean'].idxmax()
+    worst_subj = subj_stats['mean'].idxmin()
+    volatile_subj = subj_stats['gap'].idxmax()
+    best_score = subj_stats.loc[best_subj, 'mean']
+    worst_score = subj_stats.loc[worst_subj, 'mean']
+    max_gap = subj_stats.loc[volatile_subj, 'gap']
+
+    # --- 관리자 브리핑 포인트 ---
+    briefing_points = []
+    # 1. 전체 퍼포먼스
+    if total_avg >= 80:
+        briefing_points.append(f"🚀 **전체 퍼포먼스**: 평균 이행률 **{total_avg:.1f}%**로 '자기주도 완성형' 단계입니다.")
+    elif total_avg >= 50:
+        briefing_points.append(f"⚠️ **전체 퍼포먼스**: 평균 이행률 **{total_avg:.1f}%**로 중위권입니다. 실행의 기복을 잡는 것이 급선무입니다.")
+    else:
+        briefing_points.append(f"🚨 **전체 퍼포먼스**: 평균 이행률 **{total_avg:.1f}%**로 학습 습관 형성이 시급합니다.")
+    # 2. 강점/약점
+    briefing_points.append(f"👍 **전략 과목**: **'{best_subj}'**은 평균 **{best_score:.1f}%**로 학습을 주도하고 있습니다.")
+    if worst_score < BOTTLENECK_SCORE:
+        briefing_points.append(f"🚧 **학습 병목**: **'{worst_subj}'** 이행률이 **{worst_score:.1f}%**에 머물러 전체 평균을 깎아먹고 있습니다.")
+    # 3. 불안정성
+    if max_gap >= GAP_ALERT:
+        briefing_points.append(f"📉 **불안정성 감지**: **'{volatile_subj}'** 과목은 기복이 **{max_gap:.0f}%** 포인트나 됩니다. 기분파 학습을 경계해야 합니다.")
+
+    # --- 솔루션 매칭 ---
+    code = str(diagnosis_code(max_gap, best_score, worst_score, total_avg))
+    names = dict(sname=sname, best_subj=best_subj, worst_subj=worst_subj, volatile_subj=volatile_subj)
+    diag = DIAGNOSES[code]
+    return {
+        'stats': subj_stats[['mean', 'max', 'min', 'gap']],
+        'total_avg': total_avg,
+        'briefing_points': briefing_points,
+        'code': code,
+        'diagnosis_title': diag['title'],
+        'alert_type': diag['alert_type'],
+        'solution_steps': [s.format(**names) for s in diag['steps']],
+        'teacher_script': diag['script'].format(**names),
+    }
+
+# -----------------------------------------------------------------------------
+# 3. 전체 학생 진단표 (집계표 한 번 조회 → groupby 한 번)
+# -----------------------------------------------------------------------------
+def cohort_diagnosis(conn, start, end):
+    """기간 내 모든 학생의 진단 결과 (학생 1명 = 1행, 위험도 높은 순)
+    columns: user_id, real_name, group_color, total_avg, best_subj, best_score, worst_subj, worst_score,
+             volatile_subj, max_gap, code, diagnosis"""
+    stats = cached_read_sql(conn, """
+        SELECT user_id, subject, SUM(plan_count) AS count, SUM(achievement_sum) * 1.0 / SUM(plan_count) AS mean,
+               MAX(achievement_max) AS max, MIN(achievement_min) AS min
+        FROM student_daily_stats WHERE stat_date BETWEEN ? AND ?
+        GROUP BY user_id, subject ORDER BY user_id, subject
+    """, (str(start), str(end)), tables=["student_daily_stats"])
+    users = cached_read_sql(conn, "SELECT id AS user_id, real_name, group_color FROM users WHERE role='student'", tables=["users"])
+    return cohort_table(stats, users)
+
+def cohort_table(stats, users):
+    """(user_id, subject)별 count/mean/max/min 표 → 학생별 진단표 (DB 없이 계산만)"""
+    columns = ['user_id', 'real_name', 'group_color', 'total_avg', 'best_subj', 'best_score', 'worst_subj',
+               'worst_score', 'volatile_subj', 'max_gap', 'code', 'diagnosis']
+    if stats.empty:
+        return pd.DataFrame(columns=columns)
+    stats = stats.assign(gap=stats['max'] - stats['min'], weighted=stats['mean'] * stats['count'])
+    g = stats.groupby('user_id')
+    best = stats.loc[g['mean'].idxmax(), ['user_id', 'subject', 'mean']].set_index('user_id')
+    worst = stats.loc[g['mean'].idxmin(), ['user_id', 'subject', 'mean']].set_index('user_id')
+    volatile = stats.loc[g['gap'].idxmax(), ['user_id', 'subject', 'gap']].set_index('user_id')
+
+    table = pd.DataFrame({
+        'total_avg': g['weighted'].sum() / g['count'].sum(),
+        'best_subj': best['subject'], 'best_score': best['mean'],
+        'worst_subj': worst['subject'], 'worst_score': worst['mean'],
+        'volatile_subj': volatile['subject'], 'max_gap': volatile['gap'],
+    })
+    table['code'] = diagnosis_code(table['max_gap'], table['best_score'], table['worst_score'], table['total_avg'])
+    table['diagnosis'] = table['code'].map({k: v['title'] for k, v in DIAGNOSES.items()})
+    table = table.reset_index().merge(users, on='user_id', how='inner')
+    # 위험도 순서: 기초 부족 → 기복 → 편식 → 완성, 같은 진단이면 평균 낮은 순
+    order = {'struggling': 0, 'rollercoaster': 1, 'imbalance': 2, 'mastery': 3}
+    table = table.sort_values(['code', 'total_avg'], key=lambda s: s.map(order) if s.name == 'code' else s)
+    return table[columns].reset_index(drop=True)
@@ -0,0 +1,250 @@
+import contextvars
+import datetime
+import json
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from bulk_import import import_csv
+from db import current_tenant, get_db_connection, insert_id, use_tenant
+from export import export_file_name, export_path, purge_exports, write_export
+from insights import student_report
+from plans import delete_user_plans, load_subject_stats
+from query_cache import cached_read_sql, invalidate_on_commit
+from query_stats import query_scope
+from sessions import use_branch
+
+# -----------------------------------------------------------------------------
+# 1. 백그라운드 작업 실행기 (무거운 관리자 작업을 화면 스레드 밖에서)
+# -----------------------------------------------------------------------------
+# 작업 상태는 jobs 테이블에 기록하므로, 화면(세션)은 작업 id만 들고 있다가 상태를 조회합니다.
+# 작업 함수는 SQLite 조회/pandas 계산이 대부분이라 스레드 풀로 충분합니다. (GIL이 풀리는 구간)
+JOB_WORKERS = int(os.environ.get("PLANNER_JOB_WORKERS", "2"))
+JOB_POLL_SEC = 1.0          # 화면에서 상태를 다시 확인하는 간격
+JOB_KEEP_DAYS = 7           # 끝난 작업 기록 보관 기간
+ACTIVE = ('queued', 'running')
+# 이 프로세스가 맡은 대기/실행 중 작업은 JOB_HEARTBEAT_SEC 마다 heartbeat_at 을 갱신합니다.
+# 워커가 재시작/종료돼서 JOB_STALE_SEC 넘게 갱신되지 않은 작업은 실패로 표시 (화면이 영원히 기다리지 않게)
+JOB_HEARTBEAT_SEC = 30
+JOB_STALE_SEC = int(os.environ.get("PLANNER_JOB_STALE_SEC", str(JOB_HEARTBEAT_SEC * 4)))
+STALE_ERROR = "작업 서버가 재시작되어 중단되었습니다. 다시 실행해주세요."
+
+_handlers = {}
+_executor = None
+_executor_lock = threading.Lock()
+_mine = {}      # 지점 -> 이 프로세스가 맡은 (대기/실행 중) 작업 id 집합
+_mine_lock = threading.Lock()
+
+class JobCancelled(Exception):
+    pass
+
+def job_handler(kind):
+    """작업 종류 등록: fn(conn, job, **params) → JSON으로 저장 가능한 결과"""
+    def register(fn):
+        _handlers[kind] = fn
+        return fn
+    return register
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="planner-job")
+            threading.Thread(target=_heartbeat_loop, name="planner-job-heartbeat", daemon=True).start()
+            fail_stale_jobs()
+            purge_jobs()
+            purge_exports()
+        return _executor
+
+def _heartbeat_loop():
+    while True:
+        time.sleep(JOB_HEARTBEAT_SEC)
+        with _mine_lock:
+            mine = {tenant: list(ids) for tenant, ids in _mine.items() if ids}
+        for tenant, ids in mine.items():
+            try:
+                with use_tenant(tenant), get_db_connection() as conn:
+                    conn.execute(f"UPDATE jobs SET heartbeat_at=? WHERE id IN ({','.join('?' * len(ids))})", [time.time()] + ids)
+                    conn.commit()
+            except Exception:
+                traceback.print_exc()
+
+def fail_stale_jobs(job_id=None):
+    """heartbeat 가 JOB_STALE_SEC 넘게 멈춘 대기/실행 중 작업을 실패로 표시 (job_id 를 주면 그 작업만)"""
+    sql = "UPDATE jobs SET status='failed', error=?, finished_at=CURRENT_TIMESTAMP WHERE status IN ('queued', 'running') AND COALESCE(heartbeat_at, 0) < ?"
+    params = [STALE_ERROR, time.time() - JOB_STALE_SEC]
+    if job_id is not None:
+        sql += " AND id=?"
+        params.append(job_id)
+    with get_db_connection() as conn:
+        cur = conn.execute(sql, params)
+        conn.commit()
+    return cur.rowcount
+
+class Job:
+    """작업 함수에 넘겨주는 진행 상황 보고용 객체"""
+    def __init__(self, job_id):
+        self.id = job_id
+
+    def progress(self, done, total):
+        """진행률 기록 + 취소 요청 확인 (취소됐으면 JobCancelled)"""
+        with get_db_connection() as conn:
+            cur = conn.execute("UPDATE jobs SET progress=? WHERE id=? AND status='running'", (done / max(total, 1), self.id))
+            conn.commit()
+        if cur.rowcount == 0:
+            raise JobCancelled()
+
+def _finish(job_id, status, result=None, error=None):
+    with get_db_connection() as conn:
+        conn.execute("UPDATE jobs SET status=?, result=?, error=?, progress=CASE WHEN ?='done' THEN 1 ELSE progress END, finished_at=CURRENT_TIMESTAMP WHERE id=? AND status='running'",
+                     (status, None if result is None else json.dumps(result, ensure_ascii=False), error, status, job_id))
+        conn.commit()
+
+def _run(job_id, kind, params):
+    try:
+        _execute(job_id, kind, params)
+    finally:
+        with _mine_lock:
+            _mine.get(current_tenant(), set()).discard(job_id)
+
+def _execute(job_id, kind, params):
+    with get_db_connection() as conn:
+        # 대기 중에 취소된 작업이면 시작하지 않음
+        cur = conn.execute("UPDATE jobs SET status='running', started_at=CURRENT_TIMESTAMP, heartbeat_at=? WHERE id=? AND status='queued'", (time.time(), job_id))
+        conn.commit()
+    if cur.rowcount == 0:
+        return
+    try:
+        with get_db_connection() as conn, query_scope(f"job.{kind}"):
+            result = _handlers[kind](conn, Job(job_id), **params)
+        _finish(job_id, 'done', result=result)
+    except JobCancelled:
+        pass
+    except Exception as e:
+        traceback.print_exc()
+        _finish(job_id, 'failed', error=str(e))
+
+# -----------------------------------------------------------------------------
+# 2. 작업 API (제출 / 상태 조회 / 결과 / 취소)
+# -----------------------------------------------------------------------------
+def submit_job(kind, params, created_by=None):
+    """작업을 jobs 테이블에 등록하고 실행기에 넘김 → 작업 id"""
+    if kind not in _handlers:
+        raise ValueError(f"알 수 없는 작업 종류: {kind}")
+    with get_db_connection() as conn:
+        job_id = insert_id(conn, "INSERT INTO jobs (kind, params, created_by, heartbeat_at) VALUES (?,?,?,?)",
+                           (kind, json.dumps(params, ensure_ascii=False), created_by, time.time()))
+        conn.commit()
+    with _mine_lock:
+        _mine.setdefault(current_tenant(), set()).add(job_id)
+    # 제출한 화면의 지점(contextvar)을 그대로 가지고 실행 → 작업도 같은 지점 DB를 씀
+    _get_executor().submit(contextvars.copy_context().run, _run, job_id, kind, params)
+    return job_id
+
+def get_job(job_id):
+    """{'id', 'kind', 'status', 'progress', 'error', 'created_at', 'finished_at'} 또는 None"""
+    with get_db_connection() as conn:
+        row = conn.execute("SELECT id, kind, status, progress, error, created_at, finished_at, heartbeat_at FROM jobs WHERE id=?", (job_id,)).fetchone()
+    if row is None: return None
+    if row[2] in ACTIVE and (row[7] or 0) < time.time() - JOB_STALE_SEC and fail_stale_jobs(job_id):
+        # 맡은 워커가 사라진 작업 → 실패로 바꾼 뒤 다시 읽음
+        return get_job(job_id)
+    return dict(zip(('id', 'kind', 'status', 'progress', 'error', 'created_at', 'finished_at'), row))
+
+def job_result(job_id):
+    """완료된 작업의 결과 (완료 전이면 None)"""
+    with get_db_connection() as conn:
+        row = conn.execute("SELECT result FROM jobs WHERE id=? AND status='done'", (job_id,)).fetchone()
+    return json.loads(row[0]) if row and row[0] is not None else None
+
+def cancel_job(job_id):
+    """대기 중이면 바로 취소, 실행 중이면 다음 진행률 보고 때 멈춤"""
+    with get_db_connection() as conn:
+        cur = conn.execute("UPDATE jobs SET status='cancelled', finished_at=CURRENT_TIMESTAMP WHERE id=? AND status IN ('queued', 'running')", (job_id,))
+        conn.commit()
+    return cur.rowcount > 0
+
+def purge_jobs(days=JOB_KEEP_DAYS):
+    # created_at 은 CURRENT_TIMESTAMP(UTC) 기준
+    cutoff = (datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+    with get_db_connection() as conn:
+        conn.execute("DELETE FROM jobs WHERE status NOT IN ('queued', 'running') AND created_at < ?", (cutoff,))
+        conn.commit()
+
+# -----------------------------------------------------------------------------
+# 3. 관리자 작업 종류
+# -----------------------------------------------------------------------------
+@job_handler("insight_report")
+def _insight_report(conn, job, user_id, start, end, sname):
+    subj_stats = load_subject_stats(conn, user_id, start, end)
+    if subj_stats.empty:
+        return None
+    report = student_report(subj_stats, sname)
+    report['stats'] = report['stats'].to_dict('index')
+    report['total_avg'] = float(report['total_avg'])
+    return report
+
+@job_handler("logs_csv")
+def _logs_csv(conn, job, user_id, start, end):
+    logs_df = cached_read_sql(conn, """
+        SELECT log_date, resolution, review
+        FROM daily_logs
+        WHERE user_id=? AND log_date BETWEEN ? AND ?
+        ORDER BY log_date DESC
+    """, (user_id, start, end), user_id=user_id, tables=["daily_logs"])
+    return {'rows': len(logs_df), 'csv': logs_df.to_csv(index=False)}
+
+@job_handler("academy_export")
+def _academy_export(conn, job, start, end, fmt, tables):
+    """학원 전체 내보내기: 페이지 단위로 읽어서 파일에 바로 씀 (결과에는 파일 경로만 저장)"""
+    file_name = export_file_name(fmt, start, end)
+    result = write_export(conn, fmt, start, end, tables, export_path(f"{current_tenant()}_{job.id}_{file_name}"), progress=job.progress)
+    result['file_name'] = file_name
+    return result
+
+@job_handler("bulk_import")
+def _bulk_import(conn, job, kind, path, dry_run=False):
+    """CSV 일괄 등록 (dry_run 이면 검사만). 끝나면 올려둔 파일 삭제"""
+    try:
+        return import_csv(conn, kind, path, dry_run=dry_run, progress=job.progress)
+    finally:
+        if os.path.exists(path): os.remove(path)
+
+DELETE_CHUNK_SIZE = 50
+
+@job_handler("delete_users")
+def _delete_users(conn, job, user_ids):
+    """회원 + 학습 기록 + 메시지 삭제 (DELETE_CHUNK_SIZE 명씩 커밋, 중간 취소 가능)"""
+    deleted = 0
+    for i in range(0, len(user_ids), DELETE_CHUNK_SIZE):
+        chunk = user_ids[i:i + DELETE_CHUNK_SIZE]
+        placeholders = ','.join('?' * len(chunk))
+        conn.execute(f"DELETE FROM users WHERE id IN ({placeholders})", chunk)
+        delete_user_plans(conn, chunk)
+        conn.execute(f"DELETE FROM messages WHERE from_id IN ({placeholders}) OR to_id IN ({placeholders})", chunk * 2)
+        invalidate_on_commit(conn, ["users"])
+        invalidate_on_commit(conn, ["messages"], chunk)
+        conn.commit()
+        deleted += len(chunk)
+        job.progress(deleted, len(user_ids))
+    return {'deleted': deleted}
+
+# -----------------------------------------------------------------------------
+# 4. 화면용: 진행 중인 작업 표시 (fragment만 주기적으로 다시 실행)
+# -----------------------------------------------------------------------------
+@st.fragment(run_every=JOB_POLL_SEC)
+def job_progress(job_id, label):
+    """작업이 끝나면 전체 화면을 한 번 다시 그려서 결과를 표시하게 함"""
+    use_branch()    # fragment 만 다시 실행될 때도 같은 지점 DB
+    job = get_job(job_id)
+    if job is None or job['status'] not in ACTIVE:
+        st.rerun()
+    c_bar, c_cancel = st.columns([4, 1])
+    c_bar.progress(job['progress'] or 0.0, text=f"⏳ {label} ({'대기 중' if job['status'] == 'queued' else '처리 중'})")
+    if c_cancel.button("취소", key=f"job_cancel_{job_id}"):
+        cancel_job(job_id)
+        st.rerun()
@@ -0,0 +1,173 @@
+import argparse
+import datetime
+import json
+import threading
+import time
+
+import numpy as np
+
+import query_cache
+from auth import user_index
+from calendar_data import build_calendar_data, day_map, month_range
+from chat import fetch_latest
+from db import get_db_connection
+from insights import cohort_diagnosis
+from migrations import run_migrations
+from plans import load_signal_scores, load_subject_stats, update_achievement
+from query_cache import cached_read_sql
+
+# -----------------------------------------------------------------------------
+# 1. 화면별 조회 묶음 (관리자/학생 화면이 한 번 그려질 때 실행하는 조회와 같은 것)
+# -----------------------------------------------------------------------------
+# 사용 예: python load_test.py --db bench.db --threads 8 --duration 60
+# (가상 데이터는 seed_data.py 로 먼저 생성)
+def q_login_lookup(conn, rng, ctx):
+    conn.execute("SELECT id, username, password, role, real_name, group_color FROM users WHERE username=?",
+                 (ctx['usernames'][rng.integers(len(ctx['usernames']))],)).fetchone()
+
+def q_sidebar_signal(conn, rng, ctx):
+    cached_read_sql(conn, "SELECT id, real_name, group_color FROM users WHERE role='student' ORDER BY real_name", tables=["users"])
+    load_signal_scores(conn, ctx['today'] - datetime.timedelta(days=7))
+
+def q_analysis_plans(conn, rng, ctx):
+    sid = ctx['student_ids'][rng.integers(len(ctx['student_ids']))]
+    cached_read_sql(conn, "SELECT * FROM daily_plans WHERE user_id=? AND plan_date BETWEEN ? AND ?",
+                    (sid, ctx['today'] - datetime.timedelta(days=30), ctx['today']), user_id=sid, tables=["daily_plans"])
+
+def q_subject_stats(conn, rng, ctx):
+    sid = ctx['student_ids'][rng.integers(len(ctx['student_ids']))]
+    load_subject_stats(conn, sid, ctx['today'] - datetime.timedelta(days=30), ctx['today'])
+
+def q_daily_logs(conn, rng, ctx):
+    sid = ctx['student_ids'][rng.integers(len(ctx['student_ids']))]
+    cached_read_sql(conn, "SELECT log_date, resolution, review FROM daily_logs WHERE user_id=? AND log_date BETWEEN ? AND ? ORDER BY log_date DESC",
+                    (sid, ctx['today'] - datetime.timedelta(days=30), ctx['today']), user_id=sid, tables=["daily_logs"])
+
+def q_student_calendar(conn, rng, ctx):
+    # calendar_data.month_calendar 와 같은 조회 + 요약 (--db 연결을 쓰도록 풀어서)
+    sid = ctx['student_ids'][rng.integers(len(ctx['student_ids']))]
+    start, end = month_range(ctx['today'].year, ctx['today'].month)
+    plans = cached_read_sql(conn, "SELECT plan_date, achievement FROM daily_plans WHERE user_id=? AND plan_date BETWEEN ? AND ?", (sid, str(start), str(end)),
+                            user_id=sid, tables=["daily_plans"])
+    day_map(build_calendar_data(plans, start, end))
+
+def q_chat_latest(conn, rng, ctx):
+    sid = ctx['student_ids'][rng.integers(len(ctx['student_ids']))]
+    fetch_latest(conn, ctx['admin_id'], sid)
+
+def q_achievement_update(conn, rng, ctx):
+    sid = ctx['student_ids'][rng.integers(len(ctx['student_ids']))]
+    row = conn.execute("SELECT id FROM daily_plans WHERE user_id=? AND plan_date=?", (sid, str(ctx['today']))).fetchone()
+    if row:
+        update_achievement(conn, row[0], int(rng.integers(0, 11)) * 10)
+        conn.commit()
+
+def q_cohort_diagnosis(conn, rng, ctx):
+    cohort_diagnosis(conn, ctx['today'] - datetime.timedelta(days=30), ctx['today'])
+
+# (이름, 함수, 비중) - 등원 시간대 실제 사용 비율에 가깝게
+QUERY_MIX = [
+    ("login_lookup", q_login_lookup, 10),
+    ("sidebar_signal", q_sidebar_signal, 15),
+    ("analysis_plans", q_analysis_plans, 15),
+    ("subject_stats", q_subject_stats, 15),
+    ("daily_logs", q_daily_logs, 10),
+    ("student_calendar", q_student_calendar, 20),
+    ("chat_latest", q_chat_latest, 10),
+    ("achievement_update", q_achievement_update, 4),
+    ("cohort_diagnosis", q_cohort_diagnosis, 1),
+]
+
+# -----------------------------------------------------------------------------
+# 2. 실행기 (스레드 N개가 비중대로 조회를 골라 반복, 조회별 지연 시간 기록)
+# -----------------------------------------------------------------------------
+def _context(path):
+    with get_db_connection(path) as conn:
+        users = conn.execute("SELECT id, username FROM users WHERE role='student'").fetchall()
+        admin_id = conn.execute("SELECT id FROM users WHERE role='admin' ORDER BY id LIMIT 1").fetchone()[0]
+        last_day = conn.execute("SELECT MAX(plan_date) FROM daily_plans").fetchone()[0]
+    if not users:
+        raise SystemExit("학생 데이터가 없습니다. seed_data.py 로 먼저 생성하세요.")
+    return {
+        'student_ids': [u[0] for u in users],
+        'usernames': [u[1] for u in users],
+        'admin_id': admin_id,
+        'today': datetime.date.fromisoformat(str(last_day)[:10]) if last_day else datetime.date.today(),
+    }
+
+def run(path=None, threads=4, duration=30.0, iterations=None, read_only=False, use_cache=False, seed=None):
+    """조회별 지연 시간(ms) 목록 dict 반환"""
+    run_migrations(path)
+    ctx = _context(path)
+    if not use_cache:
+        # 메모리 캐시 적중이 아니라 DB 조회 자체를 재기 위해 캐시를 끔
+        query_cache.cache.max_entries = 0
+        user_index.max_entries = 0
+    mix = [(n, f, w) for n, f, w in QUERY_MIX if not (read_only and n == "achievement_update")]
+    names = [m[0] for m in mix]
+    funcs = {m[0]: m[1] for m in mix}
+    weights = np.array([m[2] for m in mix], dtype=float)
+    weights /= weights.sum()
+    samples = {n: [] for n in names}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    per_thread = None if iterations is None else max(1, iterations // threads)
+
+    def worker(worker_no):
+        rng = np.random.default_rng(None if seed is None else seed + worker_no)
+        local = {n: [] for n in names}
+        done = 0
+        while (per_thread is None and time.perf_counter() < deadline) or (per_thread is not None and done < per_thread):
+            name = names[rng.choice(len(names), p=weights)]
+            t0 = time.perf_counter()
+            with get_db_connection(path) as conn:
+                funcs[name](conn, rng, ctx)
+            local[name].append((time.perf_counter() - t0) * 1000)
+            done += 1
+        with lock:
+            for n in names:
+                samples[n].extend(local[n])
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool: t.start()
+    for t in pool: t.join()
+    return samples, time.perf_counter() - started
+
+def summarize(samples, elapsed):
+    """조회별 p50/p95/p99/평균/최대(ms)와 초당 처리량"""
+    report = {}
+    for name, values in samples.items():
+        if not values: continue
+        arr = np.asarray(values)
+        p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+        report[name] = {'count': len(arr), 'p50': round(p50, 2), 'p95': round(p95, 2), 'p99': round(p99, 2),
+                        'mean': round(arr.mean(), 2), 'max': round(arr.max(), 2), 'qps': round(len(arr) / elapsed, 1)}
+    return report
+
+def print_report(report, elapsed):
+    print(f"\n{'조회':<20}{'횟수':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}{'qps':>8}   (ms, 총 {elapsed:.1f}s)")
+    for name, r in report.items():
+        print(f"{name:<20}{r['count']:>8}{r['p50']:>10.2f}{r['p95']:>10.2f}{r['p99']:>10.2f}{r['max']:>10.2f}{r['qps']:>8.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="5A 플래너 부하 테스트 (화면 조회 묶음을 반복 실행하고 지연 시간 분포 출력)")
+    parser.add_argument("--db", help="DB 경로 또는 URL (기본: PLANNER_DB_URL / PLANNER_DB)")
+    parser.add_argument("--threads", type=int, default=4, help="동시 사용자(스레드) 수")
+    parser.add_argument("--duration", type=float, default=30.0, help="실행 시간(초)")
+    parser.add_argument("--iterations", type=int, default=None, help="시간 대신 총 실행 횟수로 제한")
+    parser.add_argument("--read-only", action="store_true", help="성취도 수정(쓰기) 제외")
+    parser.add_argument("--cache", action="store_true", help="조회 캐시를 켠 상태로 측정")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", help="결과를 JSON 파일로 저장")
+    args = parser.parse_args()
+
+    samples, elapsed = run(args.db, args.threads, args.duration, args.iterations, args.read_only, args.cache, args.seed)
+    report = summarize(samples, elapsed)
+    print_report(report, elapsed)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({'threads': args.threads, 'elapsed_sec': round(elapsed, 2), 'cache': args.cache, 'queries': report}, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
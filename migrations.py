@@ -0,0 +1,146 @@
+import threading
+
+from db import current_tenant, get_db_connection, tenant_url
+
+# -----------------------------------------------------------------------------
+# 1. 스키마 마이그레이션 (버전 순서대로 한 번씩만 실행)
+# -----------------------------------------------------------------------------
+# 새 테이블/인덱스가 필요하면 init_db()를 고치지 말고 맨 아래에 새 버전을 추가하세요.
+# 이미 배포된 버전의 내용은 절대 수정하지 않습니다.
+
+def _columns(conn, table):
+    if conn.dialect == "sqlite":
+        return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    return {row[0] for row in conn.execute("SELECT column_name FROM information_schema.columns WHERE table_name=?", (table,))}
+
+def _create_table(conn, ddl):
+    # PostgreSQL 에는 AUTOINCREMENT 가 없어서 SERIAL 로 바꿔서 생성
+    if conn.dialect != "sqlite":
+        ddl = ddl.replace("INTEGER PRIMARY KEY AUTOINCREMENT", "SERIAL PRIMARY KEY")
+    conn.execute(ddl)
+
+def _begin_exclusive(conn):
+    # 여러 워커가 동시에 떠도 한 곳에서만 적용
+    if conn.dialect == "sqlite":
+        conn.execute("BEGIN IMMEDIATE")
+    else:
+        conn.execute("SELECT pg_advisory_xact_lock(5001)")
+
+def _add_column(conn, table, column, ddl):
+    # 예전 버전 DB 파일에는 없는 컬럼이 있어서, 있을 때는 건너뜀
+    if column not in _columns(conn, table):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+def _create_base_tables(conn):
+    _create_table(conn, '''CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE, password TEXT, role TEXT, real_name TEXT, group_color TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    _create_table(conn, '''CREATE TABLE IF NOT EXISTS messages (id INTEGER PRIMARY KEY AUTOINCREMENT, from_id INTEGER, to_id INTEGER, message TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    _create_table(conn, '''CREATE TABLE IF NOT EXISTS daily_plans (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, plan_date DATE, subject TEXT, content TEXT, achievement INTEGER DEFAULT 0, linked_monthly_id INTEGER)''')
+    _create_table(conn, '''CREATE TABLE IF NOT EXISTS monthly_goals (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, year_month TEXT, subject TEXT, content TEXT, total_amount INTEGER, week_days TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    _create_table(conn, '''CREATE TABLE IF NOT EXISTS daily_logs (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, log_date DATE, resolution TEXT, review TEXT, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+
+def _fill_legacy_columns(conn):
+    # (SQLite는 ADD COLUMN에 CURRENT_TIMESTAMP 기본값을 허용하지 않음)
+    _add_column(conn, "users", "group_color", "TEXT")
+    _add_column(conn, "users", "created_at", "TIMESTAMP")
+    _add_column(conn, "daily_plans", "linked_monthly_id", "INTEGER")
+    _add_column(conn, "monthly_goals", "created_at", "TIMESTAMP")
+
+def _create_hot_query_indexes(conn):
+    # 학생별 기간 조회 (분석 탭 / 달력 탭 / 월간 보기) - 커버링 인덱스
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_daily_plans_user_date ON daily_plans (user_id, plan_date, subject, achievement)")
+    # 사이드바 최근 7일 신호등 (날짜 범위 → 학생별 평균)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_daily_plans_date_user ON daily_plans (plan_date, user_id, achievement)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_daily_logs_user_date ON daily_logs (user_id, log_date)")
+    # render_chat 양방향 조회 (from→to, to→from 각각 인덱스 탐색)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_pair ON messages (from_id, to_id, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_users_role_name ON users (role, real_name)")
+
+def _create_daily_stats(conn):
+    # 학생/날짜/과목별 성취도 집계표 (plans.py 쓰기 함수들이 갱신)
+    _create_table(conn, '''CREATE TABLE IF NOT EXISTS student_daily_stats (user_id INTEGER, stat_date DATE, subject TEXT, plan_count INTEGER, achievement_sum INTEGER, achievement_min INTEGER, achievement_max INTEGER, PRIMARY KEY (user_id, stat_date, subject))''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_daily_stats_date_user ON student_daily_stats (stat_date, user_id)")
+    # 기존 계획으로 처음 채우기 (plans.rebuild_daily_stats 를 부르지 않고 이 버전 당시의 SQL 을 그대로 둠)
+    conn.execute('''INSERT INTO student_daily_stats (user_id, stat_date, subject, plan_count, achievement_sum, achievement_min, achievement_max)
+                    SELECT user_id, plan_date, subject, COUNT(*), SUM(COALESCE(achievement, 0)), MIN(COALESCE(achievement, 0)), MAX(COALESCE(achievement, 0))
+                    FROM daily_plans
+                    GROUP BY user_id, plan_date, subject''')
+
+def _create_message_cursor_index(conn):
+    # 채팅 페이지네이션: (보낸이, 받는이) 안에서 id 순서로 바로 탐색
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_pair_id ON messages (from_id, to_id, id)")
+
+def _create_jobs_table(conn):
+    # 백그라운드 작업 (jobs.py) - 상태/진행률/결과(JSON) 기록
+    _create_table(conn, '''CREATE TABLE IF NOT EXISTS jobs (id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT, status TEXT DEFAULT 'queued', params TEXT, result TEXT, error TEXT, progress REAL DEFAULT 0, created_by INTEGER, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, started_at TIMESTAMP, finished_at TIMESTAMP)''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+
+def _create_sessions_table(conn):
+    # 로그인 세션 (sessions.py) - 워커가 재시작돼도 토큰으로 로그인 복원
+    _create_table(conn, '''CREATE TABLE IF NOT EXISTS sessions (token TEXT PRIMARY KEY, user_id INTEGER, user_data TEXT, last_read_id INTEGER DEFAULT 0, expires_at REAL)''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions (user_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at)")
+    # 안 읽은 메시지 수 (받는이 + id 범위)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_to_id ON messages (to_id, id)")
+
+def _create_message_reads(conn):
+    # 대화(나 ← 상대)별 마지막으로 읽은 메시지 id (chat.py) - 안 읽은 수는 idx_messages_pair_id 범위 COUNT
+    _create_table(conn, '''CREATE TABLE IF NOT EXISTS message_reads (user_id INTEGER, other_id INTEGER, last_read_id INTEGER DEFAULT 0, PRIMARY KEY (user_id, other_id))''')
+    # 예전 로그인 세션에 사용자 단위로 저장하던 읽음 위치를 대화별로 옮김
+    conn.execute('''INSERT INTO message_reads (user_id, other_id, last_read_id)
+                    SELECT m.to_id, m.from_id, MAX(m.id) FROM messages m
+                    JOIN (SELECT user_id, MAX(last_read_id) AS last_read_id FROM sessions GROUP BY user_id) s
+                      ON s.user_id = m.to_id AND m.id <= s.last_read_id
+                    GROUP BY m.to_id, m.from_id''')
+
+def _add_job_heartbeat(conn):
+    # 작업을 맡은 워커가 살아 있는지 (jobs.py 가 주기적으로 갱신, 오래 멈춘 대기/실행 중 작업은 실패 처리)
+    _add_column(conn, "jobs", "heartbeat_at", "REAL")
+
+def _create_cache_events(conn):
+    # 조회 캐시 무효화 기록 (query_cache.py) - 여러 워커가 같은 DB를 쓸 때 다른 워커 캐시도 비우도록
+    _create_table(conn, '''CREATE TABLE IF NOT EXISTS cache_events (id INTEGER PRIMARY KEY AUTOINCREMENT, tables TEXT, user_ids TEXT, created_at REAL)''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_events_created ON cache_events (created_at)")
+
+MIGRATIONS = [
+    (1, "기본 테이블 생성", _create_base_tables),
+    (2, "구버전 DB 컬럼 보정", _fill_legacy_columns),
+    (3, "핫 쿼리 인덱스", _create_hot_query_indexes),
+    (4, "학생별 일일 성취도 집계표", _create_daily_stats),
+    (5, "메시지 id 커서 인덱스", _create_message_cursor_index),
+    (6, "백그라운드 작업 테이블", _create_jobs_table),
+    (7, "로그인 세션 테이블", _create_sessions_table),
+    (8, "대화별 읽음 위치", _create_message_reads),
+    (9, "작업 heartbeat", _add_job_heartbeat),
+    (10, "캐시 무효화 기록", _create_cache_events),
+]
+
+# -----------------------------------------------------------------------------
+# 2. 실행기
+# -----------------------------------------------------------------------------
+_migrated = set()
+_migrate_lock = threading.Lock()
+
+def current_version(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER PRIMARY KEY, name TEXT, applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+def run_migrations(path=None):
+    """아직 적용되지 않은 마이그레이션을 순서대로 실행 (프로세스당 DB별 1회만 확인, 기본은 지금 지점 DB)"""
+    path = path or tenant_url(current_tenant())
+    if path in _migrated:
+        return
+    with _migrate_lock:
+        if path in _migrated:
+            return
+        with get_db_connection(path) as conn:
+            for version, name, migrate in MIGRATIONS:
+                _begin_exclusive(conn)
+                try:
+                    if current_version(conn) < version:
+                        migrate(conn)
+                        conn.execute("INSERT INTO schema_version (version, name) VALUES (?, ?)", (version, name))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+        _migrated.add(path)
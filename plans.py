@@ -0,0 +1,170 @@
+import numpy as np
+import pandas as pd
+
+from db import insert_id, insert_ids
+from query_cache import cached_read_sql, invalidate_on_commit
+
+# -----------------------------------------------------------------------------
+# 1. 학습 계획(daily_plans) 쓰기 경로
+# -----------------------------------------------------------------------------
+# daily_plans를 바꾸는 코드는 반드시 이 함수들을 거쳐야 합니다.
+# 그래야 학생별 일일 집계표(student_daily_stats)와 조회 캐시가 항상 원본과 일치합니다.
+PLAN_TABLES = ("daily_plans", "student_daily_stats", "monthly_goals")
+
+def _plan_keys(conn, plan_ids):
+    placeholders = ','.join('?' * len(plan_ids))
+    return conn.execute(f"SELECT DISTINCT user_id, plan_date FROM daily_plans WHERE id IN ({placeholders})", list(plan_ids)).fetchall()
+
+def insert_plans(conn, rows):
+    """rows: (user_id, plan_date, subject, content, achievement, linked_monthly_id) 목록"""
+    if not rows: return
+    conn.executemany("INSERT INTO daily_plans (user_id, plan_date, subject, content, achievement, linked_monthly_id) VALUES (?,?,?,?,?,?)", rows)
+    refresh_daily_stats(conn, {(r[0], r[1]) for r in rows})
+    invalidate_on_commit(conn, PLAN_TABLES, {r[0] for r in rows})
+
+def update_achievement(conn, plan_id, achievement):
+    conn.execute("UPDATE daily_plans SET achievement=? WHERE id=?", (achievement, plan_id))
+    keys = _plan_keys(conn, [plan_id])
+    refresh_daily_stats(conn, keys)
+    invalidate_on_commit(conn, PLAN_TABLES, {k[0] for k in keys})
+
+def update_plan(conn, plan_id, subject, content):
+    conn.execute("UPDATE daily_plans SET subject=?, content=? WHERE id=?", (subject, content, plan_id))
+    keys = _plan_keys(conn, [plan_id])
+    refresh_daily_stats(conn, keys)
+    invalidate_on_commit(conn, PLAN_TABLES, {k[0] for k in keys})
+
+def delete_plan(conn, plan_id):
+    keys = _plan_keys(conn, [plan_id])
+    conn.execute("DELETE FROM daily_plans WHERE id=?", (plan_id,))
+    refresh_daily_stats(conn, keys)
+    invalidate_on_commit(conn, PLAN_TABLES, {k[0] for k in keys})
+
+def delete_user_plans(conn, user_ids):
+    placeholders = ','.join('?' * len(user_ids))
+    conn.execute(f"DELETE FROM daily_plans WHERE user_id IN ({placeholders})", list(user_ids))
+    conn.execute(f"DELETE FROM student_daily_stats WHERE user_id IN ({placeholders})", list(user_ids))
+    invalidate_on_commit(conn, PLAN_TABLES, user_ids)
+
+# -----------------------------------------------------------------------------
+# 2. 일일 집계표 (student_daily_stats) 유지
+# -----------------------------------------------------------------------------
+# (학생, 날짜, 과목)별 개수/합계/최저/최고. 바뀐 날짜만 원본에서 다시 계산하므로
+# 한 번 갱신하는 비용은 그날 계획 개수만큼입니다. (최저/최고는 차감 계산이 안 됨)
+
+def refresh_daily_stats(conn, keys):
+    """keys: (user_id, plan_date) 목록 - 해당 날짜의 집계만 다시 계산"""
+    keys = [(uid, str(d)) for uid, d in set(keys)]
+    if not keys: return
+    conn.executemany("DELETE FROM student_daily_stats WHERE user_id=? AND stat_date=?", keys)
+    conn.executemany("""
+        INSERT INTO student_daily_stats (user_id, stat_date, subject, plan_count, achievement_sum, achievement_min, achievement_max)
+        SELECT user_id, plan_date, subject, COUNT(*), SUM(COALESCE(achievement, 0)), MIN(COALESCE(achievement, 0)), MAX(COALESCE(achievement, 0))
+        FROM daily_plans WHERE user_id=? AND plan_date=? GROUP BY subject
+    """, keys)
+
+def rebuild_daily_stats(conn):
+    """집계표 전체 재생성 (마이그레이션/더미 데이터 생성 직후용)"""
+    conn.execute("DELETE FROM student_daily_stats")
+    conn.execute("""
+        INSERT INTO student_daily_stats (user_id, stat_date, subject, plan_count, achievement_sum, achievement_min, achievement_max)
+        SELECT user_id, plan_date, subject, COUNT(*), SUM(COALESCE(achievement, 0)), MIN(COALESCE(achievement, 0)), MAX(COALESCE(achievement, 0))
+        FROM daily_plans
+        GROUP BY user_id, plan_date, subject
+    """)
+    invalidate_on_commit(conn, PLAN_TABLES)
+
+# -----------------------------------------------------------------------------
+# 3. 집계표 조회 (사이드바 신호등 / 밸런스 차트 / 딥 인사이트)
+# -----------------------------------------------------------------------------
+def load_signal_scores(conn, since):
+    """since 이후 학생별 평균 성취도 (user_id, avg_score)"""
+    return cached_read_sql(conn, """
+        SELECT user_id, SUM(achievement_sum) * 1.0 / SUM(plan_count) AS avg_score
+        FROM student_daily_stats WHERE stat_date >= ? GROUP BY user_id
+    """, (str(since),), tables=["student_daily_stats"])
+
+def load_subject_stats(conn, user_id, start, end):
+    """기간 내 과목별 평균/최고/최저 (index=subject, columns=count, mean, max, min)"""
+    return cached_read_sql(conn, """
+        SELECT subject, SUM(plan_count) AS count, SUM(achievement_sum) * 1.0 / SUM(plan_count) AS mean,
+               MAX(achievement_max) AS max, MIN(achievement_min) AS min
+        FROM student_daily_stats WHERE user_id=? AND stat_date BETWEEN ? AND ?
+        GROUP BY subject ORDER BY subject
+    """, (user_id, str(start), str(end)), user_id=user_id, tables=["student_daily_stats"], index_col='subject')
+
+def load_daily_stats(conn, user_id, start, end):
+    """기간 내 날짜 × 과목별 계획 수/성취도 합계 (columns=stat_date, subject, count, total)"""
+    return cached_read_sql(conn, """
+        SELECT stat_date, subject, SUM(plan_count) AS count, SUM(achievement_sum) AS total
+        FROM student_daily_stats WHERE user_id=? AND stat_date BETWEEN ? AND ?
+        GROUP BY stat_date, subject
+    """, (user_id, str(start), str(end)), user_id=user_id, tables=["student_daily_stats"])
+
+def load_weekly_stats(conn, user_id, start, end):
+    """기간 내 주차별 과목 평균 (week = 'YYYY-WW', 월요일 시작)"""
+    # 주차 계산은 DB마다 함수가 달라서 pandas 에서
+    daily = load_daily_stats(conn, user_id, start, end).copy()
+    daily['week'] = pd.to_datetime(daily['stat_date']).dt.strftime('%Y-%W')
+    weekly = daily.groupby(['week', 'subject'], as_index=False)[['count', 'total']].sum()
+    weekly['mean'] = weekly['total'] / weekly['count']
+    return weekly[['week', 'subject', 'count', 'mean']]
+
+# -----------------------------------------------------------------------------
+# 4. 계획 자동 분배 엔진 (날짜/페이지를 한 번에 계산 → executemany 1회)
+# -----------------------------------------------------------------------------
+def plan_dates(start_date, end_date, weekdays):
+    """start_date~end_date 중 선택한 요일(0=월 ... 6=일)에 해당하는 날짜 목록"""
+    if start_date > end_date: return []
+    days = pd.date_range(start_date, end_date, freq='D')
+    return list(days[days.weekday.isin(list(weekdays))].date)
+
+def split_pages(start_page, end_page, n_days):
+    """전체 페이지를 n_days 로 나눔 (나머지는 앞쪽 날짜부터 1쪽씩) → (시작쪽, 끝쪽) 배열"""
+    total_amount = end_page - start_page + 1
+    amounts = np.full(n_days, total_amount // n_days)
+    amounts[:total_amount % n_days] += 1
+    last_pages = start_page + np.cumsum(amounts) - 1
+    first_pages = last_pages - amounts + 1
+    return first_pages.tolist(), last_pages.tolist()
+
+def page_contents(content, start_page, end_page, n_days):
+    """날짜별 계획 내용 문자열 목록 ('교재 (p.1~p.8)')"""
+    first_pages, last_pages = split_pages(start_page, end_page, n_days)
+    return [f"{content} (p.{a}~p.{b})" for a, b in zip(first_pages, last_pages)]
+
+def build_plan_rows(user_id, subject, content, start_page, end_page, dates, monthly_id):
+    """daily_plans 에 넣을 행 목록 (insert_plans 형식)"""
+    contents = page_contents(content, start_page, end_page, len(dates))
+    return [(user_id, d, subject, text, 0, monthly_id) for d, text in zip(dates, contents)]
+
+def distribute_plan(conn, user_id, goal_label, subject, content, start_page, end_page, dates, weekdays):
+    """목표(monthly_goals) 1건 + 일간 계획 N건을 같은 트랜잭션에 기록하고 생성된 계획 행을 반환
+    (커밋은 호출한 쪽 get_db_connection 블록이 끝날 때)"""
+    monthly_id = insert_id(conn, "INSERT INTO monthly_goals (user_id, year_month, subject, content, total_amount, week_days) VALUES (?,?,?,?,?,?)",
+                           (user_id, goal_label, subject, content, end_page - start_page + 1, ",".join(map(str, weekdays))))
+    rows = build_plan_rows(user_id, subject, content, start_page, end_page, dates, monthly_id)
+    insert_plans(conn, rows)
+    return rows
+
+# -----------------------------------------------------------------------------
+# 5. 반 전체 배정 (여러 학생에게 같은 목표를 한 번에)
+# -----------------------------------------------------------------------------
+def assign_plan_to_students(conn, user_ids, goal_label, subject, content, start_page, end_page, dates, weekdays):
+    """user_ids 전원에게 목표 + 일간 계획을 생성 (트랜잭션 1개: 중간에 실패하면 아무도 배정되지 않음). 생성된 계획 수 반환
+    WAL 모드라 쓰는 동안에도 다른 화면의 조회는 막히지 않음"""
+    user_ids = list(dict.fromkeys(user_ids))
+    contents = page_contents(content, start_page, end_page, len(dates))
+    total_amount = end_page - start_page + 1
+    days_str = ",".join(map(str, weekdays))
+    try:
+        # 목표의 새 id 는 INSERT 결과에서 바로 받음 (내용으로 다시 찾으면 동시에 같은 배정을 한 트랜잭션의 행과 섞일 수 있음)
+        goal_ids = insert_ids(conn, "INSERT INTO monthly_goals (user_id, year_month, subject, content, total_amount, week_days) VALUES (?,?,?,?,?,?)",
+                              [(uid, goal_label, subject, content, total_amount, days_str) for uid in user_ids])
+        rows = [(uid, d, subject, text, 0, goal_id) for uid, goal_id in zip(user_ids, goal_ids) for d, text in zip(dates, contents)]
+        insert_plans(conn, rows)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return len(rows)
@@ -0,0 +1,149 @@
+import cProfile
+import contextvars
+import io
+import itertools
+import json
+import marshal
+import os
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+import streamlit as st
+
+import query_stats
+from query_stats import query_scope
+
+# -----------------------------------------------------------------------------
+# 1. 화면 재실행(rerun) 프로파일러 설정
+# -----------------------------------------------------------------------------
+# 측정하려는 화면 주소 뒤에 ?profile=1 (구역별 시간) 또는 ?profile=cprofile (함수 단위까지) 을 붙입니다.
+# PLANNER_PROFILE=1 이면 모든 세션을 측정합니다. 결과는 관리자 진단 페이지(?page=diag)에서 봅니다.
+PROFILE_ALL = os.environ.get("PLANNER_PROFILE", "0") == "1"
+PROFILE_HISTORY = int(os.environ.get("PLANNER_PROFILE_HISTORY", "50"))    # 최근 재실행 기록 개수
+CPROFILE_HISTORY = 5        # cProfile 결과는 크기가 커서 최근 몇 개만 보관
+PROFILE_PARAM = "profile"
+
+_current = contextvars.ContextVar("render_profile", default=None)
+_history = deque(maxlen=PROFILE_HISTORY)
+_cprofiles = deque(maxlen=CPROFILE_HISTORY)     # (재실행 id, cProfile.Profile)
+_lock = threading.Lock()
+_cprofile_lock = threading.Lock()               # cProfile 은 한 번에 하나만 켤 수 있음
+_ids = itertools.count(1)
+
+def _mode():
+    """이 재실행의 측정 방식: None / 'time' / 'cprofile'"""
+    param = st.query_params.get(PROFILE_PARAM)
+    if param == "cprofile":
+        return "cprofile"
+    if param not in (None, "0"):
+        return "time"
+    return "time" if PROFILE_ALL else None
+
+# -----------------------------------------------------------------------------
+# 2. 측정 (화면 함수 전체 = profiled, 그 안의 구역 = render_section)
+# -----------------------------------------------------------------------------
+def profiled(page):
+    """화면 함수 데코레이터: 측정 중인 세션이면 재실행 1회의 구역별 시간을 기록"""
+    def wrap(fn):
+        @wraps(fn)
+        def run(*args, **kwargs):
+            mode = _mode()
+            if mode is None:
+                return fn(*args, **kwargs)
+            user = st.session_state.get('user') or {}
+            record = {'id': next(_ids), 'page': page, 'user': user.get('username'), 'started': time.time(),
+                      'status': "ok", 'total_ms': 0.0, 'db_ms': 0.0, 'db_count': 0, 'sections': [], 'cprofile': False}
+            token = _current.set(record)
+            prof = None
+            if mode == "cprofile" and _cprofile_lock.acquire(blocking=False):
+                prof = cProfile.Profile()
+                try:
+                    prof.enable()
+                except ValueError:      # 다른 프로파일러가 이미 켜져 있음
+                    _cprofile_lock.release()
+                    prof = None
+            t0 = time.perf_counter()
+            try:
+                with query_stats.collect() as db:
+                    return fn(*args, **kwargs)
+            except BaseException as e:
+                # st.rerun() / st.stop() 도 예외로 끝나므로 이름만 남김
+                record['status'] = type(e).__name__
+                raise
+            finally:
+                record['total_ms'] = (time.perf_counter() - t0) * 1000
+                record['db_ms'], record['db_count'] = db
+                if prof is not None:
+                    prof.disable()
+                    _cprofile_lock.release()
+                    record['cprofile'] = True
+                _current.reset(token)
+                with _lock:
+                    _history.append(record)
+                    if prof is not None:
+                        _cprofiles.append((record['id'], prof))
+        return run
+    return wrap
+
+@contextmanager
+def render_section(name):
+    """화면 구역: 조회 계측 묶음 이름을 정하고, 측정 중이면 구역별 시간/DB 시간을 기록"""
+    record = _current.get()
+    with query_scope(name):
+        if record is None:
+            yield
+            return
+        depth = sum(1 for s in record['sections'] if s['ms'] is None)     # 아직 안 끝난 바깥 구역 수
+        section = {'name': name, 'depth': depth, 'ms': None, 'db_ms': 0.0, 'db_count': 0}
+        record['sections'].append(section)
+        t0 = time.perf_counter()
+        try:
+            with query_stats.collect() as db:
+                yield
+        finally:
+            section['ms'] = (time.perf_counter() - t0) * 1000
+            section['db_ms'], section['db_count'] = db
+
+# -----------------------------------------------------------------------------
+# 3. 기록 조회 / 내보내기
+# -----------------------------------------------------------------------------
+def history():
+    """최근 재실행 기록 (오래된 것 → 최신)"""
+    with _lock:
+        return [dict(r, sections=[dict(s) for s in r['sections']]) for r in _history]
+
+def history_json():
+    return json.dumps(history(), ensure_ascii=False, indent=2)
+
+def cprofile_ids():
+    with _lock:
+        return [rid for rid, _ in _cprofiles]
+
+def _profile(rerun_id):
+    with _lock:
+        return next((p for rid, p in _cprofiles if rid == rerun_id), None)
+
+def cprofile_dump(rerun_id):
+    """pstats 파일 내용 (python -m pstats / snakeviz 로 열 수 있음)"""
+    prof = _profile(rerun_id)
+    if prof is None:
+        return None
+    prof.create_stats()
+    return marshal.dumps(prof.stats)
+
+def cprofile_text(rerun_id, limit=30, sort="cumulative"):
+    prof = _profile(rerun_id)
+    if prof is None:
+        return ""
+    out = io.StringIO()
+    pstats.Stats(prof, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+def clear():
+    with _lock:
+        _history.clear()
+        _cprofiles.clear()
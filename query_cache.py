@@ -0,0 +1,167 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from db import db_url, get_db_connection, insert_id, read_sql
+
+# -----------------------------------------------------------------------------
+# 1. 조회 결과 캐시 설정
+# -----------------------------------------------------------------------------
+# 모듈 변수라서 Streamlit 재실행(rerun)과 모든 세션이 같은 캐시를 공유합니다.
+# st.cache_data 와 달리 "이 학생의 계획만" 골라서 지울 수 있어야 해서 직접 구현.
+# 여러 지점(과 --db 로 지정한 다른 DB)이 같은 캐시를 쓰므로 키와 태그에 DB URL 이 들어갑니다. (무효화도 그 DB 것만)
+# 캐시는 프로세스마다 따로라서, 여러 워커가 한 DB를 쓰면 쓰기마다 cache_events 에 기록을 남기고
+# 다른 워커는 재실행마다 (CACHE_SYNC_SEC 에 한 번) 새 기록을 읽어 같은 무효화를 합니다. (4번)
+CACHE_TTL_SEC = int(os.environ.get("PLANNER_CACHE_TTL", "300"))
+CACHE_MAX_ENTRIES = int(os.environ.get("PLANNER_CACHE_SIZE", "512"))
+CACHE_SYNC_SEC = float(os.environ.get("PLANNER_CACHE_SYNC_SEC", "1"))
+CACHE_SYNC_OVERLAP_SEC = 60     # 기록 시각보다 늦게 커밋된 트랜잭션도 놓치지 않도록 겹쳐 읽는 구간
+CACHE_EVENT_KEEP_SEC = 3600     # 이보다 오래된 기록은 삭제 (그동안 확인하지 않은 워커는 캐시 전체를 비움)
+CACHE_EVENT_PRUNE_EVERY = 500   # 기록 id 가 이 배수일 때 오래된 기록 정리
+
+# -----------------------------------------------------------------------------
+# 2. TTL + LRU 캐시
+# -----------------------------------------------------------------------------
+class QueryCache:
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SEC):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.generation = 0     # 무효화될 때마다 +1 (조회 도중 쓰기가 끼어든 결과는 저장 안 함)
+        self._entries = OrderedDict()   # key -> (만료시각, 태그 집합, 값)
+        self._lock = threading.Lock()
+        self._listeners = []            # 무효화될 때 같이 비워야 하는 다른 캐시들 (로그인 사용자 캐시 등)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def put(self, key, tags, value, generation):
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, tags, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, tables, user_ids=None, url=None):
+        """DB(없으면 지금 지점 DB)에서 tables 를 읽는 캐시 중 user_ids 학생 것 + 전체 대상(학생 구분 없는) 조회를 삭제"""
+        tables = set(tables)
+        user_ids = None if user_ids is None else set(user_ids)
+        url = url or db_url()
+        with self._lock:
+            self.generation += 1
+            for key in [k for k, (_, tags, _) in self._entries.items()
+                        if any(d == url and t in tables and (u is None or user_ids is None or u in user_ids) for d, t, u in tags)]:
+                del self._entries[key]
+        for listener in self._listeners:
+            listener(tables, user_ids)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+
+cache = QueryCache()
+
+# -----------------------------------------------------------------------------
+# 3. 조회 / 무효화 함수
+# -----------------------------------------------------------------------------
+def _as_ids(user_id):
+    if user_id is None: return (None,)
+    if isinstance(user_id, (list, tuple, set)): return tuple(user_id)
+    return (user_id,)
+
+def cached_read_sql(conn, sql, params=(), user_id=None, tables=(), **kwargs):
+    """read_sql + 캐시. user_id(또는 id 목록)와 tables 로 무효화 대상을 표시
+    (user_id=None 이면 모든 학생 데이터를 읽는 조회로 취급). 항상 복사본을 돌려줌."""
+    url = getattr(conn, "url", None) or db_url()
+    sync_invalidations(conn)
+    key = (url, sql, tuple(params), tuple(sorted(kwargs.items())))
+    df = cache.get(key)
+    if df is None:
+        generation = cache.generation
+        df = read_sql(sql, conn, params=params, **kwargs)
+        cache.put(key, frozenset((url, t, u) for t in tables for u in _as_ids(user_id)), df, generation)
+    return df.copy()
+
+def add_invalidation_listener(listener):
+    """listener(tables, user_ids) - 캐시 무효화 때마다 함께 호출 (쓴 쪽 스레드에서 → current_tenant() 가 그 지점)"""
+    cache._listeners.append(listener)
+
+def invalidate_on_commit(conn, tables, user_ids=None):
+    """쓰기 직후 호출 - 커밋이 끝난 뒤에 캐시를 지움 (커밋 전 데이터가 다시 캐시되지 않도록)"""
+    if user_ids is not None:
+        user_ids = list(user_ids)
+    url = getattr(conn, "url", None)    # 그 연결의 DB 캐시만 (없으면 지금 지점 DB)
+    if hasattr(conn, "after_commit"):
+        _record_event(conn, url or db_url(), tables, user_ids)
+        conn.after_commit(lambda: cache.invalidate(tables, user_ids, url))
+    else:
+        cache.invalidate(tables, user_ids, url)
+
+# -----------------------------------------------------------------------------
+# 4. 여러 프로세스(워커) 사이 무효화 (cache_events 테이블)
+# -----------------------------------------------------------------------------
+_sync = {}      # DB URL -> {'checked': 마지막 확인 시각, 'seen': {반영한 기록 id: 기록 시각}}
+_sync_lock = threading.Lock()
+
+def _sync_state(url):
+    with _sync_lock:
+        return _sync.setdefault(url, {'checked': 0.0, 'seen': {}})
+
+def _record_event(conn, url, tables, user_ids):
+    # 쓰기와 같은 트랜잭션에 기록 → 롤백되면 기록도 없음. 이 프로세스는 커밋 때 직접 지우므로 id 를 반영한 것으로 표시
+    now = time.time()
+    event_id = insert_id(conn, "INSERT INTO cache_events (tables, user_ids, created_at) VALUES (?,?,?)",
+                         (",".join(tables), None if user_ids is None else ",".join(map(str, user_ids)), now))
+    state = _sync_state(url)
+    with _sync_lock:
+        state['seen'][event_id] = now
+    if event_id % CACHE_EVENT_PRUNE_EVERY == 0:
+        conn.execute("DELETE FROM cache_events WHERE created_at < ?", (now - CACHE_EVENT_KEEP_SEC,))
+
+def _all_tables(conn):
+    if conn.dialect == "sqlite":
+        return [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+    return [row[0] for row in conn.execute("SELECT table_name FROM information_schema.tables WHERE table_schema = current_schema()")]
+
+def sync_invalidations(conn=None):
+    """다른 워커가 남긴 무효화 기록을 이 프로세스의 캐시(와 리스너)에 반영 (DB마다 CACHE_SYNC_SEC 에 한 번만 조회)"""
+    url = getattr(conn, "url", None) or db_url()
+    state = _sync_state(url)
+    now = time.time()
+    with _sync_lock:
+        checked = state['checked']
+        if now - checked < CACHE_SYNC_SEC:
+            return
+        state['checked'] = now
+    if conn is None:
+        with get_db_connection() as conn:
+            _apply_events(conn, url, state, now, checked)
+    else:
+        _apply_events(conn, url, state, now, checked)
+
+def _apply_events(conn, url, state, now, checked):
+    since = (checked or now) - CACHE_SYNC_OVERLAP_SEC
+    rows = conn.execute("SELECT id, tables, user_ids, created_at FROM cache_events WHERE created_at >= ? ORDER BY id", (since,)).fetchall()
+    if checked and now - checked > CACHE_EVENT_KEEP_SEC - CACHE_SYNC_OVERLAP_SEC:
+        # 확인하지 않은 사이에 지워졌을 수 있는 기록이 있음 → 이 DB 캐시 전체
+        cache.invalidate(_all_tables(conn), None, url)
+    with _sync_lock:
+        fresh = [row for row in rows if row[0] not in state['seen']]
+        for row in fresh:
+            state['seen'][row[0]] = row[3]
+        for event_id in [i for i, created in state['seen'].items() if created < since]:
+            del state['seen'][event_id]
+    for _, tables, user_ids, _ in fresh:
+        cache.invalidate(tables.split(","), None if user_ids is None else [int(u) for u in user_ids.split(",")], url)
@@ -0,0 +1,204 @@
+import contextvars
+import logging
+import os
+import re
+import sys
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from logging.handlers import RotatingFileHandler
+
+# -----------------------------------------------------------------------------
+# 1. 조회 계측 설정 (모든 DB 호출의 실행 시간 / 행 수 / 호출한 곳)
+# -----------------------------------------------------------------------------
+# db.py 의 커서가 실행 + 결과 읽기에 걸린 시간을 재서 record() 로 넘겨줍니다.
+# 같은 SQL + 같은 호출 위치끼리 묶어서 횟수/합계/최대/구간별 분포를 쌓고,
+# SLOW_QUERY_MS 이상 걸린 문장은 실행 계획과 함께 느린 조회 로그 파일에 남깁니다.
+QUERY_STATS = os.environ.get("PLANNER_QUERY_STATS", "1") == "1"
+SLOW_QUERY_MS = float(os.environ.get("PLANNER_SLOW_QUERY_MS", "200"))
+SLOW_LOG_PATH = os.environ.get("PLANNER_SLOW_LOG", "slow_queries.log")
+SLOW_LOG_BYTES = 5 * 1024 * 1024    # 파일 하나 최대 크기 → 넘으면 .1, .2 ... 로 돌려씀
+SLOW_LOG_BACKUPS = 3
+MAX_STATEMENTS = 2000               # 묶음(SQL × 호출 위치) 최대 개수
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)     # 분포 구간 경계 (마지막 칸은 그 이상)
+
+# 호출 위치를 찾을 때 건너뛸 모듈 (DB 래퍼/라이브러리 내부)
+_SKIP_MODULES = {"db", "query_stats", "query_cache", "contextlib", "threading"}
+_SKIP_PREFIXES = ("pandas", "sqlalchemy", "psycopg2", "sqlite3", "concurrent")
+
+_scope = contextvars.ContextVar("query_scope", default=None)
+_collector = contextvars.ContextVar("query_collector", default=None)
+_local = threading.local()
+
+@contextmanager
+def query_scope(name):
+    """이 블록 안의 조회는 호출 위치 대신 name 으로 묶음 (예: "show_admin.tab_calendar")"""
+    token = _scope.set(name)
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+_code_modules = {}      # 코드 객체 → 모듈 이름 (건너뛸 모듈이면 None). 문장마다 경로 계산을 반복하지 않게
+
+def _module_of(frame):
+    code = frame.f_code
+    module = _code_modules.get(code, False)
+    if module is False:
+        module = os.path.splitext(os.path.basename(code.co_filename))[0]
+        if module in _SKIP_MODULES or frame.f_globals.get("__name__", "").startswith(_SKIP_PREFIXES):
+            module = None
+        _code_modules[code] = module
+    return module
+
+def caller():
+    """(묶음 이름, 코드 위치) - 화면 구역 이름이 있으면 그 이름, 없으면 호출한 함수"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = _module_of(frame)
+        if module is not None:
+            break
+        frame = frame.f_back
+    if frame is None:
+        return _scope.get() or "?", "?"
+    where = f"{module}.{frame.f_code.co_name}"
+    return _scope.get() or where, f"{where}:{frame.f_lineno}"
+
+@contextmanager
+def collect():
+    """블록 안에서 끝난 문장의 [총 ms, 개수] (안쪽 collect 블록 것도 바깥에 더해짐)"""
+    acc = [0.0, 0]
+    token = _collector.set(acc)
+    try:
+        yield acc
+    finally:
+        _collector.reset(token)
+        outer = _collector.get()
+        if outer is not None:
+            outer[0] += acc[0]
+            outer[1] += acc[1]
+
+@contextmanager
+def paused():
+    """계측하지 않는 구간 (실행 계획 조회처럼 계측 코드 자신이 실행하는 SQL)"""
+    _local.paused = True
+    try:
+        yield
+    finally:
+        _local.paused = False
+
+def enabled():
+    return QUERY_STATS and not getattr(_local, "paused", False)
+
+_WS = re.compile(r"\s+")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+@lru_cache(maxsize=1024)
+def normalize(sql):
+    """공백 정리 + IN (?,?,?...) 길이 차이를 하나로 묶음"""
+    return _IN_LIST.sub("(?, ...)", _WS.sub(" ", sql).strip())
+
+# -----------------------------------------------------------------------------
+# 2. 집계 (프로세스당 하나)
+# -----------------------------------------------------------------------------
+def _bucket(ms):
+    for i, bound in enumerate(BUCKETS_MS):
+        if ms < bound:
+            return i
+    return len(BUCKETS_MS)
+
+class QueryStats:
+    def __init__(self, max_statements=MAX_STATEMENTS):
+        self.max_statements = max_statements
+        self._entries = {}      # (묶음 이름, SQL) -> dict
+        self._lock = threading.Lock()
+
+    def record(self, name, where, sql, ms, rows):
+        key = (name, normalize(sql))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if len(self._entries) >= self.max_statements:
+                    return
+                entry = self._entries[key] = {'caller': name, 'where': where, 'sql': key[1], 'count': 0, 'total_ms': 0.0,
+                                              'max_ms': 0.0, 'rows': 0, 'buckets': [0] * (len(BUCKETS_MS) + 1)}
+            entry['count'] += 1
+            entry['total_ms'] += ms
+            entry['max_ms'] = max(entry['max_ms'], ms)
+            entry['rows'] += rows
+            entry['buckets'][_bucket(ms)] += 1
+            entry['where'] = where
+
+    def snapshot(self):
+        """묶음별 통계 복사본 목록 (p50/p95 는 분포 구간의 위쪽 경계로 추정)"""
+        with self._lock:
+            entries = [dict(e, buckets=list(e['buckets'])) for e in self._entries.values()]
+        for e in entries:
+            e['mean_ms'] = e['total_ms'] / e['count']
+            e['p50_ms'] = _percentile(e['buckets'], 0.5)
+            e['p95_ms'] = _percentile(e['buckets'], 0.95)
+        return entries
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _percentile(buckets, q):
+    target = q * sum(buckets)
+    seen = 0
+    for i, n in enumerate(buckets):
+        seen += n
+        if seen >= target and n:
+            return BUCKETS_MS[i] if i < len(BUCKETS_MS) else float("inf")
+    return 0.0
+
+stats = QueryStats()
+
+# -----------------------------------------------------------------------------
+# 3. 느린 조회 로그 (파일 크기 기준으로 돌려씀)
+# -----------------------------------------------------------------------------
+_slow_logger = None
+_slow_lock = threading.Lock()
+
+def _logger():
+    global _slow_logger
+    with _slow_lock:
+        if _slow_logger is None:
+            logger = logging.getLogger("planner.slow_query")
+            logger.setLevel(logging.WARNING)
+            logger.propagate = False
+            handler = RotatingFileHandler(SLOW_LOG_PATH, maxBytes=SLOW_LOG_BYTES, backupCount=SLOW_LOG_BACKUPS, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            logger.addHandler(handler)
+            _slow_logger = logger
+        return _slow_logger
+
+_EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+def record(sql, params, ms, rows, name, where, explain=None):
+    """커서가 문장 하나를 끝낼 때 호출. 느리면 explain(sql, params) 로 실행 계획을 받아 로그에 남김"""
+    stats.record(name, where, sql, ms, rows)
+    acc = _collector.get()
+    if acc is not None:
+        acc[0] += ms
+        acc[1] += 1
+    if ms >= SLOW_QUERY_MS:
+        plan = "(실행 계획 없음)"
+        if explain is not None and sql.lstrip()[:6].upper().startswith(_EXPLAINABLE):
+            try:
+                with paused():
+                    plan = explain(sql, params)
+            except Exception as e:
+                plan = f"(실행 계획을 가져오지 못함: {e})"
+        params = params if len(str(params)) <= 500 else f"{str(params)[:500]}..."
+        _logger().warning("%.1fms rows=%d caller=%s at=%s\n  SQL: %s\n  params: %s\n  plan:\n%s\n",
+                          ms, rows, name, where, normalize(sql), params, plan)
+
+def read_slow_log(max_bytes=64 * 1024):
+    """느린 조회 로그 파일의 마지막 max_bytes (화면 표시용)"""
+    if not os.path.exists(SLOW_LOG_PATH):
+        return ""
+    with open(SLOW_LOG_PATH, "rb") as f:
+        f.seek(max(0, os.path.getsize(SLOW_LOG_PATH) - max_bytes))
+        return f.read().decode("utf-8", errors="replace")
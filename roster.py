@@ -0,0 +1,155 @@
+import datetime
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from db import current_tenant
+from query_cache import CACHE_TTL_SEC, add_invalidation_listener
+
+# -----------------------------------------------------------------------------
+# 1. 학생 명단 설정 (관리자 사이드바: 이름순 명단 + 최근 7일 신호등 + 검색)
+# -----------------------------------------------------------------------------
+# 명단과 신호등 라벨을 프로세스당 한 번 만들어 두고, 검색은 미리 만든 색인에서 찾습니다.
+# - users 가 바뀌면 명단 전체를 다시 만들고
+# - 계획/집계가 바뀌면 그 학생들의 신호등만 다시 계산합니다.
+# 다른 워커(프로세스)에서 쓴 내용은 ROSTER_TTL_SEC 안에 반영됩니다.
+ROSTER_TTL_SEC = CACHE_TTL_SEC
+ROSTER_PAGE_SIZE = int(os.environ.get("PLANNER_ROSTER_PAGE_SIZE", "50"))
+SIGNAL_DAYS = 7
+MAX_PARTIAL_UPDATE = 500    # 이보다 많은 학생이 바뀌면 일부 갱신 대신 전체를 다시 만듦
+
+# 초성 검색: '김민수' → 'ㄱㅁㅅ' (한글 음절 = 0xAC00 + (초성 × 21 + 중성) × 28 + 종성)
+CHOSEONG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+
+def choseong(text):
+    return "".join(CHOSEONG[(ord(ch) - 0xAC00) // 588] if "가" <= ch <= "힣" else ch.lower() for ch in text)
+
+def _char_matches(q, ch):
+    return q == ch or (q in CHOSEONG and q == choseong(ch))
+
+def _matches_at(query, name, start):
+    # 검색어의 초성은 초성끼리, 완성된 글자는 글자끼리 비교 ('김ㅁ' → 김민수 O, 김지민 X)
+    return all(_char_matches(q, ch) for q, ch in zip(query, name[start:start + len(query)]))
+
+def signal(score):
+    if score >= 80: return "🟢"
+    if score >= 50: return "🟡"
+    return "🔴"
+
+# -----------------------------------------------------------------------------
+# 2. 명단 + 검색 색인 (지점마다 하나)
+# -----------------------------------------------------------------------------
+class Roster:
+    def __init__(self, ttl=ROSTER_TTL_SEC):
+        self.ttl = ttl
+        # (이름순 [{'id', 'real_name', 'group_color', 'avg_score', 'label'}], id → 학생, 색인)
+        # 색인 = 정렬된 (초성 문자열의 접미사, 시작 위치, 명단 순번). 다시 만들 때 세 개를 한 번에 바꿔 끼움
+        self._data = ([], {}, [])
+        self._built_at = None   # (time.monotonic(), 기준 날짜)
+        self._stale = True
+        self._dirty = set()     # 신호등만 다시 계산할 학생 id
+        self._lock = threading.Lock()
+
+    def refresh(self, conn, today=None):
+        """바뀐 부분만 다시 읽음 (명단 전체 / 일부 학생 신호등). 사이드바를 그릴 때마다 호출"""
+        today = today or datetime.date.today()
+        with self._lock:
+            expired = self._built_at is None or self._built_at[1] != today or time.monotonic() - self._built_at[0] > self.ttl
+            if self._stale or expired or len(self._dirty) > MAX_PARTIAL_UPDATE:
+                # 읽는 도중 들어온 무효화는 다음 호출에서 다시 반영되도록 먼저 표시를 지움
+                self._stale = False
+                self._dirty.clear()
+                self._build(conn, today)
+            elif self._dirty:
+                ids, self._dirty = self._dirty, set()
+                self._update_scores(conn, today, ids)
+
+    def _scores(self, conn, today, ids=None):
+        since = str(today - datetime.timedelta(days=SIGNAL_DAYS))
+        sql = "SELECT user_id, SUM(achievement_sum) * 1.0 / SUM(plan_count) FROM student_daily_stats WHERE stat_date >= ?"
+        params = [since]
+        if ids is not None:
+            sql += f" AND user_id IN ({','.join('?' * len(ids))})"
+            params += list(ids)
+        return {uid: score or 0 for uid, score in conn.execute(sql + " GROUP BY user_id", params).fetchall()}
+
+    def _build(self, conn, today):
+        rows = conn.execute("SELECT id, real_name, group_color FROM users WHERE role='student'").fetchall()
+        scores = self._scores(conn, today)
+        entries = sorted(({'id': uid, 'real_name': name or "", 'group_color': group, 'avg_score': scores.get(uid, 0)} for uid, name, group in rows),
+                         key=lambda e: (e['real_name'], e['id']))
+        index = []
+        for pos, e in enumerate(entries):
+            e['label'] = f"{signal(e['avg_score'])} {e['real_name']}"
+            key = choseong(e['real_name'])
+            index += [(key[k:], k, pos) for k in range(len(key))]
+        index.sort()
+        self._data = (entries, {e['id']: e for e in entries}, index)
+        self._built_at = (time.monotonic(), today)
+
+    def _update_scores(self, conn, today, ids):
+        by_id = self._data[1]
+        ids = [uid for uid in ids if uid in by_id]
+        if not ids:
+            return
+        scores = self._scores(conn, today, ids)
+        for uid in ids:
+            e = by_id[uid]
+            e['avg_score'] = scores.get(uid, 0)
+            e['label'] = f"{signal(e['avg_score'])} {e['real_name']}"
+
+    @property
+    def entries(self):
+        return self._data[0]
+
+    def get(self, user_id):
+        return self._data[1].get(user_id)
+
+    def find(self, query):
+        """이름/초성이 포함된 학생 (이름이 검색어로 시작하는 학생 먼저, 그다음 이름순)"""
+        query = (query or "").strip().lower()
+        entries, _, index = self._data
+        if not query:
+            return list(entries)
+        key = choseong(query)
+        hits = {}
+        i = bisect_left(index, (key,))
+        while i < len(index) and index[i][0].startswith(key):
+            _, start, pos = index[i]
+            if _matches_at(query, entries[pos]['real_name'].lower(), start):
+                hits[pos] = min(hits.get(pos, start), start)
+            i += 1
+        return [entries[pos] for pos in sorted(hits, key=lambda p: (hits[p] > 0, p))]
+
+    def search(self, query, page=0, page_size=ROSTER_PAGE_SIZE):
+        """(page 번째 페이지의 학생 목록, 전체 검색 결과 수)"""
+        found = self.find(query)
+        return found[page * page_size:(page + 1) * page_size], len(found)
+
+    def on_invalidate(self, tables, user_ids):
+        with self._lock:
+            if "users" in tables or ("student_daily_stats" in tables and user_ids is None):
+                self._stale = True
+            elif "student_daily_stats" in tables:
+                self._dirty.update(user_ids)
+
+
+_rosters = {}   # 지점 id -> Roster
+_rosters_lock = threading.Lock()
+
+def get_roster(tenant=None):
+    """현재(또는 지정한) 지점의 명단"""
+    tenant = tenant or current_tenant()
+    with _rosters_lock:
+        if tenant not in _rosters:
+            _rosters[tenant] = Roster()
+        return _rosters[tenant]
+
+def _on_invalidate(tables, user_ids):
+    # 무효화는 쓰기를 한 실행의 지점에서만 일어남
+    roster = _rosters.get(current_tenant())
+    if roster is not None:
+        roster.on_invalidate(tables, user_ids)
+
+add_invalidation_listener(_on_invalidate)
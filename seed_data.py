@@ -0,0 +1,208 @@
+import argparse
+import datetime
+import time
+
+import numpy as np
+
+from auth import create_user, hash_password
+from db import get_db_connection
+from migrations import run_migrations
+from plans import rebuild_daily_stats
+from query_cache import invalidate_on_commit
+
+# -----------------------------------------------------------------------------
+# 1. 가상 데이터 설정 (과목/교재/문구/분포)
+# -----------------------------------------------------------------------------
+# 사용 예: python seed_data.py --db bench.db --students 10000 --years 3
+# main.init_db() 의 기본 더미 데이터(30명 × 45일)도 이 모듈로 만듭니다.
+SUBJECTS = np.array(["국어", "영어", "수학", "탐구"])
+BOOKS = np.array([
+    ["수능특강 문학", "수능완성 국어", "마더텅 독서"],
+    ["수능특강 영어", "자이스토리 영어", "천일문"],
+    ["쎈 수학", "수능특강 수학", "블랙라벨"],
+    ["수능특강 사탐", "완자 과탐", "개념완성 탐구"],
+])
+GROUPS = np.array(["BLUE", "YELLOW", "RED"])
+SURNAMES = list("김이박최정강조윤장임한오서신권황안송류홍")
+GIVEN = ["민준", "서연", "도윤", "하은", "시우", "지우", "예준", "수아", "주원", "지민", "하준", "서윤", "건우", "채원", "현우", "유진"]
+RESOLUTIONS = {
+    'good': ["오늘도 계획대로!", "집중해서 끝내자", "어제처럼만 하자"],
+    'mid': ["조금만 더 힘내자", "미룬 거 먼저 하기", "폰 멀리 두기"],
+    'bad': ["졸리다", "힘내자", "오늘은 하나라도 끝내기"],
+}
+REVIEWS = {
+    'good': ["계획 달성 완료. 뿌듯하다.", "생각보다 잘 풀렸다.", "내일도 이대로 가자."],
+    'mid': ["절반 정도 했다. 시간 관리가 아쉽다.", "어려운 단원에서 막혔다.", "집중이 중간에 끊겼다."],
+    'bad': ["너무 힘들고 포기하고 싶다.", "숙제가 많아서 짜증난다.", "계획을 너무 많이 세웠다."],
+}
+TEACHER_MESSAGES = ["이번 주 계획 잘 지키고 있네요!", "수학 진도 확인해 주세요.", "내일 상담 시간에 이야기해요.", "기복이 조금 보여요. 최소 분량부터 지켜봐요."]
+STUDENT_MESSAGES = ["네 선생님!", "이번 주는 시험 때문에 조금 밀렸어요.", "질문 있어요. 내일 여쭤볼게요.", "감사합니다!"]
+
+STUDENT_CHUNK = 200     # 학생 200명씩 계산 → executemany → 커밋 (메모리 일정하게 유지)
+
+# -----------------------------------------------------------------------------
+# 2. 학생 묶음 단위 데이터 생성 (numpy로 한 번에 계산)
+# -----------------------------------------------------------------------------
+def _weekdays(days):
+    # 1970-01-01 은 목요일(3) → 월=0 ... 일=6
+    return (days.astype('datetime64[D]').astype(np.int64) + 3) % 7
+
+def _plan_rows(rng, user_ids, days, profile):
+    """(학생 × 날짜 × 과목) 계획 행. 학생별 실력/과목 편차/기복/성실도를 반영"""
+    n_users, n_days, n_subj = len(user_ids), len(days), len(SUBJECTS)
+    weekend = _weekdays(days) >= 5
+    study_p = np.where(weekend, 0.45, 0.9)[None, :] * profile['diligence'][:, None]
+    studied = rng.random((n_users, n_days)) < study_p
+    # 공부한 날은 2~3과목: 무작위 순위에서 앞쪽 k개
+    k = rng.integers(2, 4, size=(n_users, n_days))
+    rank = rng.random((n_users, n_days, n_subj)).argsort(axis=2).argsort(axis=2)
+    chosen = (rank < k[:, :, None]) & studied[:, :, None]
+    u_idx, d_idx, s_idx = np.nonzero(chosen)
+
+    # 시간이 지날수록 조금씩 오르거나 내리는 추세 + 그날그날의 기복
+    trend = profile['trend'][u_idx] * (d_idx / max(n_days - 1, 1))
+    noise = rng.normal(0, 1, len(u_idx)) * profile['volatility'][u_idx]
+    score = profile['base'][u_idx] + profile['subject_bias'][u_idx, s_idx] + trend + noise
+    achievement = np.clip(np.round(score / 10) * 10, 0, 100).astype(int)
+
+    book = BOOKS[s_idx, rng.integers(0, BOOKS.shape[1], len(u_idx))]
+    first_page = rng.integers(1, 300, len(u_idx))
+    pages = rng.integers(4, 20, len(u_idx))
+    contents = [f"{b} (p.{a}~p.{a + n})" for b, a, n in zip(book.tolist(), first_page.tolist(), pages.tolist())]
+    date_strs = days.astype(str)
+    rows = list(zip(user_ids[u_idx].tolist(), date_strs[d_idx].tolist(), SUBJECTS[s_idx].tolist(), contents,
+                    achievement.tolist(), [None] * len(u_idx)))
+    return rows, (u_idx, d_idx, achievement)
+
+def _log_rows(rng, user_ids, days, plan_index, rate=0.4):
+    """계획이 있는 날 중 일부에 일지 작성 (그날 평균 성취도에 맞는 문구)"""
+    u_idx, d_idx, achievement = plan_index
+    if len(u_idx) == 0:
+        return []
+    key = u_idx * len(days) + d_idx
+    uniq, inverse = np.unique(key, return_inverse=True)
+    day_avg = np.bincount(inverse, weights=achievement) / np.bincount(inverse)
+    keep = rng.random(len(uniq)) < rate
+    uniq, day_avg = uniq[keep], day_avg[keep]
+    mood = np.select([day_avg >= 70, day_avg >= 40], ['good', 'mid'], 'bad')
+    date_strs = days.astype(str)
+    rows = []
+    for k, m in zip(uniq.tolist(), mood.tolist()):
+        u, d = divmod(k, len(days))
+        rows.append((int(user_ids[u]), date_strs[d], RESOLUTIONS[m][rng.integers(3)], REVIEWS[m][rng.integers(3)]))
+    return rows
+
+def _goal_rows(rng, user_ids, months):
+    rows = []
+    for uid in user_ids.tolist():
+        for ym in months:
+            for s in rng.choice(len(SUBJECTS), size=rng.integers(1, 4), replace=False).tolist():
+                rows.append((uid, ym, SUBJECTS[s], BOOKS[s, rng.integers(BOOKS.shape[1])], int(rng.integers(50, 300)), "0,2,4"))
+    return rows
+
+def _message_rows(rng, user_ids, admin_id, start, end, per_month=2.0):
+    """학생마다 한 달 평균 per_month 건 (선생님 → 학생, 가끔 학생 답장), 시간 순 정렬"""
+    span_sec = int((end - start).days + 1) * 86400
+    count = rng.poisson(per_month * span_sec / (30 * 86400), len(user_ids))
+    uid = np.repeat(user_ids, count)
+    offset = rng.integers(0, span_sec, len(uid))
+    reply = rng.random(len(uid)) < 0.4
+    base = np.datetime64(start, 's')
+    rows = []
+    for u, off, r in sorted(zip(uid.tolist(), offset.tolist(), reply.tolist()), key=lambda x: x[1]):
+        created = str(base + np.timedelta64(off, 's')).replace("T", " ")
+        if r: rows.append((u, admin_id, STUDENT_MESSAGES[rng.integers(len(STUDENT_MESSAGES))], created))
+        else: rows.append((admin_id, u, TEACHER_MESSAGES[rng.integers(len(TEACHER_MESSAGES))], created))
+    return rows
+
+# -----------------------------------------------------------------------------
+# 3. 생성 실행
+# -----------------------------------------------------------------------------
+def _ensure_admin(conn):
+    row = conn.execute("SELECT id FROM users WHERE role='admin' ORDER BY id LIMIT 1").fetchone()
+    if row: return row[0]
+    return create_user(conn, "admin", "1234", "총괄 관리자", role="admin")
+
+def generate(students, start, end, path=None, username_format="gen{:05d}", password="1234", seed=None,
+             goals=True, logs=True, messages=True, chunk=STUDENT_CHUNK, log=print):
+    """students 명의 학생과 start~end 기간의 계획/목표/일지/메시지를 생성 → 테이블별 행 수"""
+    run_migrations(path)
+    rng = np.random.default_rng(seed)
+    days = np.arange(np.datetime64(start, 'D'), np.datetime64(end, 'D') + 1)
+    months = sorted({str(d)[:7] for d in days})
+    pw_hash = hash_password(password)   # 모든 가상 학생이 같은 비밀번호 → 해시는 한 번만
+    counts = {'users': 0, 'daily_plans': 0, 'monthly_goals': 0, 'daily_logs': 0, 'messages': 0}
+    started = time.perf_counter()
+
+    with get_db_connection(path) as conn:
+        admin_id = _ensure_admin(conn)
+        first_no = conn.execute("SELECT COUNT(*) FROM users WHERE role='student'").fetchone()[0] + 1
+        conn.commit()
+
+        for i in range(0, students, chunk):
+            n = min(chunk, students - i)
+            numbers = range(first_no + i, first_no + i + n)
+            user_ids = np.array([
+                create_user(conn, username_format.format(no), None,
+                            f"{SURNAMES[rng.integers(len(SURNAMES))]}{GIVEN[rng.integers(len(GIVEN))]}",
+                            role="student", group_color=str(GROUPS[rng.integers(len(GROUPS))]), password_hash=pw_hash)
+                for no in numbers])
+            profile = {
+                'base': rng.normal(65, 15, n).clip(20, 98),
+                'subject_bias': rng.normal(0, 10, (n, len(SUBJECTS))),
+                'volatility': rng.uniform(5, 25, n),
+                'diligence': rng.beta(6, 2, n),
+                'trend': rng.normal(0, 8, n),
+            }
+            plan_rows, plan_index = _plan_rows(rng, user_ids, days, profile)
+            conn.executemany("INSERT INTO daily_plans (user_id, plan_date, subject, content, achievement, linked_monthly_id) VALUES (?,?,?,?,?,?)", plan_rows)
+            counts['daily_plans'] += len(plan_rows)
+            if goals:
+                goal_rows = _goal_rows(rng, user_ids, months)
+                conn.executemany("INSERT INTO monthly_goals (user_id, year_month, subject, content, total_amount, week_days) VALUES (?,?,?,?,?,?)", goal_rows)
+                counts['monthly_goals'] += len(goal_rows)
+            if logs:
+                log_rows = _log_rows(rng, user_ids, days, plan_index)
+                conn.executemany("INSERT INTO daily_logs (user_id, log_date, resolution, review) VALUES (?,?,?,?)", log_rows)
+                counts['daily_logs'] += len(log_rows)
+            if messages:
+                msg_rows = _message_rows(rng, user_ids, admin_id, start, end)
+                conn.executemany("INSERT INTO messages (from_id, to_id, message, created_at) VALUES (?,?,?,?)", msg_rows)
+                counts['messages'] += len(msg_rows)
+            conn.commit()
+            counts['users'] += n
+            if log:
+                log(f"  학생 {i + n:,}/{students:,}명 ({counts['daily_plans']:,}건, {time.perf_counter() - started:.1f}s)")
+
+        # 집계표는 마지막에 한 번에 (학생별로 갱신하는 것보다 훨씬 빠름)
+        rebuild_daily_stats(conn)
+        invalidate_on_commit(conn, ["users", "daily_logs", "messages"])
+        conn.commit()
+        # 대량 적재 뒤 통계 갱신 (없으면 SQLite가 날짜 조건에 맞는 인덱스를 고르지 못함)
+        conn.execute("ANALYZE")
+        conn.commit()
+    if log:
+        log(f"완료: {counts} ({time.perf_counter() - started:.1f}s)")
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="5A 플래너 가상 데이터 생성기 (용량 계획/부하 테스트용)")
+    parser.add_argument("--db", help="DB 경로 또는 URL (기본: PLANNER_DB_URL / PLANNER_DB)")
+    parser.add_argument("--students", type=int, default=10000)
+    parser.add_argument("--years", type=float, default=3, help="오늘로부터 과거 몇 년치")
+    parser.add_argument("--end", type=datetime.date.fromisoformat, default=datetime.date.today(), help="마지막 날짜 (YYYY-MM-DD)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--chunk", type=int, default=STUDENT_CHUNK, help="한 번에 커밋할 학생 수")
+    parser.add_argument("--prefix", default="gen", help="학생 아이디 접두어 (예: gen00001)")
+    parser.add_argument("--no-goals", action="store_true")
+    parser.add_argument("--no-logs", action="store_true")
+    parser.add_argument("--no-messages", action="store_true")
+    args = parser.parse_args()
+
+    start = args.end - datetime.timedelta(days=int(args.years * 365) - 1)
+    print(f"학생 {args.students:,}명, {start} ~ {args.end} 생성 시작")
+    generate(args.students, start, args.end, path=args.db, username_format=args.prefix + "{:05d}", seed=args.seed,
+             goals=not args.no_goals, logs=not args.no_logs, messages=not args.no_messages, chunk=args.chunk)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import json
+import os
+import secrets
+import threading
+import time
+
+import streamlit as st
+
+from auth import find_user, public_user
+from db import DEFAULT_TENANT, current_tenant, get_db_connection, set_tenant
+from query_cache import add_invalidation_listener, sync_invalidations
+
+# -----------------------------------------------------------------------------
+# 1. 로그인 세션 저장소 (토큰 → 사용자 정보 + 화면용 미리 계산한 값)
+# -----------------------------------------------------------------------------
+# 토큰은 주소창 ?s=... 에 들어가므로 새로고침/워커 재시작 후에도 로그인이 유지됩니다.
+# 메모리에 없으면 sessions 테이블에서 복원 (PLANNER_SESSION_PERSIST=0 이면 메모리만 사용).
+SESSION_TTL_SEC = int(os.environ.get("PLANNER_SESSION_TTL", str(12 * 3600)))
+SESSION_PERSIST = os.environ.get("PLANNER_SESSION_PERSIST", "1") == "1"
+TOKEN_PARAM = "s"
+BRANCH_PARAM = "branch"     # 주소창 ?branch=지점id (없으면 기본 지점)
+
+# 화면용 값이 어떤 테이블에 의존하는지 (해당 테이블이 바뀌면 그 학생 세션의 값만 버림)
+# (메시지 읽음 위치는 대화별로 message_reads 테이블에 저장 → chat.py)
+VIEW_TABLES = {
+    'month_calendar': "daily_plans",
+}
+
+class SessionStore:
+    def __init__(self, ttl=SESSION_TTL_SEC, persist=SESSION_PERSIST):
+        self.ttl = ttl
+        self.persist = persist
+        self._sessions = {}     # token -> {'user', 'tenant', 'expires', 'view', 'stale'}
+        self._lock = threading.Lock()
+
+    def create(self, user):
+        token = secrets.token_urlsafe(32)
+        record = {'user': user, 'tenant': current_tenant(), 'expires': time.time() + self.ttl, 'view': {}, 'stale': False}
+        if self.persist:
+            with get_db_connection() as conn:
+                conn.execute("DELETE FROM sessions WHERE expires_at < ?", (time.time(),))
+                conn.execute("INSERT INTO sessions (token, user_id, user_data, expires_at) VALUES (?,?,?,?)",
+                             (token, user['id'], json.dumps(user, ensure_ascii=False), record['expires']))
+                conn.commit()
+        with self._lock:
+            self._sessions[token] = record
+        return token
+
+    def _load(self, token):
+        with get_db_connection() as conn:
+            row = conn.execute("SELECT user_data, expires_at FROM sessions WHERE token=?", (token,)).fetchone()
+        if row is None:
+            return None
+        return {'user': json.loads(row[0]), 'tenant': current_tenant(), 'expires': row[1], 'view': {}, 'stale': False}
+
+    def get(self, token):
+        """유효한 세션이면 record, 아니면 None (만료 시간은 사용할 때마다 연장)"""
+        if not token:
+            return None
+        with self._lock:
+            record = self._sessions.get(token)
+        if record is None and self.persist:
+            record = self._load(token)
+            if record is not None:
+                with self._lock:
+                    record = self._sessions.setdefault(token, record)
+        if record is None or record['tenant'] != current_tenant():
+            return None     # 다른 지점의 토큰
+        now = time.time()
+        if record['expires'] < now:
+            self.delete(token)
+            return None
+        if record['stale']:
+            # 회원 정보가 바뀐 뒤 첫 사용: 사용자 캐시에서 다시 확인 (삭제/대기 전환이면 로그아웃)
+            fresh = find_user(record['user']['username'])
+            if fresh is None or fresh['id'] != record['user']['id'] or fresh['role'] == 'pending':
+                self.delete(token)
+                return None
+            record['user'] = public_user(fresh)
+            record['stale'] = False
+            self._save(token, record)
+        if record['expires'] - now < self.ttl / 2:
+            # 남은 시간이 절반 이하일 때만 연장해서 DB 쓰기를 줄임
+            record['expires'] = now + self.ttl
+            self._save(token, record)
+        return record
+
+    def rotate(self, token):
+        """같은 사용자/지점으로 새 토큰 발급 후 예전 토큰 폐기 → 새 토큰 (없거나 만료면 None)"""
+        record = self.get(token)
+        if record is None:
+            return None
+        new_token = self.create(record['user'])
+        self.delete(token)
+        return new_token
+
+    def _save(self, token, record):
+        if not self.persist:
+            return
+        with get_db_connection() as conn:
+            conn.execute("UPDATE sessions SET user_data=?, expires_at=? WHERE token=?",
+                         (json.dumps(record['user'], ensure_ascii=False), record['expires'], token))
+            conn.commit()
+
+    def delete(self, token):
+        with self._lock:
+            self._sessions.pop(token, None)
+        if self.persist:
+            with get_db_connection() as conn:
+                conn.execute("DELETE FROM sessions WHERE token=?", (token,))
+                conn.commit()
+
+    def view(self, token, name, loader, key=None):
+        """세션별로 한 번 계산해 두는 화면용 값 (의존 테이블이 바뀌거나 key(예: 년/월)가 바뀌면 다시 계산)
+        이름마다 마지막 key 의 값 하나만 보관"""
+        record = self.get(token)
+        if record is None:
+            return loader()
+        cached = record['view'].get(name)
+        if cached is None or cached[0] != key:
+            cached = record['view'][name] = (key, loader())
+        return cached[1]
+
+    def on_invalidate(self, tables, user_ids):
+        names = [name for name, table in VIEW_TABLES.items() if table in tables]
+        tenant = current_tenant()
+        with self._lock:
+            records = list(self._sessions.values())
+        for record in records:
+            if record['tenant'] != tenant or (user_ids is not None and record['user']['id'] not in user_ids):
+                continue
+            for name in names:
+                record['view'].pop(name, None)
+            if "users" in tables:
+                record['stale'] = True
+
+
+store = SessionStore()
+add_invalidation_listener(store.on_invalidate)
+
+# -----------------------------------------------------------------------------
+# 2. 화면용 함수 (st.session_state / 주소창 토큰 연결)
+# -----------------------------------------------------------------------------
+def use_branch():
+    """재실행마다 가장 먼저: 이번 실행이 쓸 지점 DB 선택 (로그인한 뒤에는 로그인한 지점으로 고정)"""
+    branch = st.session_state.get('branch') or st.query_params.get(BRANCH_PARAM) or DEFAULT_TENANT
+    try:
+        set_tenant(branch)
+    except ValueError as e:
+        st.error(str(e))
+        st.stop()
+    return branch
+
+def start_session(user):
+    """로그인 성공 시: 세션 생성 → st.session_state + 주소창에 토큰 저장"""
+    token = store.create(user)
+    st.session_state['user'] = user
+    st.session_state['session_token'] = token
+    st.session_state['branch'] = current_tenant()
+    st.query_params[TOKEN_PARAM] = token
+
+def restore_session(roles=None):
+    """재실행마다 호출: 이미 로그인돼 있으면 서버 쪽 세션을 다시 확인, 아니면 주소창 토큰으로 복원. 로그인 상태 반환
+    roles 를 주면 그 역할의 세션만 인정 (예: 관리자 화면에 학생 토큰 → 로그아웃 후 False)"""
+    use_branch()
+    sync_invalidations()    # 다른 워커에서 바뀐 회원/계획 반영 (세션 확인 전에)
+    if 'session_token' in st.session_state:
+        # 열려 있는 탭도 매번 세션 저장소 확인 (메모리 조회) → 삭제/승인 대기 전환/만료/다른 곳에서 로그아웃된 세션은 바로 로그아웃
+        record = store.get(st.session_state['session_token'])
+        if record is None:
+            end_session()
+            return False
+        st.session_state['user'] = record['user']
+    elif 'user' not in st.session_state:
+        token = st.query_params.get(TOKEN_PARAM)
+        record = store.get(token)
+        if record is None:
+            return False
+        # 주소창 토큰은 기록/북마크/공유 링크로 새어 나갈 수 있으므로 복원할 때마다 새 토큰으로 교체
+        # (예전 주소는 더 이상 쓸 수 없음)
+        token = store.rotate(token)
+        if token is None:
+            return False
+        st.session_state['user'] = record['user']
+        st.session_state['session_token'] = token
+        st.session_state['branch'] = record['tenant']
+        st.query_params[TOKEN_PARAM] = token
+    if roles is not None and st.session_state['user']['role'] not in roles:
+        end_session()
+        return False
+    return True
+
+def end_session():
+    token = st.session_state.get('session_token')
+    if token:
+        store.delete(token)
+    st.query_params.pop(TOKEN_PARAM, None)
+    st.session_state.clear()
+
+def session_view(name, loader, key=None):
+    return store.view(st.session_state.get('session_token'), name, loader, key)
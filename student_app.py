@@ -1,9 +1,17 @@
 import streamlit as st
-import sqlite3
-import pandas as pd
 import datetime
 import calendar
 
+from auth import authenticate
+from calendar_data import STATUS_MARK, month_calendar
+from chat import TEACHER_ID, message_panel
+from db import get_db_connection
+from migrations import run_migrations
+from query_cache import cached_read_sql
+from profiler import profiled, render_section
+from sessions import end_session, restore_session, session_view, start_session, use_branch
+from plans import delete_plan, distribute_plan, plan_dates, update_achievement, update_plan
+
 # -----------------------------------------------------------------------------
 # 1. 시스템 설정
 # -----------------------------------------------------------------------------
@@ -14,7 +22,6 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-DB_NAME = "5a_planner_v3_test.db"
 COLOR_PRIMARY = "#007AFF"
 COLOR_BG = "#F5F5F7"
 COLOR_MY_MSG = "#007AFF"
@@ -49,156 +56,53 @@ def inject_custom_css():
     </style>
     """, unsafe_allow_html=True)
 
-def get_db_connection():
-    return sqlite3.connect(DB_NAME, check_same_thread=False)
-
-# [방어 코드] 테이블이 없으면 생성
-def init_db():
-    with get_db_connection() as conn:
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE, password TEXT, role TEXT, real_name TEXT
-            )
-        """)
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS daily_plans (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER, plan_date DATE, subject TEXT, content TEXT, 
-                achievement INTEGER DEFAULT 0, linked_monthly_id INTEGER
-            )
-        """)
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS monthly_goals (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER, year_month TEXT, subject TEXT, content TEXT, 
-                total_amount INTEGER, week_days TEXT
-            )
-        """)
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                from_id INTEGER, to_id INTEGER, message TEXT, created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
 # -----------------------------------------------------------------------------
 # 3. 핵심 로직 함수 (N분배 & 범위 지정)
 # -----------------------------------------------------------------------------
 def distribute_monthly_plan(user_id, year, month, subject, content, start_page, end_page, selected_days):
     _, last_day = calendar.monthrange(year, month)
-    target_dates = []
     
-    # 1. 날짜 필터링
-    for day in range(1, last_day + 1):
-        date_obj = datetime.date(year, month, day)
-        if date_obj >= datetime.date.today() and date_obj.weekday() in selected_days:
-            target_dates.append(date_obj)
+    # 1. 날짜 필터링 (오늘 이후 + 선택 요일)
+    first_day = max(datetime.date(year, month, 1), datetime.date.today())
+    target_dates = plan_dates(first_day, datetime.date(year, month, last_day), selected_days)
     
     if not target_dates: return False, "선택한 요일이 남은 기간에 없습니다."
+    if end_page - start_page + 1 <= 0: return False, "종료 페이지가 시작 페이지보다 커야 합니다."
     
-    # 2. 페이지 분배 계산
-    total_amount = end_page - start_page + 1
-    if total_amount <= 0: return False, "종료 페이지가 시작 페이지보다 커야 합니다."
-
-    daily_amount = total_amount // len(target_dates)
-    remainder = total_amount % len(target_dates)
-    
+    # 2. 월간 목표 + 일간 계획 일괄 생성 (페이지 분배는 plans.py 엔진)
     with get_db_connection() as conn:
-        cur = conn.cursor()
-        days_str = ",".join(map(str, selected_days))
-        
-        # 월간 목표 등록
-        cur.execute("INSERT INTO monthly_goals (user_id, year_month, subject, content, total_amount, week_days) VALUES (?,?,?,?,?,?)", 
-                   (user_id, f"{year}-{month:02d}", subject, content, total_amount, days_str))
-        monthly_id = cur.lastrowid
-        
-        # 일간 계획 생성
-        current_page = start_page
-        for i, p_date in enumerate(target_dates):
-            amount = daily_amount + (1 if i < remainder else 0)
-            range_start = current_page
-            range_end = current_page + amount - 1
-            current_page += amount
-            
-            plan_text = f"{content} (p.{range_start}~p.{range_end})"
-            cur.execute("INSERT INTO daily_plans (user_id, plan_date, subject, content, linked_monthly_id) VALUES (?,?,?,?,?)", 
-                       (user_id, p_date, subject, plan_text, monthly_id))
-        conn.commit()
+        distribute_plan(conn, user_id, f"{year}-{month:02d}", subject, content, start_page, end_page, target_dates, selected_days)
     return True, f"총 {len(target_dates)}일 동안 p.{start_page}부터 p.{end_page}까지 분배 완료!"
 
-def render_chat(user_id, other_id):
-    with get_db_connection() as conn:
-        msgs = pd.read_sql("SELECT * FROM messages WHERE (from_id=? AND to_id=?) OR (from_id=? AND to_id=?) ORDER BY created_at ASC", conn, params=(user_id, other_id, other_id, user_id))
-    if msgs.empty: st.info("메시지 내역 없음")
-    else:
-        chat_html = '<div class="chat-container">'
-        for _, row in msgs.iterrows():
-            cls = "msg-me" if row['from_id'] == user_id else "msg-other"
-            chat_html += f'<div class="msg-bubble {cls}">{row["message"]}</div>'
-        chat_html += '</div>'
-        st.markdown(chat_html, unsafe_allow_html=True)
 # [이 함수를 student_dashboard 함수보다 위쪽에 붙여넣으세요]
 
 def distribute_period_plan(user_id, subject, content, start_page, end_page, start_date, end_date, selected_days):
-    # 1. 기간 내 유효 날짜 추출
-    target_dates = []
-    current_date = start_date
-    
-    # 시작일부터 종료일까지 하루씩 넘기며 요일 체크
-    while current_date <= end_date:
-        if current_date.weekday() in selected_days:
-            target_dates.append(current_date)
-        current_date += datetime.timedelta(days=1)
+    # 1. 기간 내 유효 날짜 추출 (한 번에 계산)
+    target_dates = plan_dates(start_date, end_date, selected_days)
     
     if not target_dates: return False, "설정하신 기간 내에 선택한 요일이 없습니다."
+    if end_page - start_page + 1 <= 0: return False, "종료 페이지가 시작 페이지보다 커야 합니다."
     
-    # 2. 페이지 분배 계산
-    total_amount = end_page - start_page + 1
-    if total_amount <= 0: return False, "종료 페이지가 시작 페이지보다 커야 합니다."
-
-    daily_amount = total_amount // len(target_dates)
-    remainder = total_amount % len(target_dates)
-    
+    # 2. 목표 등록 + 일간 계획 N분배 (executemany 1회, 한 트랜잭션)
     with get_db_connection() as conn:
-        cur = conn.cursor()
-        days_str = ",".join(map(str, selected_days))
-        period_str = f"{start_date}~{end_date}"
-        
-        # 목표 등록
-        cur.execute("INSERT INTO monthly_goals (user_id, year_month, subject, content, total_amount, week_days) VALUES (?,?,?,?,?,?)", 
-                   (user_id, period_str, subject, content, total_amount, days_str))
-        monthly_id = cur.lastrowid
-        
-        # 일간 계획 생성 (N분배)
-        current_page = start_page
-        for i, p_date in enumerate(target_dates):
-            amount = daily_amount + (1 if i < remainder else 0)
-            range_end = current_page + amount - 1
-            
-            plan_text = f"{content} (p.{current_page}~p.{range_end})"
-            cur.execute("INSERT INTO daily_plans (user_id, plan_date, subject, content, linked_monthly_id) VALUES (?,?,?,?,?)", 
-                       (user_id, p_date, subject, plan_text, monthly_id))
-            
-            current_page += amount # 다음 페이지 갱신
-            
-        conn.commit()
+        distribute_plan(conn, user_id, f"{start_date}~{end_date}", subject, content, start_page, end_page, target_dates, selected_days)
     return True, f"총 {len(target_dates)}일 동안 p.{start_page}~p.{end_page} 계획 생성 완료!"
 # -----------------------------------------------------------------------------
 # 4. 학생 대시보드 화면 (3단 탭 구성)
 # -----------------------------------------------------------------------------
+@profiled("student_dashboard")
 def student_dashboard():
     user = st.session_state['user']
     st.markdown(f"### 👋 {user['real_name']} 학생")
     
     if st.button("로그아웃"):
-        del st.session_state['user']; st.rerun()
+        end_session(); st.rerun()
         
   # [수정됨] 탭 확장: 계획 세우기 / 오늘 할 일 / 월간 전체보기
     tab1, tab2, tab3 = st.tabs(["📅 계획 세우기", "✅ 오늘 할 일", "🗓️ 월간 전체보기"])
     
     # --- [TAB 1] 스마트 계획 수립 (기간 설정 적용) ---
-    with tab1:
+    with tab1, render_section("student_dashboard.tab_plan"):
         st.info("교재, 범위, 기간을 설정하면 AI가 요일에 맞춰 자동으로 계획을 짜줍니다.")
         with st.container(border=True):
             with st.form("smart_plan_form"):
@@ -251,7 +155,7 @@ def student_dashboard():
                             st.error(msg)
 
     # --- [TAB 2] 오늘의 할 일 체크 & 수정 (통합 버전) ---
-    with tab2:
+    with tab2, render_section("student_dashboard.tab_today"):
         # 1. 상단 컨트롤러 (날짜 선택 + 수정 모드 토글)
         c_date, c_mode = st.columns([2, 1])
         with c_date:
@@ -273,7 +177,7 @@ def student_dashboard():
             st.markdown(f"### ⏪ **{target_date} {day_str} 복습**")
 
         with get_db_connection() as conn:
-            plans = pd.read_sql("SELECT * FROM daily_plans WHERE user_id=? AND plan_date=?", conn, params=(user['id'], target_date))
+            plans = cached_read_sql(conn, "SELECT * FROM daily_plans WHERE user_id=? AND plan_date=?", (user['id'], target_date), user_id=user['id'], tables=["daily_plans"])
         
         if plans.empty: 
             st.info("등록된 일정이 없습니다.")
@@ -299,14 +203,14 @@ def student_dashboard():
                             st.write("")
                             if st.button("🗑️", key=f"del_{r['id']}", help="이 계획 삭제"):
                                 with get_db_connection() as conn:
-                                    conn.execute("DELETE FROM daily_plans WHERE id=?", (r['id'],))
+                                    delete_plan(conn, r['id'])
                                     conn.commit()
                                 st.rerun()
 
                         # 변경사항 자동 감지 및 업데이트
                         if new_subject != r['subject'] or new_content != r['content']:
                             with get_db_connection() as conn:
-                                conn.execute("UPDATE daily_plans SET subject=?, content=? WHERE id=?", (new_subject, new_content, r['id']))
+                                update_plan(conn, r['id'], new_subject, new_content)
                                 conn.commit()
                             # 즉시 리런하지 않고, 사용자가 입력을 마칠 때 자연스럽게 반영되도록 둠 (또는 버튼 추가 가능)
                             
@@ -319,11 +223,11 @@ def student_dashboard():
                             val = st.slider("성취도", 0, 100, r['achievement'], step=25, key=f"s_{r['id']}", label_visibility="collapsed", disabled=is_future)
                             if val != r['achievement'] and not is_future:
                                 with get_db_connection() as conn:
-                                    conn.execute("UPDATE daily_plans SET achievement=? WHERE id=?", (val, r['id']))
+                                    update_achievement(conn, r['id'], val)
                                     conn.commit()
                                 st.rerun()
 # --- [TAB 3] 월간 전체보기 (하이브리드: 캘린더 + 상세 카드) ---
-    with tab3:
+    with tab3, render_section("student_dashboard.tab_month"):
         # =========================================================
         # [SECTION A] 월간 히트맵 (전체 흐름 파악)
         # =========================================================
@@ -334,18 +238,8 @@ def student_dashboard():
         year = today.year
         month = today.month
         
-        with get_db_connection() as conn:
-            start_date = f"{year}-{month:02d}-01"
-            if month == 12: end_date = f"{year+1}-01-01"
-            else: end_date = f"{year}-{month+1:02d}-01"
-            
-            monthly_plans = pd.read_sql(f"SELECT plan_date, achievement FROM daily_plans WHERE user_id=? AND plan_date >= '{start_date}' AND plan_date < '{end_date}'", conn, params=(user['id'],))
-        
-        status_map = {}
-        for _, r in monthly_plans.iterrows():
-            d_str = str(r['plan_date'])
-            if status_map.get(d_str) == "full": continue
-            status_map[d_str] = "full" if r['achievement'] == 100 else "plan"
+        # 날짜별 요약표를 한 번에 계산 (칸마다 다시 찾지 않음), 세션에 보관 → 계획이 바뀔 때만 다시 계산
+        cal_days = session_view('month_calendar', lambda: month_calendar(user['id'], year, month), key=(year, month))
 
         cal = calendar.monthcalendar(year, month)
         cols = st.columns(7)
@@ -359,9 +253,7 @@ def student_dashboard():
             cols = st.columns(7)
             for i, day in enumerate(week):
                 if day != 0:
-                    d_str = f"{year}-{month:02d}-{day:02d}"
-                    status = status_map.get(d_str, "none")
-                    mark = "🟢" if status == "full" else ("🔵" if status == "plan" else "⚪")
+                    mark = STATUS_MARK[cal_days[datetime.date(year, month, day)]['status']]
                     day_disp = f"**{day}**" if day == today.day else f"{day}"
                     
                     cols[i].markdown(f"""
@@ -385,7 +277,7 @@ def student_dashboard():
         
         # 2. 선택한 날짜 데이터 조회
         with get_db_connection() as conn:
-            daily_view = pd.read_sql("SELECT subject, content, achievement FROM daily_plans WHERE user_id=? AND plan_date=?", conn, params=(user['id'], view_date))
+            daily_view = cached_read_sql(conn, "SELECT subject, content, achievement FROM daily_plans WHERE user_id=? AND plan_date=?", (user['id'], view_date), user_id=user['id'], tables=["daily_plans"])
         
         # 3. 카드 렌더링
         if daily_view.empty:
@@ -423,29 +315,30 @@ def student_dashboard():
         st.caption("🔵 계획 있음 / 🟢 완료함 / ⚪ 휴식")
     st.markdown("---")
     with st.container(border=True):
-        st.markdown("##### 📬 선생님 메시지")
-        render_chat(user['id'], 1)
+        # 몇 초마다 새 메시지만 확인 (이 부분만 다시 그림)
+        message_panel(user['id'], TEACHER_ID, "📬 선생님 메시지")
 
 # -----------------------------------------------------------------------------
 # 5. 메인 실행
 # -----------------------------------------------------------------------------
 def main():
     inject_custom_css()
-    init_db() # DB 초기화 확인
+    use_branch()     # 지점 DB 선택 (?branch=...)
+    run_migrations() # DB 스키마 확인 (버전 관리)
     
-    if 'user' not in st.session_state:
+    if not restore_session(roles=('student',)):
         st.markdown("<br>", unsafe_allow_html=True)
         with st.container(border=True):
             st.markdown(f"<h2 style='text-align:center; color:{COLOR_PRIMARY};'>학생용 로그인</h2>", unsafe_allow_html=True)
             uid = st.text_input("아이디")
             upw = st.text_input("비밀번호", type="password")
             if st.button("로그인"):
-                with get_db_connection() as conn:
-                    # role='student' 확인
-                    user = conn.execute("SELECT id, role, real_name FROM users WHERE username=? AND password=?", (uid, upw)).fetchone()
-                if user and user[1] == 'student':
-                    st.session_state['user'] = {'id':user[0], 'role':user[1], 'real_name':user[2]}
+                status, user = authenticate(uid, upw)
+                # role='student' 확인
+                if status == 'ok' and user['role'] == 'student':
+                    start_session(user)
                     st.rerun()
+                elif status == 'locked': st.error("로그인 실패가 너무 많습니다. 잠시 후 다시 시도해주세요.")
                 else: st.error("학생 계정이 아니거나 정보가 틀렸습니다.")
     else:
         student_dashboard()
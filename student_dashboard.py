@@ -1,20 +1,22 @@
 import streamlit as st
-import pandas as pd
 import datetime
 import calendar
-import sqlite3
 
 # -----------------------------------------------------------------------------
-# 1. 시스템 설정 (DB 연결 준비)
+# 1. 시스템 설정 (DB 연결은 공용 커넥션 풀 db.py 사용)
 # -----------------------------------------------------------------------------
-DB_NAME = "5a_planner_v5_fix.db"
-
-def get_db_connection():
-    return sqlite3.connect(DB_NAME, check_same_thread=False)
+from calendar_data import STATUS_MARK, month_calendar
+from chat import TEACHER_ID, message_panel
+from db import get_db_connection
+from plans import insert_plans, plan_dates, update_achievement
+from query_cache import cached_read_sql, invalidate_on_commit
+from profiler import profiled, render_section
+from sessions import end_session, session_view
 
 # -----------------------------------------------------------------------------
 # 2. 메인 실행 함수 (이름을 show_student로 맞춰야 main.py와 연결됩니다!)
 # -----------------------------------------------------------------------------
+@profiled("show_student")
 def show_student():
     # 로그인 정보 확인
     if 'user' not in st.session_state:
@@ -28,14 +30,18 @@ def show_student():
     with c1: st.markdown(f"### 👋 반가워요, **{user['real_name']}** 학생!")
     with c2: 
         if st.button("로그아웃"):
-            st.session_state.clear()
+            end_session()
             st.rerun()
 
+    # 선생님 메시지 알림 (몇 초마다 새 메시지만 확인, 탭과 상관없이 항상 보임)
+    with st.container(border=True):
+        message_panel(user['id'], TEACHER_ID, "📬 선생님 메시지")
+
     # 3단 탭 구조 (대표님 원래 로직 유지)
     tab1, tab2, tab3 = st.tabs(["📅 계획 세우기", "✅ 오늘 할 일", "🗓️ 월간 전체보기"])
     
     # [Tab 1] 계획 수립
-    with tab1:
+    with tab1, render_section("show_student.tab_plan"):
         st.info("💡 학습할 기간과 내용을 입력하세요.")
         with st.form("plan_form"):
             c_d1, c_d2 = st.columns(2)
@@ -50,30 +56,14 @@ def show_student():
             if st.form_submit_button("계획 저장"):
                 week_map = {d: i for i, d in enumerate(days)}
                 target_idx = [week_map[d] for d in selected_days]
-                curr = start_d
-                cnt = 0
+                target_dates = plan_dates(start_d, end_d, target_idx)
                 with get_db_connection() as conn:
-                    while curr <= end_d:
-                        if curr.weekday() in target_idx:
-                            conn.execute("INSERT INTO daily_plans (user_id, plan_date, subject, content) VALUES (?,?,?,?)",
-                                         (user['id'], curr, subject, content))
-                            cnt += 1
-                        curr += datetime.timedelta(days=1)
-                    conn.commit()
-                st.success(f"{cnt}일치 저장 완료!")
+                    insert_plans(conn, [(user['id'], d, subject, content, 0, None) for d in target_dates])
+                st.success(f"{len(target_dates)}일치 저장 완료!")
 
     # [Tab 2] 오늘 할 일 (각오 - 학습 - 평가 시스템)
-    with tab2:
-        # 1. [DB 무결성 확보] 일일 기록장 테이블이 없으면 자동 생성 (Defensive Coding)
-        with get_db_connection() as conn:
-            conn.execute('''CREATE TABLE IF NOT EXISTS daily_logs 
-                           (id INTEGER PRIMARY KEY AUTOINCREMENT, 
-                            user_id INTEGER, 
-                            log_date DATE, 
-                            resolution TEXT, 
-                            review TEXT, 
-                            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-            conn.commit()
+    with tab2, render_section("show_student.tab_today"):
+        # 1. 일일 기록장(daily_logs) 테이블은 migrations.py 에서 생성됨
 
         # 2. 날짜 선택 및 데이터 로딩
         col_date, col_head = st.columns([1, 2])
@@ -82,10 +72,11 @@ def show_student():
         # 해당 날짜의 각오/평가 데이터 가져오기
         log_data = {'resolution': "", 'review': ""}
         with get_db_connection() as conn:
-            log_row = conn.execute("SELECT resolution, review FROM daily_logs WHERE user_id=? AND log_date=?", (user['id'], target_date)).fetchone()
-            if log_row:
-                log_data['resolution'] = log_row[0] if log_row[0] else ""
-                log_data['review'] = log_row[1] if log_row[1] else ""
+            log_df = cached_read_sql(conn, "SELECT resolution, review FROM daily_logs WHERE user_id=? AND log_date=?", (user['id'], target_date), user_id=user['id'], tables=["daily_logs"])
+            if not log_df.empty:
+                log_row = log_df.fillna("").iloc[0]
+                log_data['resolution'] = log_row['resolution']
+                log_data['review'] = log_row['review']
 
         # --- [SECTION 1] 상단: 오늘의 각오 ---
         st.markdown("### 🌅 오늘의 각오")
@@ -104,6 +95,7 @@ def show_student():
                         conn.execute("UPDATE daily_logs SET resolution=?, updated_at=CURRENT_TIMESTAMP WHERE id=?", (resolution_input, exist[0]))
                     else:
                         conn.execute("INSERT INTO daily_logs (user_id, log_date, resolution) VALUES (?,?,?)", (user['id'], target_date, resolution_input))
+                    invalidate_on_commit(conn, ["daily_logs"], [user['id']])
                     conn.commit()
                 st.success("각오가 저장되었습니다! 오늘도 파이팅!")
                 st.rerun()
@@ -114,7 +106,7 @@ def show_student():
         st.markdown(f"### 📝 {target_date.strftime('%m월 %d일')} 학습 리스트")
         
         with get_db_connection() as conn:
-            plans = pd.read_sql("SELECT * FROM daily_plans WHERE user_id=? AND plan_date=?", conn, params=(user['id'], target_date))
+            plans = cached_read_sql(conn, "SELECT * FROM daily_plans WHERE user_id=? AND plan_date=?", (user['id'], target_date), user_id=user['id'], tables=["daily_plans"])
         
         if plans.empty:
             st.info("📅 등록된 일정이 없습니다. '계획 세우기' 탭에서 계획을 추가해주세요.")
@@ -126,7 +118,7 @@ def show_student():
                     val = c_val.slider("성취도", 0, 100, r['achievement'], key=f"s_{r['id']}")
                     if val != r['achievement']:
                         with get_db_connection() as conn:
-                            conn.execute("UPDATE daily_plans SET achievement=? WHERE id=?", (val, r['id']))
+                            update_achievement(conn, r['id'], val)
                             conn.commit()
                         st.rerun()
 
@@ -148,33 +140,20 @@ def show_student():
                     else:
                         # 각오 없이 평가만 먼저 쓰는 경우 대비
                         conn.execute("INSERT INTO daily_logs (user_id, log_date, review) VALUES (?,?,?)", (user['id'], target_date, review_input))
+                    invalidate_on_commit(conn, ["daily_logs"], [user['id']])
                     conn.commit()
                 st.success("오늘 하루도 정말 고생 많으셨습니다! 👏")
                 st.rerun()
 
     # [Tab 3] 월간 캘린더 (하이브리드 뷰)
-    with tab3:
+    with tab3, render_section("show_student.tab_month"):
         st.markdown("### 🗓️ 이번 달 학습 흐름")
         today = datetime.date.today()
         year, month = today.year, today.month
         
-        with get_db_connection() as conn:
-            # SQL 쿼리 최적화 (날짜 포맷 맞춤)
-            start = f"{year}-{month:02d}-01"
-            if month == 12:
-                end = f"{year+1}-01-01"
-            else:
-                end = f"{year}-{month+1:02d}-01"
-                
-            plans = pd.read_sql(f"SELECT plan_date, achievement FROM daily_plans WHERE user_id=? AND plan_date >= '{start}' AND plan_date < '{end}'", conn, params=(user['id'],))
-        
-        # 캘린더 표시 로직
-        status_map = {}
-        for _, r in plans.iterrows():
-            d_str = str(r['plan_date'])
-            # 기존 로직 유지 (100점이면 full, 아니면 plan)
-            if d_str not in status_map or status_map[d_str] != "full":
-                status_map[d_str] = "full" if r['achievement'] == 100 else "plan"
+        # 캘린더 표시 로직 (날짜별 요약표를 한 번에 계산, 100점 계획이 있으면 full)
+        # 세션에 보관해 두고 계획이 바뀔 때만 다시 계산
+        cal_days = session_view('month_calendar', lambda: month_calendar(user['id'], year, month), key=(year, month))
 
         cal = calendar.monthcalendar(year, month)
         cols = st.columns(7)
@@ -185,7 +164,5 @@ def show_student():
             cols = st.columns(7)
             for i, day in enumerate(week):
                 if day != 0:
-                    d_str = f"{year}-{month:02d}-{day:02d}"
-                    status = status_map.get(d_str, "none")
-                    mark = "🟢" if status == "full" else ("🔵" if status == "plan" else "⚪")
+                    mark = STATUS_MARK[cal_days[datetime.date(year, month, day)]['status']]
                     cols[i].markdown(f"<div style='text-align:center; padding:10px; border-radius:10px; background-color:white; margin:2px;'>{day}<br>{mark}</div>", unsafe_allow_html=True)
\ No newline at end of file
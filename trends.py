@@ -0,0 +1,108 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# -----------------------------------------------------------------------------
+# 1. 성적 추이 설정 (관리자 분석 탭 "과목별 성적 정밀 추이")
+# -----------------------------------------------------------------------------
+# 계획 한 건마다 점을 찍지 않고, 일일 집계표(student_daily_stats)를 일/주/월 단위로 묶은 뒤
+# 과목마다 최대 TREND_MAX_POINTS 개 점만 브라우저로 보냅니다. (몇 년치 기간을 골라도 점 수가 일정)
+TREND_MAX_POINTS = int(os.environ.get("PLANNER_TREND_MAX_POINTS", "200"))
+FREQS = {'D': "일별", 'W': "주별", 'M': "월별"}
+ROLLING = {'D': 7, 'W': 4, 'M': 3}      # 이동 평균 구간 (7일 / 4주 / 3개월)
+UNITS = {'D': "일", 'W': "주", 'M': "개월"}
+
+def pick_freq(start, end):
+    """기간 길이에 맞는 묶음 단위 (~4개월: 일별, ~2년: 주별, 그 이상: 월별)"""
+    days = (end - start).days
+    if days <= 120: return 'D'
+    if days <= 730: return 'W'
+    return 'M'
+
+# -----------------------------------------------------------------------------
+# 2. 묶기 + 이동 평균 (모든 과목을 배열 하나로 한 번에)
+# -----------------------------------------------------------------------------
+def _period_start(days, freq):
+    """datetime64[D] 배열 → 각 날짜가 속한 기간의 시작일 (주는 월요일 시작)"""
+    if freq == 'M':
+        return days.astype('datetime64[M]').astype('datetime64[D]')
+    if freq == 'W':
+        n = days.astype('int64')
+        return (n - (n + 3) % 7).astype('datetime64[D]')     # 1970-01-01 = 목요일
+    return days
+
+def resample_subjects(daily, freq='D', window=None):
+    """daily(stat_date, subject, count, total) → (기간 시작일 배열, 과목 목록, count, mean, rolling)
+    count/mean/rolling 은 (기간 × 과목) 배열. 계획이 없던 기간도 칸이 있어서 이동 평균 구간 = '기간 수'.
+    평균은 계획 수로 가중 (합계 ÷ 계획 수) → 일별 평균을 다시 평균 내는 것과 달리 묶음 단위가 바뀌어도 일관됨"""
+    window = window or ROLLING[freq]
+    starts = _period_start(pd.to_datetime(daily['stat_date']).to_numpy().astype('datetime64[D]'), freq)
+    if freq == 'M':
+        months = starts.astype('datetime64[M]')
+        periods = np.arange(months.min(), months.max() + 1).astype('datetime64[D]')
+        pos = (months - months.min()).astype('int64')
+    else:
+        step = 7 if freq == 'W' else 1
+        periods = np.arange(starts.min(), starts.max() + 1, step)
+        pos = (starts - starts.min()).astype('int64') // step
+    codes, subjects = pd.factorize(daily['subject'], sort=True)
+    count = np.zeros((len(periods), len(subjects)))
+    total = np.zeros_like(count)
+    np.add.at(count, (pos, codes), daily['count'].to_numpy(dtype=float))
+    np.add.at(total, (pos, codes), daily['total'].to_numpy(dtype=float))
+
+    def window_sum(a):
+        c = np.cumsum(a, axis=0)
+        c[window:] -= c[:-window].copy()
+        return c
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(count > 0, total / count, np.nan)
+        rolled_count = window_sum(count)
+        rolling = np.where(rolled_count > 0, window_sum(total) / rolled_count, np.nan)
+    return periods, list(subjects), count, mean, rolling
+
+# -----------------------------------------------------------------------------
+# 3. 점 줄이기 (LTTB: Largest-Triangle-Three-Buckets)
+# -----------------------------------------------------------------------------
+# 처음/끝 점은 두고, 나머지를 n_out-2 개 구간으로 나눠 구간마다 '앞에서 고른 점 + 다음 구간 평균'과
+# 가장 큰 삼각형을 이루는 점 하나를 고릅니다. 봉우리/골짜기가 남아서 단순 솎아내기보다 모양이 덜 바뀜.
+def lttb(x, y, n_out):
+    """남길 점의 위치 (정렬된 정수 배열)"""
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)    # n_out-2 개 구간 [edges[i], edges[i+1])
+    keep = np.empty(n_out, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            nx, ny = x[hi:edges[i + 2]].mean(), y[hi:edges[i + 2]].mean()
+        else:
+            nx, ny = x[-1], y[-1]
+        area = np.abs((x[a] - nx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (ny - y[a]))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+def trend_series(daily, freq='D', window=None, max_points=TREND_MAX_POINTS):
+    """차트용 긴 표 (columns=date, subject, count, mean, rolling). 과목마다 최대 max_points 행
+    계획이 있던 기간만 남기고, 점이 많으면 이동 평균 선 모양을 기준으로 LTTB 로 줄임"""
+    if daily.empty:
+        return pd.DataFrame(columns=['date', 'subject', 'count', 'mean', 'rolling'])
+    periods, subjects, count, mean, rolling = resample_subjects(daily, freq, window)
+    x = periods.astype('int64')
+    rows, cols = [], []
+    for j in range(len(subjects)):      # 과목 = 배열의 열 (행 필터링 없음)
+        has = np.flatnonzero(count[:, j] > 0)
+        keep = has[lttb(x[has], rolling[has, j], max_points)]
+        rows.append(keep)
+        cols.append(np.full(len(keep), j))
+    rows, cols = np.concatenate(rows), np.concatenate(cols)
+    return pd.DataFrame({'date': periods[rows], 'subject': np.array(subjects, dtype=object)[cols],
+                         'count': count[rows, cols].astype(int), 'mean': mean[rows, cols], 'rolling': rolling[rows, cols]})